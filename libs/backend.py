@@ -2,15 +2,28 @@
 Classes to store information of one item and a bill. Functions to read and
 update the json files, to write to output csv files.
 """
+import concurrent.futures  # To read the product json files in parallel
 import configparser  # To read config file
 import csv  # To write the output into csv files
+import datetime  # To rank recently bought products higher
+import hashlib  # To recognise bills which were already exported
 import json  # To read from and write to update json files
+import mmap  # To read large csv files without a buffered file object
 import os  # To walk through product json files
-import re  # To match user input with product templates
+import pickle  # To read and write the startup snapshot
+import shutil  # To copy the streamed export rows behind the first line
+import tempfile  # To stream export rows before the row count is known
+import threading  # To guard the registry dirty flags
+import time  # To measure how long reading the product files takes
 
 # The product template json should be alphabetical product names
 from collections import OrderedDict
 
+import libs.database as database
+import libs.journal as journal
+import libs.search as search
+import libs.writer as writer
+
 # Global data structures which hold the information read from the json files
 
 # TEMPLATES key: product name
@@ -39,6 +52,67 @@ DISCOUNT_CLASSES = {}
 # PRODUCT_KEYS field: str, "product_" + number corresponding to product name
 PRODUCT_KEYS = {}
 
+# TEMPLATE_DEFAULTS key: product identifier
+# TEMPLATE_DEFAULTS field: dict {"default_price_per_unit", "default_quantity",
+#                          "product_class", "unknown"} as saved in the product
+#                          json file or database, so the GUI can compare a line
+#                          with its template without reading the file
+TEMPLATE_DEFAULTS = {}
+
+# search.SearchIndex over the names in TEMPLATES, updated whenever a template is
+# added
+SEARCH_INDEX = search.SearchIndex()
+
+# HISTORY_LOG key: product identifier
+# HISTORY_LOG field: list of history dicts which were appended to the history
+#                    log file and not yet moved into the product json file
+HISTORY_LOG = {}
+
+# PURCHASE_STATS key: product name
+# PURCHASE_STATS field: tuple (purchase count, date_time of the last purchase),
+#                       used to rank fuzzy search results. Filled on demand
+PURCHASE_STATS = {}
+
+# HistoryCache holding the purchase history of recently used products if the
+# "lazy history" config value is set. Resized by read_products()
+HISTORY_CACHE = None
+
+# Increase when the layout of the startup snapshot changes so old snapshot
+# files are ignored
+SNAPSHOT_VERSION = 1
+
+# writer.BackgroundWriter doing the disk writes of create_template, create_bill
+# and export_bills if the "background writes" config value is set. None if the
+# writes are done directly
+WRITER = None
+
+# FILENAME_COUNTERS key: folder of backup or export files
+# FILENAME_COUNTERS field: dict, see read_filename_counters
+FILENAME_COUNTERS = {}
+
+# journal.BillJournal holding the saved bills whose file updates are not
+# applied yet, only used if the "use bill journal" config value is set. Opened
+# by replay_journal()
+JOURNAL = None
+
+# Product attributes stored for every line of a bill in the bill journal
+JOURNAL_PRODUCT_FIELDS = ("name", "price_single", "quantity", "discount_class",
+                          "product_class", "unknown", "price_quantity",
+                          "discount", "quantity_discount", "sale",
+                          "price_final", "identifier")
+
+# Joins the cells of one column while they are formatted together, see
+# format_number_column. Never part of a number
+CELL_SEPARATOR = "\x1f"
+
+# Seconds a file modification time may be behind time.time() when the file is
+# written, e.g. FAT file systems store them in steps of 2 seconds
+MTIME_SLACK = 2
+
+# sqlite3.Connection to the product database, only used if the "storage" config
+# value is "sqlite". Opened on first use by get_database()
+DATABASE = None
+
 
 class Bill:
     """
@@ -115,7 +189,9 @@ class Product:
     display: bool
         Whether or not to list this product in the template selection
     history: list of dicts
-        List holding all previous purchases
+        List holding all previous purchases. If the product was read with
+        lazy history loading, the list is read from the product json file or
+        database on first access and kept in HISTORY_CACHE
     identifier: int
         Number to identify the product, this corresponds to the json file name
     name: str
@@ -145,8 +221,8 @@ class Product:
                  discount_class='', product_class='', unknown='',
                  price_quantity=0.0, discount=0.0, quantity_discount="0,0",
                  sale="0,0", price_final=0.0, history=None, identifier=-1,
-                 display=True, notes=''):
-        if history is None:
+                 display=True, notes='', lazy_history=False):
+        if history is None and not lazy_history:
             history = []
         self.name = name
         self.price_single = price_single
@@ -180,11 +256,296 @@ class Product:
                       f"\tprice_final: {self.price_final}\n"
                       f"\tdisplay: {self.display}\n"
                       f"\tnotes: {self.notes}\n"
-                      f"\thistory: {len(self.history)} items\n"
+                      f"\thistory: {self._history_length()}\n"
                       f"---\n"
                       )
         return out_string
 
+    @property
+    def history(self):
+        if self._history is None:
+            return HISTORY_CACHE.get(self.identifier)
+        return self._history
+
+    @history.setter
+    def history(self, history):
+        self._history = history
+
+    def loaded_history(self):
+        """
+        Return the history only if it is in memory, a lazy history is not read
+
+        Returns:
+            history (list of dicts): All saved purchases of the product, None
+                                     if the history has not been loaded
+        """
+        if self._history is None:
+            return HISTORY_CACHE.peek(self.identifier)
+        return self._history
+
+    def _history_length(self):
+        """
+        Describe the length of the history without loading a lazy history
+        """
+        history = self.loaded_history()
+        if history is None:
+            return "not loaded"
+        return f"{len(history)} items"
+
+
+class HistoryCache:
+    """
+    Size-bounded cache for the purchase history of products whose history is
+    loaded lazily. The least recently used history is dropped when the cache is
+    full, it is read again from the product json file or database on the next
+    access. Used by the GUI and the background writer thread
+
+    ...
+    Attributes
+    ----------
+    histories: OrderedDict
+        key: product identifier, field: list of history dicts. Ordered from
+        least to most recently used
+    max_size: int
+        Number of histories kept in memory
+    _lock: threading.Lock
+        Guards histories, not held while a history is read
+
+    Methods
+    -------
+    get(self, identifier):
+        Return the history of a product, read it if it is not cached
+    peek(self, identifier):
+        Return the cached history of a product without reading it
+    put(self, identifier, history):
+        Store the current history of a product
+    resize(self, max_size):
+        Change the number of kept histories
+    """
+
+    def __init__(self, max_size):
+        self.histories = OrderedDict()
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def get(self, identifier):
+        """
+        Return the history of a product, read it if it is not cached
+
+        Parameters:
+            identifier (int): Identifier of the product
+
+        Returns:
+            history (list of dicts): All saved purchases of the product
+        """
+        with self._lock:
+            if identifier in self.histories:
+                self.histories.move_to_end(identifier)
+                return self.histories[identifier]
+
+        # Reading may wait for the background writer, whose writes can use the
+        # cache as well
+        history = read_product_history(identifier)
+        with self._lock:
+            # Keep a history which was stored while reading, it may already
+            # hold a newer purchase
+            if identifier in self.histories:
+                self.histories.move_to_end(identifier)
+                return self.histories[identifier]
+            self._store(identifier, history)
+        return history
+
+    def peek(self, identifier):
+        """
+        Return the cached history of a product without reading it or changing
+        the order of the cache
+
+        Parameters:
+            identifier (int): Identifier of the product
+
+        Returns:
+            history (list of dicts): All saved purchases of the product, None
+                                     if it is not cached
+        """
+        with self._lock:
+            return self.histories.get(identifier)
+
+    def put(self, identifier, history):
+        """
+        Store the current history of a product, e.g. after a purchase was
+        added, as the most recently used one
+
+        Parameters:
+            identifier (int): Identifier of the product
+            history (list of dicts): All saved purchases of the product
+        """
+        with self._lock:
+            self._store(identifier, history)
+
+    def _store(self, identifier, history):
+        """
+        Store a history as the most recently used one and drop the least
+        recently used ones above max_size. The caller holds _lock
+
+        Parameters:
+            identifier (int): Identifier of the product
+            history (list of dicts): All saved purchases of the product
+        """
+        self.histories[identifier] = history
+        self.histories.move_to_end(identifier)
+        while len(self.histories) > self.max_size:
+            self.histories.popitem(last=False)
+
+    def resize(self, max_size):
+        """
+        Change the number of kept histories
+
+        Parameters:
+            max_size (int): Number of histories kept in memory
+        """
+        with self._lock:
+            self.max_size = max_size
+            while len(self.histories) > self.max_size:
+                self.histories.popitem(last=False)
+
+
+class PersistenceManager:
+    """
+    Keeps track of which registry json files (stores, payments, product keys)
+    changed since they were last written. The registries are only marked while
+    a bill or template is saved and written once by flush(), instead of every
+    change rewriting the whole file
+
+    ...
+    Attributes
+    ----------
+    avoided_writes: int
+        Number of marks which did not lead to an extra write, because the
+        registry was already marked or did not change
+    dirty: set
+        Names of the registries which have to be written
+    writes: int
+        Number of registry files written by flush()
+
+    Methods
+    -------
+    mark(self, name, changed=True):
+        Mark a registry to be written by the next flush()
+    flush(self):
+        Write all marked registries
+    """
+
+    def __init__(self):
+        self.dirty = set()
+        self.writes = 0
+        self.avoided_writes = 0
+        # Marks come from the GUI and from the background writer thread
+        self._lock = threading.Lock()
+
+    def mark(self, name, changed=True):
+        """
+        Mark a registry to be written by the next flush()
+
+        Parameters:
+            name (str): "stores", "payments" or "product keys"
+            changed (bool): False if the registry content did not change, the
+                            call is only counted as an avoided write
+        """
+        with self._lock:
+            if not changed or name in self.dirty:
+                self.avoided_writes += 1
+            else:
+                self.dirty.add(name)
+
+    def flush(self):
+        """
+        Write all marked registries, each one once
+
+        Returns:
+            written (list of str): Names of the written registries
+        """
+        with self._lock:
+            written = sorted(self.dirty)
+            self.dirty.clear()
+
+        write_functions = {"stores": update_stores,
+                           "payments": update_payments,
+                           "product keys": update_product_keys}
+        for name in written:
+            write_functions[name]()
+            self.writes += 1
+        if written:
+            print("registries written: ", written, ", total ", self.writes,
+                  ", avoided ", self.avoided_writes)
+        return written
+
+
+# PersistenceManager collecting the registry json files which have to be
+# written after a bill or template is saved
+REGISTRIES = PersistenceManager()
+
+
+class IdentifierAllocator:
+    """
+    Hands out product identifiers without looking at every template. Knows the
+    highest used identifier and which product name each identifier belongs to
+
+    ...
+    Attributes
+    ----------
+    max_identifier: int
+        Highest identifier in use, -1 if there is none
+    names: dict
+        key: product identifier, field: product name
+
+    Methods
+    -------
+    add(self, identifier, name):
+        Register an identifier which is in use
+    next_identifier(self):
+        Return the identifier for a new product
+    clear(self):
+        Forget all identifiers
+    """
+
+    def __init__(self):
+        self.names = dict()
+        self.max_identifier = -1
+
+    def add(self, identifier, name):
+        """
+        Register an identifier which is in use
+
+        Parameters:
+            identifier (int): Identifier of the product
+            name (str): Name of the product
+        """
+        self.names[identifier] = name
+        if identifier > self.max_identifier:
+            self.max_identifier = identifier
+
+    def next_identifier(self):
+        """
+        Return the identifier for a new product, one higher than the highest
+        identifier in use. The identifier is only taken once add() is called
+
+        Returns:
+            (int): Unused identifier
+        """
+        return self.max_identifier + 1
+
+    def clear(self):
+        """
+        Forget all identifiers
+        """
+        self.names.clear()
+        self.max_identifier = -1
+
+
+# IdentifierAllocator over the identifiers of TEMPLATES, filled when the
+# products are read and whenever a template is added
+IDENTIFIERS = IdentifierAllocator()
+
 
 def read_config(config_path):
     """
@@ -201,6 +562,114 @@ def read_config(config_path):
     return config
 
 
+def use_database():
+    """
+    Checks the config file to see where the product templates are stored
+
+    Returns:
+        (bool): True if the products are stored in the SQLite database, False
+                if every product has its own json file
+    """
+    return CONFIG["DEFAULT"].get("storage", "json") == "sqlite"
+
+
+def get_database():
+    """
+    Returns the connection to the product database, opens it on the first call
+
+    Returns:
+        DATABASE (sqlite3.Connection): Open connection to the database
+    """
+    global DATABASE
+    if DATABASE is None:
+        DATABASE = database.open_database(
+            CONFIG["FILES"]["product database"])
+    return DATABASE
+
+
+def start_writer():
+    """
+    Starts the background writer thread if the "background writes" config
+    value is set
+    """
+    global WRITER
+    if WRITER is None and \
+            CONFIG["DEFAULT"].getboolean("background writes", fallback=False):
+        WRITER = writer.BackgroundWriter(
+            CONFIG["DEFAULT"].getint("write queue size", fallback=100))
+
+
+def submit_write(description, func, *args, keys=()):
+    """
+    Runs a disk write directly, or queues it for the background writer thread
+    if it is running. All writes go through the same queue, so each file is
+    written in the order the writes were submitted
+
+    Parameters:
+        description (str): Shown when the write fails
+        func (function): The write function
+        args: Parameters passed to func
+        keys (iterable): Identifiers of the products whose files func writes,
+                         see wait_for_product_writes()
+    """
+    if WRITER is None:
+        func(*args)
+    else:
+        WRITER.submit(description, func, *args, keys=keys)
+
+
+def flush_registries():
+    """
+    Writes the registry json files marked since the last flush. Queued after
+    the writes of a bill or template, so every registry is written once per
+    save
+    """
+    submit_write("registries", REGISTRIES.flush)
+
+
+def wait_for_writes():
+    """
+    Waits until the background writer finished all queued writes
+    """
+    if WRITER is not None:
+        WRITER.flush()
+
+
+def wait_for_product_writes(identifier):
+    """
+    Waits until the background writer finished the queued writes of one
+    product. Called before the product file, which may still be written, is
+    read. The writes of other products and bills stay in the background
+
+    Parameters:
+        identifier (int): Identifier of the product
+    """
+    if WRITER is not None:
+        WRITER.wait_for(identifier)
+
+
+def submit_apply_journal():
+    """
+    Queues apply_journal() for the products of the pending bill journal records
+    """
+    submit_write("journal", apply_journal,
+                 keys=[identifier for record in JOURNAL.pending()
+                       for identifier, entry in record["purchases"]])
+
+
+def stop_writer():
+    """
+    Applies the pending bill journal records, finishes all queued writes and
+    stops the background writer thread
+    """
+    global WRITER
+    if JOURNAL is not None and len(JOURNAL):
+        submit_apply_journal()
+    if WRITER is not None:
+        WRITER.stop()
+        WRITER = None
+
+
 def read_json(file_path):
     """
     Opens a json file and reads it using the json module
@@ -218,7 +687,7 @@ def read_json(file_path):
 def format_bill(bill):
     """
     Takes the contents of a Bill object and creates the lines which are written
-    into the output csv files
+    into the output csv files, see format_bills
 
     Parameters:
         bill (Bill): Holds all information for one purchase of various items
@@ -227,111 +696,230 @@ def format_bill(bill):
         header_line (list): Holds information regarding the purchase, e.g. store
         lines (list of lists): Holds information regarding the purchased items
     """
-    store = bill.store
-    date = bill.date
-    time = bill.time
-    total = bill.total
+    return format_bills([bill])[0]
 
-    # In the GUI, the discounts are displayed as negative numbers. This is not
-    # the case in the output csv
-    discount_sum = bill.discount_sum * -1
-    quantity_discount_sum = bill.quantity_discount_sum * -1
-    sale_sum = bill.sale_sum * -1
 
-    lines: list = list()
+def format_number(item):
+    """
+    Formats a number of a bill for the output csv files. 0 becomes an empty
+    string, floats get 2 decimal places and the decimal sign is a comma
+    (German format)
 
-    # For each item in the bill, one line will be printed
-    for product in bill.products:
-        # If entry.discount_class is a number, divide it so it looks like the
-        # percentage and format it to 2 decimal places
-        try:
-            discount_class = f'{float(product.discount_class) / 100:.2f}'
-        except ValueError:
-            # If entry.discount_class is one of the stored discounts, keep it as
-            # the letter
-            if product.discount_class in DISCOUNT_CLASSES:
-                discount_class = product.discount_class
-            else:
-                # Otherwise it becomes 0, reduced to an empty field
-                discount_class = ''
-
-        line = ['', '', '',
-                product.name,
-                product.price_single,
-                product.quantity,
-                discount_class,
-                product.product_class,
-                product.unknown,
-                product.price_quantity,
-                product.discount,
-                product.quantity_discount,
-                product.sale,
-                product.price_final]
-
-        # Format the float values to have 2 decimal places
-        # 0 becomes empty string
-        for index, item in enumerate(line):
-            # Skip formatting on quantity and discount_class
-            if index in [5, 6]:
-                continue
-            # Replace 0 with ''
-            if item == 0:
-                line[index] = ''
-            # Format numbers to have 2 decimal places
-            elif isinstance(item, float):
-                line[index] = f'{item:.2f}'
+    Parameters:
+        item (float, int or str): The number
 
-        # German format, decimal sign is comma
-        # TODO don't do this to the product name
-        line = [str(item).replace('.', ',') for item in line]
+    Returns:
+        (str): Text of the csv cell
+    """
+    if item == 0:
+        return ''
+    if isinstance(item, float):
+        return f'{item:.2f}'.replace('.', ',')
+    return str(item).replace('.', ',')
 
-        lines.append(line)
 
-    header_line = [date, time, store, bill.payment, len(bill.products), '',
-                   '', '', '', bill.price_quantity_sum, discount_sum,
-                   quantity_discount_sum, sale_sum, total]
+def format_number_column(values):
+    """
+    Formats a column of numbers like format_number, in one pass: one format
+    string is built for the whole column and used once, then the decimal signs
+    of all cells are replaced at once
 
-    # Format the float values to have 2 decimal places
-    # 0 becomes empty string
-    for index, item in enumerate(header_line):
-        # Replace 0 with ''
-        if item == 0:
-            header_line[index] = ''
-        # Format numbers to have 2 decimal places
-        elif isinstance(item, float):
-            header_line[index] = f'{item:.2f}'
+    Parameters:
+        values (list of float, int or str): The numbers of the column
 
-    # German format, decimal sign is comma
-    header_line = [str(item).replace('.', ',') for item in header_line]
+    Returns:
+        (list of str): Text of the csv cells
+    """
+    if not values:
+        return []
+    # 0 is cut to an empty string, floats get 2 decimal places
+    specs = ["{!s:.0}" if item == 0 else "{:.2f}" if isinstance(item, float)
+             else "{}" for item in values]
+    text = CELL_SEPARATOR.join(specs).format(*values)
+    return text.replace('.', ',').split(CELL_SEPARATOR)
 
-    return header_line, lines
+
+def format_quantity_column(values):
+    """
+    Formats a column of numbers which are not rounded, e.g. the quantity, in
+    one pass. Only the decimal sign becomes a comma, 0 stays
+
+    Parameters:
+        values (list of float, int or str): The numbers of the column
+
+    Returns:
+        (list of str): Text of the csv cells
+    """
+    if not values:
+        return []
+    text = CELL_SEPARATOR.join(map(str, values))
+    return text.replace('.', ',').split(CELL_SEPARATOR)
 
 
-def create_unique_filename(file_path):
+def format_discount_class(discount_class):
     """
-    Check if a backup bill file with the output name already exists. If it does,
-    add a number to its name and check again
+    Formats the discount class of a product for the output csv files
 
     Parameters:
-        file_path (str): Windows path to save the file
+        discount_class (str): Percentage or key of DISCOUNT_CLASSES
 
     Returns:
-        new_path (str): The new Windows path where the file will be saved
+        (str): Text of the csv cell
     """
+    # If entry.discount_class is a number, divide it so it looks like the
+    # percentage and format it to 2 decimal places
+    try:
+        return f'{float(discount_class) / 100:.2f}'.replace('.', ',')
+    except ValueError:
+        # If entry.discount_class is one of the stored discounts, keep it as
+        # the letter
+        if discount_class in DISCOUNT_CLASSES:
+            return discount_class.replace('.', ',')
+        # Otherwise it becomes 0, reduced to an empty field
+        return ''
 
-    if not os.path.isfile(file_path + ".csv"):
-        return file_path
 
-    counter = 0
+def format_bills(bills):
+    """
+    Takes the contents of many Bill objects and creates the lines which are
+    written into the output csv files. The cells are formatted column by
+    column, every column with its own rule, instead of checking every cell
+    of every line. Number columns go through format_number_column, which
+    formats the whole column with one format string, the quantity only gets
+    the comma, text columns like the product name stay unchanged. A discount
+    class is formatted once per distinct value of its column
+
+    Parameters:
+        bills (list of Bill): Bills to format
+
+    Returns:
+        formatted_bills (list of tuples): (header_line, lines) of every bill.
+            header_line (list): Holds information regarding the purchase,
+                                e.g. store
+            lines (list of lists): Holds information regarding the purchased
+                                   items
+    """
+    # For each item in the bill, one line will be printed
+    products = [product for bill in bills for product in bill.products]
+    discount_classes = [product.discount_class for product in products]
+    formatted_classes = {discount_class: format_discount_class(discount_class)
+                         for discount_class in set(discount_classes)}
+    empty = [''] * len(products)
+    product_columns = [
+        empty, empty, empty,
+        [product.name for product in products],
+        format_number_column([product.price_single for product in products]),
+        # Quantity is not rounded and stays 0
+        format_quantity_column([product.quantity for product in products]),
+        [formatted_classes[discount_class]
+         for discount_class in discount_classes],
+        [product.product_class for product in products],
+        [product.unknown for product in products],
+        format_number_column(
+            [product.price_quantity for product in products]),
+        format_number_column([product.discount for product in products]),
+        format_number_column(
+            [product.quantity_discount for product in products]),
+        format_number_column([product.sale for product in products]),
+        format_number_column([product.price_final for product in products])]
+    product_lines = [list(line) for line in zip(*product_columns)]
+
+    # In the GUI, the discounts are displayed as negative numbers. This is not
+    # the case in the output csv
+    empty = [''] * len(bills)
+    header_columns = [
+        [bill.date for bill in bills],
+        [bill.time for bill in bills],
+        [bill.store for bill in bills],
+        [bill.payment for bill in bills],
+        format_number_column([len(bill.products) for bill in bills]),
+        empty, empty, empty, empty,
+        format_number_column([bill.price_quantity_sum for bill in bills]),
+        format_number_column([bill.discount_sum * -1 for bill in bills]),
+        format_number_column(
+            [bill.quantity_discount_sum * -1 for bill in bills]),
+        format_number_column([bill.sale_sum * -1 for bill in bills]),
+        format_number_column([bill.total for bill in bills])]
+
+    formatted_bills = []
+    start = 0
+    for bill, header_line in zip(bills, zip(*header_columns)):
+        end = start + len(bill.products)
+        formatted_bills.append((list(header_line), product_lines[start:end]))
+        start = end
+    return formatted_bills
+
+
+def read_filename_counters(folder):
+    """
+    Reads the names of the csv files in a folder once and finds the next free
+    number for every file name, see open_unique_file
+
+    Parameters:
+        folder (str): Folder of the output files
+
+    Returns:
+        counters (dict): key: file name without number and ".csv", field: next
+                         unused number. Names which are not in the dict are
+                         not used yet
+    """
+    counters = dict()
+    try:
+        names = os.listdir(folder or '.')
+    except FileNotFoundError:
+        return counters
+
+    for name in names:
+        if not name.endswith(".csv"):
+            continue
+        stem = name[:-len(".csv")]
+        counters.setdefault(stem, 0)
+        prefix, _, number = stem.rpartition('_')
+        if prefix and len(number) >= 2 and number.isdigit():
+            counters[prefix] = max(counters.get(prefix, 0), int(number) + 1)
+    return counters
+
+
+def open_unique_file(file_path, encoding):
+    """
+    Creates a new csv file. If a file with the output name already exists, a
+    number is added to its name. The used numbers are read once per folder and
+    then counted up, so no file has to be checked for every number. The file
+    is opened in exclusive-create mode, an existing file is never overwritten
+
+    Parameters:
+        file_path (str): Windows path to save the file, without ".csv"
+        encoding (str): Encoding of the file
+
+    Returns:
+        out_file (file object): The new file, opened for writing
+    """
+    folder, name = os.path.split(file_path)
+    counters = FILENAME_COUNTERS.get(folder)
+    if counters is None:
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        counters = read_filename_counters(folder)
+        FILENAME_COUNTERS.update({folder: counters})
+
+    counter = counters.get(name)
     while True:
-        new_path = file_path + "_" + f"{counter:02}"
-        if not os.path.isfile(new_path + ".csv"):
-            return new_path
+        if counter is None:
+            new_path = file_path
         else:
-            counter += 1
+            new_path = file_path + "_" + f"{counter:02}"
+        try:
+            out_file = open(new_path + ".csv", 'x', newline='',
+                            encoding=encoding)
+        except FileExistsError:
+            # Created after the folder was read, e.g. by another program
+            counter = 0 if counter is None else counter + 1
+            continue
+        counters[name] = 0 if counter is None else counter + 1
+        return out_file
 
 
-def backup_bill(bill):
+def backup_bill(bill, skip_existing=False):
     """
     In contrast to the export_bills function, this function gets called after
     each bill is saved to act as as backup in case the program crashes. The bill
@@ -339,24 +927,25 @@ def backup_bill(bill):
 
     Parameters:
         bill (Bill): Holds all information for one purchase of various items
+        skip_existing (bool): If True, nothing is written if a backup with the
+                              same name and content exists. Used when bill
+                              journal records are applied again after a crash
     """
     # Create file name
-    out_path = CONFIG["FOLDERS"]["output"] + "bill_backups\\"
     encoding = CONFIG["DEFAULT"]["encoding"]
     # Can not have ':' in file name
     time = bill.time.replace(':', '-')
     store = bill.store.replace(':', '-')
     store = store.replace(' ', '_')
     date_time_store = bill.date + 'T' + time + '_' + store
-    out_path += date_time_store
-
-    out_path = create_unique_filename(out_path)
-
-    out_path += ".csv"
+    out_path = os.path.join(output_folder("bill_backups"), date_time_store)
 
     header_line, lines = format_bill(bill)
 
-    with open(out_path, 'w', newline='', encoding=encoding) as out_file:
+    if skip_existing and backup_exists(out_path, header_line, lines):
+        return
+
+    with open_unique_file(out_path, encoding) as out_file:
         file_writer = csv.writer(out_file,
                                  delimiter=CONFIG["DEFAULT"]["delimiter"],
                                  quotechar='|', quoting=csv.QUOTE_MINIMAL)
@@ -366,155 +955,1117 @@ def backup_bill(bill):
 
         file_writer.writerow('')
 
-    update_product_keys()
+
+def backup_exists(file_path, header_line, lines):
+    """
+    Check if one of the backup files open_unique_file would skip already holds
+    this bill
+
+    Parameters:
+        file_path (str): Backup path without the ".csv" ending and counter
+        header_line (list): Header line as returned by format_bill
+        lines (list of lists): Product lines as returned by format_bill
+
+    Returns:
+        (bool): True if a backup file with the same rows exists
+    """
+    encoding = CONFIG["DEFAULT"]["encoding"]
+    rows = [header_line] + lines + [[]]
+    candidate = file_path
+    counter = 0
+    while os.path.isfile(candidate + ".csv"):
+        with open(candidate + ".csv", 'r', newline='',
+                  encoding=encoding) as in_file:
+            reader = csv.reader(in_file,
+                                delimiter=CONFIG["DEFAULT"]["delimiter"],
+                                quotechar='|')
+            if list(reader) == rows:
+                return True
+        candidate = file_path + "_" + f"{counter:02}"
+        counter += 1
+    return False
+
+
+def parse_float(text, default=0.0):
+    """
+    Reads a number of an output csv file, inverse of the number formatting of
+    format_bill
+
+    Parameters:
+        text (str): Cell of the csv file with German decimal comma, e.g. "1,04"
+        default (float): Returned for an empty cell, format_bill writes 0 as ''
+
+    Returns:
+        value (float): The number
+    """
+    if text == '':
+        return default
+    return float(text.replace(',', '.'))
+
+
+def iter_bill_rows(file_path, skip_rows=0, use_mmap=False):
+    """
+    Generator over the bills of a backup or export csv file, without turning
+    them into Bill objects. The first line of an export file, which holds the
+    row count and the column description, is skipped
+
+    Parameters:
+        file_path (str): Path to the csv file
+        skip_rows (int): Number of rows to skip at the start of the file, e.g.
+                         for files with other column descriptions
+        use_mmap (bool): If True, the file is memory-mapped instead of being
+                         read through a buffered file object. Faster for large
+                         export files
+
+    Yields:
+        header_line (list): Header line of one bill, see format_bill
+        lines (list of lists): Product lines of the bill
+    """
+    encoding = CONFIG["DEFAULT"]["encoding"]
+    delimiter = CONFIG["DEFAULT"]["delimiter"]
+    if use_mmap:
+        in_file = open(file_path, 'rb')
+    else:
+        in_file = open(file_path, 'r', newline='', encoding=encoding)
+
+    with in_file:
+        if use_mmap:
+            try:
+                mapped = mmap.mmap(in_file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files can not be mapped
+                return
+            text_lines = (line.decode(encoding)
+                          for line in iter(mapped.readline, b''))
+        else:
+            mapped = None
+            text_lines = in_file
+
+        try:
+            reader = csv.reader(text_lines, delimiter=delimiter,
+                                quotechar='|')
+            header_line = None
+            lines = []
+            for index, row in enumerate(reader):
+                if index < skip_rows:
+                    continue
+                if index == 0 and len(row) > 1 and row[1] == "Zeit":
+                    # First line of an export file
+                    continue
+                if not any(row):
+                    # Empty line after every bill
+                    if header_line is not None:
+                        yield header_line, lines
+                    header_line = None
+                    lines = []
+                elif row[0] != '':
+                    # Header lines start with the date, product lines are
+                    # empty in the first column
+                    if header_line is not None:
+                        yield header_line, lines
+                    header_line = row
+                    lines = []
+                elif header_line is not None:
+                    lines.append(row)
+            if header_line is not None:
+                yield header_line, lines
+        finally:
+            if mapped is not None:
+                mapped.close()
+
+
+def bill_from_rows(header_line, lines):
+    """
+    Creates a Bill object from the rows of one bill, inverse of format_bill.
+    The products are not linked to the product templates. An empty quantity
+    is read as one item
+
+    Parameters:
+        header_line (list): Header line of the bill, see format_bill
+        lines (list of lists): Product lines of the bill
+
+    Returns:
+        bill (Bill): The bill with one Product object per product line
+    """
+    products = []
+    for line in lines:
+        # format_bill writes percentages divided by 100, letters of the
+        # DISCOUNT_CLASSES stay
+        discount_class = line[6]
+        if discount_class:
+            try:
+                discount_class = \
+                    f"{round(parse_float(discount_class) * 100, 2):g}"
+            except ValueError:
+                pass
+        products.append(Product(name=line[3],
+                                price_single=parse_float(line[4]),
+                                quantity=parse_float(line[5], 1.0),
+                                discount_class=discount_class,
+                                product_class=line[7],
+                                unknown=line[8],
+                                price_quantity=parse_float(line[9]),
+                                discount=parse_float(line[10]),
+                                quantity_discount=parse_float(line[11]),
+                                sale=parse_float(line[12]),
+                                price_final=parse_float(line[13])))
+
+    # format_bill writes the discount sums as positive numbers
+    return Bill(products=products, date=header_line[0], time=header_line[1],
+                store=header_line[2], payment=header_line[3],
+                price_quantity_sum=parse_float(header_line[9]),
+                discount_sum=parse_float(header_line[10]) * -1,
+                quantity_discount_sum=parse_float(header_line[11]) * -1,
+                sale_sum=parse_float(header_line[12]) * -1,
+                total=parse_float(header_line[13]))
+
+
+def read_bills(file_path, skip_rows=0, use_mmap=False):
+    """
+    Generator over the bills of a backup or export csv file, see
+    iter_bill_rows
+
+    Parameters:
+        file_path (str): Path to the csv file
+        skip_rows (int): Number of rows to skip at the start of the file
+        use_mmap (bool): If True, the file is memory-mapped
+
+    Yields:
+        bill (Bill): One bill of the file
+    """
+    for header_line, lines in iter_bill_rows(file_path, skip_rows, use_mmap):
+        yield bill_from_rows(header_line, lines)
+
+
+def output_folder(name):
+    """
+    Returns the path of a folder inside the output folder, e.g. of the bill
+    backups
+
+    Parameters:
+        name (str): Name of the folder, e.g. "bill_backups" or "export"
+
+    Returns:
+        folder (str): Path of the folder
+    """
+    return os.path.join(CONFIG["FOLDERS"]["output"], name)
 
 
 def export_bills():
     """
     This function is executed when the 'export' button is pressed in the GUI.
-    The row count of the output csv is calculated, this value is written into
-    field A1. The first row also holds a column description. All stored bills
-    are formatted and written into a csv file
+    All bills of this session are formatted and written into a csv file, see
+    write_export
     """
     if not BILLS:
         return
+    write_export(format_bills(BILLS))
 
-    # Create file name
-    out_path = CONFIG["FOLDERS"]["output"] + "export\\"
+
+def export_backups(start_date=None, end_date=None, stores=None):
+    """
+    Exports the bills of the backup folder, so bills of all sessions can be
+    exported again. Only one bill is held in memory at a time
+
+    Parameters:
+        start_date (str): First exported date, e.g. "2021-04-01". None for no
+                          limit
+        end_date (str): Last exported date, None for no limit
+        stores (collection of str): Only bills of these stores are exported.
+                                    None for all stores
+
+    Returns:
+        out_path (str): Path of the export file, None if no bill was found
+    """
+    return write_export(iter_backups(start_date, end_date, stores))
+
+
+def list_backups(start_date=None, end_date=None):
+    """
+    Returns the paths of the bill backup files in the order of their date and
+    time. The date range is checked on the file names, no file is opened
+
+    Parameters:
+        start_date (str): First date, e.g. "2021-04-01". None for no limit
+        end_date (str): Last date, None for no limit
+
+    Returns:
+        paths (list of str): Paths of the backup files
+    """
+    folder = output_folder("bill_backups")
+    try:
+        # The file names start with date and time, e.g. 2021-04-03T12-34_Billa
+        names = sorted(name for name in os.listdir(folder)
+                       if name.endswith(".csv"))
+    except FileNotFoundError:
+        return []
+
+    paths = []
+    for name in names:
+        # Dates are compared as text, which works for the ISO format
+        date = name.partition('T')[0]
+        if start_date is not None and date < start_date:
+            continue
+        if end_date is not None and date > end_date:
+            break
+        paths.append(os.path.join(folder, name))
+    return paths
+
+
+def iter_backups(start_date=None, end_date=None, stores=None):
+    """
+    Generator over the bills of the backup files in the order of their date
+    and time. The backups hold the rows created by format_bill, so they are
+    passed on without being formatted again
+
+    Parameters:
+        start_date (str): First date, e.g. "2021-04-01". None for no limit
+        end_date (str): Last date, None for no limit
+        stores (collection of str): Only bills of these stores. None for all
+                                    stores
+
+    Yields:
+        header_line (list): Header line of one bill, see format_bill
+        lines (list of lists): Product lines of the bill
+    """
+    for path in list_backups(start_date, end_date):
+        for header_line, lines in iter_bill_rows(path):
+            if stores is None or header_line[2] in stores:
+                yield header_line, lines
+
+
+def bill_hash(source, header_line, lines):
+    """
+    Returns a hash of a formatted bill and the file it was read from, to
+    recognise bills which were already exported. Bills with the same rows in
+    different backup files, e.g. a bill saved twice, get different hashes
+
+    Parameters:
+        source (str): Name of the backup file and position of the bill in it,
+                      e.g. "2021-04-03T12-34_Billa.csv:0"
+        header_line (list): Header line of the bill, see format_bill
+        lines (list of lists): Product lines of the bill
+
+    Returns:
+        (str): Hex digest of the source and the rows
+    """
+    rows = json.dumps([source, header_line] + lines, ensure_ascii=False)
+    return hashlib.sha1(rows.encode("utf-8")).hexdigest()
+
+
+def read_export_watermark():
+    """
+    Reads the state of the last export_new_backups run
+
+    Returns:
+        watermark (dict): "date_time": date and time of the newest exported
+                          bill, e.g. "2021-04-12T23-10", '' before the first
+                          run. "run_time": time.time() of the last run.
+                          "hashes": key: bill_hash, field: date and time of
+                          the bill, only of the exported bills which can be
+                          read again by the next run
+    """
+    path = CONFIG["FILES"]["export watermark"]
+    if not os.path.isfile(path):
+        return {"date_time": '', "run_time": 0.0, "hashes": {}}
+    return read_json(path)
+
+
+def write_export_watermark(watermark):
+    """
+    Writes the state of an export_new_backups run. The file is replaced in one
+    step, so a crash leaves the old or the new watermark
+
+    Parameters:
+        watermark (dict): See read_export_watermark
+    """
+    path = CONFIG["FILES"]["export watermark"]
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    # Same encoding as read_json
+    with open(path + ".tmp", 'w', encoding="utf-8") as out_file:
+        json.dump(watermark, out_file, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def export_new_backups():
+    """
+    Exports only the backups which were added since the last run of this
+    function into a new export file, so exporting regularly stays cheap. A
+    backup is read if the date and time of its file name are not older than
+    the newest exported bill, or if the file was changed since the last run,
+    e.g. when a bill of an earlier day was typed in later. Bills whose hash
+    is in the watermark were already exported and are skipped. The hash
+    includes the backup file, so every backup file is exported once.
+    Backups are only created, never changed: the modification times are only
+    read if a file was added to the backup folder since the last run, and
+    only the hashes of bills which can be read again are kept
+
+    Returns:
+        out_path (str): Path of the export file, None if there were no new
+                        bills
+    """
+    watermark = read_export_watermark()
+    hashes = watermark["hashes"]
+    newest = watermark["date_time"]
+    run_time = time.time()
+    last_run_time = watermark["run_time"] - MTIME_SLACK
+
+    # A backup whose name is older than the watermark can only be new if it
+    # was added to the folder since the last run
+    folder = output_folder("bill_backups")
+    added = os.path.isdir(folder) and \
+        os.path.getmtime(folder) > last_run_time
+    paths = [path for path in list_backups()
+             if os.path.basename(path) >= watermark["date_time"] or
+             added and os.path.getmtime(path) > last_run_time]
+
+    # Hashes of bills in files which the next run reads again, as they were
+    # written shortly before or during this run
+    written_during_run = set()
+
+    def new_bills():
+        nonlocal newest
+        for path in paths:
+            name = os.path.basename(path)
+            written = os.path.getmtime(path) > run_time - MTIME_SLACK
+            for index, (header_line, lines) in \
+                    enumerate(iter_bill_rows(path)):
+                digest = bill_hash(f"{name}:{index}", header_line, lines)
+                if written:
+                    written_during_run.add(digest)
+                if digest in hashes:
+                    continue
+                # Same format as the backup file names
+                date_time = header_line[0] + 'T' + \
+                    header_line[1].replace(':', '-')
+                hashes[digest] = date_time
+                newest = max(newest, date_time)
+                yield header_line, lines
+
+    out_path = write_export(new_bills())
+    # The watermark is only moved after the export file was written. Bills
+    # older than the newest exported bill are only read again if their file
+    # was written during this run, the other hashes are dropped
+    hashes = {digest: date_time for digest, date_time in hashes.items()
+              if date_time >= newest or digest in written_during_run}
+    write_export_watermark({"date_time": newest, "run_time": run_time,
+                            "hashes": hashes})
+    return out_path
+
+
+def write_export(formatted_bills, prefix=''):
+    """
+    Writes bills into a new csv file of the export folder. The row count of
+    the file is written into field A1, so the excel macro knows it. The first
+    row also holds a column description. The file name holds the date range
+    and the number of bills.
+    The rows are streamed into a temporary file while the row count and the
+    date range are counted, then the export file is created and the temporary
+    file is copied behind its first line. So the bills are read only once and
+    never held in memory together
+
+    Parameters:
+        formatted_bills (iterable): (header_line, lines) of every bill, as
+                                    returned by format_bill
+        prefix (str): Put in front of the file name, e.g. for the partitions
+                      of export_partitions
+
+    Returns:
+        out_path (str): Path of the export file, None if there were no bills
+    """
+    folder = output_folder("export")
     encoding = CONFIG["DEFAULT"]["encoding"]
-    bill_count = len(BILLS)
-    bill_dates = []
+    delimiter = CONFIG["DEFAULT"]["delimiter"]
+    os.makedirs(folder, exist_ok=True)
+
+    bill_count = 0
     line_count = 0
-    for bill in BILLS:
-        # line_count is written into field A1 of the csv so the excel macro
-        # knows the row count
-        line_count += len(bill.products) + 2
-        bill_dates.append(bill.date)
-    print("line_count: ", line_count)
-    sorted(bill_dates)
+    first_date = None
+    last_date = None
+    with tempfile.TemporaryFile('w+', newline='', encoding=encoding,
+                                dir=folder) as tmp_file:
+        file_writer = csv.writer(tmp_file, delimiter=delimiter,
+                                 quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        for header_line, lines in formatted_bills:
+            file_writer.writerow(header_line)
+            file_writer.writerows(lines)
+            file_writer.writerow('')
+
+            bill_count += 1
+            # Header line, product lines and the empty line
+            line_count += len(lines) + 2
+            date = header_line[0]
+            if first_date is None or date < first_date:
+                first_date = date
+            if last_date is None or date > last_date:
+                last_date = date
+
+        if not bill_count:
+            return None
+        print("line_count: ", line_count)
+
+        # Create file name
+        date_range = first_date + "_to_" + last_date
+        file_name = prefix + date_range + "_" + str(bill_count) + "bills"
+
+        first_line = [line_count, "Zeit", "Händler", "Bezeichnung",
+                      "Preis", "Menge", "RK", "WK", "", "Preis", "Rabatt",
+                      "Mengenrab", "Aktion", "Preis"]
+
+        tmp_file.seek(0)
+        with open_unique_file(os.path.join(folder, file_name),
+                              encoding) as out_file:
+            file_writer = csv.writer(out_file, delimiter=delimiter,
+                                     quotechar='|', quoting=csv.QUOTE_MINIMAL)
+            file_writer.writerow(first_line)
+            shutil.copyfileobj(tmp_file, out_file)
+            return out_file.name
+
+
+# Columns of the bill header lines which export_partitions can split by. The
+# month is taken from the date
+PARTITION_KEYS = {"month": 0, "store": 2, "payment": 3}
+
+
+def partition_value(header_line, key):
+    """
+    Returns the partition of a bill for export_partitions
+
+    Parameters:
+        header_line (list): Header line of the bill, see format_bill
+        key (str): One of PARTITION_KEYS
+
+    Returns:
+        value (str): E.g. "2021-04" for the month or "Billa" for the store
+    """
+    value = header_line[PARTITION_KEYS[key]]
+    if key == "month":
+        value = value[:7]
+    return value
+
+
+def read_partition_values(paths, key):
+    """
+    Finds the partitions of the bills of some backup files. Used by
+    export_partitions, once per chunk in a process pool
+
+    Parameters:
+        paths (list of str): Paths to the backup files
+        key (str): One of PARTITION_KEYS
+
+    Returns:
+        values (list of tuples): (path, value) for every bill of the files
+    """
+    values = []
+    for path in paths:
+        for header_line, _ in iter_bill_rows(path):
+            values.append((path, partition_value(header_line, key)))
+    return values
+
+
+def export_partition(paths, key, value):
+    """
+    Writes the bills of one partition into its own export file. Used by
+    export_partitions, once per partition in a process pool
+
+    Parameters:
+        paths (list of str): Backup files holding bills of the partition
+        key (str): One of PARTITION_KEYS
+        value (str): The partition, see partition_value
+
+    Returns:
+        value (str): The partition
+        out_path (str): Path of the export file
+        summary (dict): "bills", "rows" and "total" of the export file
+    """
+    summary = {"bills": 0, "rows": 0, "total": 0.0}
+
+    def bills():
+        for path in paths:
+            for header_line, lines in iter_bill_rows(path):
+                if partition_value(header_line, key) != value:
+                    continue
+                summary["bills"] += 1
+                summary["rows"] += len(lines) + 2
+                summary["total"] += parse_float(header_line[13])
+                yield header_line, lines
+
+    # Can not have ':' or folders in file name
+    name = value.replace(':', '-').replace(' ', '_')
+    name = name.replace('/', '-').replace('\\', '-')
+    out_path = write_export(bills(), key + "_" + name + "_")
+    summary["total"] = round(summary["total"], 2)
+    return value, out_path, summary
+
+
+def init_export_worker(config):
+    """
+    Sets CONFIG in a process of the export_partitions pool, processes which
+    are spawned instead of forked do not inherit it
+
+    Parameters:
+        config (dict): key: config section, field: dict of its raw values
+    """
+    global CONFIG
+    CONFIG = configparser.ConfigParser()
+    CONFIG.read_dict(config)
+
+
+def export_partitions(key, start_date=None, end_date=None, workers=None):
+    """
+    Exports the bills of the backup folder into one export file per month,
+    store or payment, and a manifest csv listing the file, bill count, row
+    count and total of every partition. With more than one worker, the
+    partitions are found and written in a process pool
+
+    Parameters:
+        key (str): One of PARTITION_KEYS
+        start_date (str): First exported date, e.g. "2021-04-01". None for no
+                          limit
+        end_date (str): Last exported date, None for no limit
+        workers (int): Number of processes, None for the "export workers"
+                       config value
+
+    Returns:
+        manifest_path (str): Path of the manifest, None if no bill was found
+    """
+    if key not in PARTITION_KEYS:
+        raise ValueError(f"unknown partition key: {key}")
+    if workers is None:
+        workers = CONFIG["DEFAULT"].getint("export workers", fallback=1)
+    paths = list_backups(start_date, end_date)
+    if not paths:
+        return None
+
+    if workers > 1:
+        config = {section: dict(CONFIG.items(section, raw=True))
+                  for section in CONFIG.sections()}
+        config.update({"DEFAULT": dict(CONFIG.defaults())})
+        executor = concurrent.futures.ProcessPoolExecutor(
+            workers, initializer=init_export_worker, initargs=(config,))
+    else:
+        executor = None
+
+    try:
+        # The partitions of the bills are found first, so every partition
+        # can be written by one worker without reading all backups
+        chunk_size = -(-len(paths) // max(workers, 1))
+        chunks = [paths[index:index + chunk_size]
+                  for index in range(0, len(paths), chunk_size)]
+        if executor is None:
+            results = map(read_partition_values, chunks,
+                          [key] * len(chunks))
+        else:
+            results = executor.map(read_partition_values, chunks,
+                                   [key] * len(chunks))
+        partitions = dict()
+        for chunk in results:
+            for path, value in chunk:
+                partition = partitions.setdefault(value, [])
+                # Backups hold one bill, export files can hold more
+                if not partition or partition[-1] != path:
+                    partition.append(path)
+
+        values = sorted(partitions)
+        if executor is None:
+            results = map(export_partition,
+                          [partitions[value] for value in values],
+                          [key] * len(values), values)
+        else:
+            results = executor.map(export_partition,
+                                   [partitions[value] for value in values],
+                                   [key] * len(values), values)
+        results = list(results)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if not results:
+        return None
+
+    # Create file name
+    folder = output_folder("export")
+    encoding = CONFIG["DEFAULT"]["encoding"]
+    with open_unique_file(os.path.join(folder, "manifest_" + key),
+                          encoding) as out_file:
+        file_writer = csv.writer(out_file,
+                                 delimiter=CONFIG["DEFAULT"]["delimiter"],
+                                 quotechar='|', quoting=csv.QUOTE_MINIMAL)
+        file_writer.writerow([key, "Datei", "Rechnungen", "Zeilen", "Summe"])
+        for value, out_path, summary in results:
+            # German format, decimal sign is comma
+            total = f'{summary["total"]:.2f}'.replace('.', ',')
+            file_writer.writerow([value, os.path.basename(out_path),
+                                  summary["bills"], summary["rows"], total])
+        return out_file.name
+
+
+def history_key(item):
+    """
+    Hashable key of a history entry. Two entries have the same key exactly when
+    they are equal dicts, so duplicates are found with a set instead of
+    comparing with every entry of the history
+
+    Parameters:
+        item (dict): One purchase of the product history
+
+    Returns:
+        (tuple or str): Sorted (key, value) pairs, or the json text of the entry
+                        if a value can not be hashed
+    """
+    key = tuple(sorted(item.items()))
+    try:
+        hash(key)
+    except TypeError:
+        key = json.dumps(item, sort_keys=True)
+    return key
+
+
+def merge_histories(*histories):
+    """
+    Joins histories and removes duplicate entries, keeping the first
+    occurrence. Runs in linear time
+
+    Parameters:
+        histories (lists of dicts): The histories to join, in order
+
+    Returns:
+        history (list of dicts): All distinct entries
+    """
+    seen = set()
+    history = []
+    for part in histories:
+        for item in part:
+            key = history_key(item)
+            if key not in seen:
+                seen.add(key)
+                history.append(item)
+    return history
+
+
+def remember_template_defaults(identifier, data):
+    """
+    Stores the saved template values of a product in TEMPLATE_DEFAULTS
+
+    Parameters:
+        identifier (int): Identifier of the product
+        data (dict): Content of the product json file, the history is not
+                     needed
+    """
+    TEMPLATE_DEFAULTS.update({identifier: {
+        "default_price_per_unit": data["default_price_per_unit"],
+        "default_quantity": data["default_quantity"],
+        "product_class": data["product_class"],
+        "unknown": data["unknown"]}})
+
+
+def template_defaults(name):
+    """
+    Returns the saved template values of a product
+
+    Parameters:
+        name (str): Name of the product
+
+    Returns:
+        (dict): See TEMPLATE_DEFAULTS, None if the product was never saved as
+                a template
+    """
+    product = TEMPLATES.get(name)
+    if product is None:
+        return None
+    return TEMPLATE_DEFAULTS.get(product.identifier)
+
+
+def update_product_json(product):
+    """
+    Reads the purchase history from the json file, adds the current purchase and
+    overwrites the json with this updated information
+
+    Parameters:
+        product (Product): Object holding the data to be saved as a json
+    """
+    name = product.name
+    default_price_per_unit = product.price_single
+    default_quantity = product.quantity
+    product_class = product.product_class
+    unknown = product.unknown
+    display = product.display
+    notes = product.notes
+    filename = "product_" + f"{product.identifier:05}" + ".json"
+    path = CONFIG["FOLDERS"]["product folder"]
+    encoding = CONFIG["DEFAULT"]["encoding"]
+
+    remember_template_defaults(product.identifier,
+                               {"default_price_per_unit":
+                                    default_price_per_unit,
+                                "default_quantity": default_quantity,
+                                "product_class": product_class,
+                                "unknown": unknown})
+
+    if use_database():
+        # The database skips history entries which are already stored
+        print("saving ", name, " in database")
+        database.write_product(get_database(), product.identifier,
+                               {"name": name,
+                                "default_price_per_unit":
+                                    default_price_per_unit,
+                                "default_quantity": default_quantity,
+                                "product_class": product_class,
+                                "unknown": unknown,
+                                "display": display,
+                                "notes": notes,
+                                "history": product.history})
+        PRODUCT_KEYS.update({name: "product_" + f"{product.identifier:05}"})
+        return
+
+    if os.path.isfile(path + filename):
+        with open(path + filename, 'r', encoding=encoding) as in_file:
+            data = json.load(in_file)
+
+        history = merge_histories(data["history"], product.history)
+    else:
+        history = merge_histories(product.history)
+
+    print("saving ", name, " as ", filename)
+
+    out_dict = {"name": name,
+                "default_price_per_unit": default_price_per_unit,
+                "default_quantity": default_quantity,
+                "product_class": product_class,
+                "unknown": unknown,
+                "display": display,
+                "notes": notes,
+                "history": history}
+
+    with open(path + filename, 'w', encoding=encoding) as out_file:
+        json.dump(out_dict, out_file, indent=2)
+
+    # Update PRODUCT_KEYS dict, the json is written by REGISTRIES.flush()
+    product_key = "product_" + f"{product.identifier:05}"
+    REGISTRIES.mark("product keys", PRODUCT_KEYS.get(name) != product_key)
+    PRODUCT_KEYS.update({name: product_key})
+
+
+def update_product_history(product):
+    """
+    Read data from product json file. Replace history with the current history.
+    Write back into product json file
+
+    Parameters:
+        product (Product): The product in question
+    """
+    add_product_history(product.identifier, product.history)
+
+
+def add_product_history(identifier, history):
+    """
+    Adds history entries to the product json file or the database. Entries
+    which are already saved are skipped
+
+    Parameters:
+        identifier (int): Identifier of the product
+        history (list of dicts): Purchases of the product
+    """
+    filename = "product_" + f"{identifier:05}" + ".json"
+    path = CONFIG["FOLDERS"]["product folder"]
+    encoding = CONFIG["DEFAULT"]["encoding"]
+
+    if use_database():
+        if database.product_exists(get_database(), identifier):
+            database.add_history(get_database(), identifier, history)
+        return
+
+    if not os.path.isfile(path + filename):
+        return
+
+    with open(path + filename, 'r', encoding=encoding) as in_file:
+        data = json.load(in_file)
+
+    history = merge_histories(data["history"], history)
+
+    out_dict = {"name": data["name"],
+                "default_price_per_unit": data["default_price_per_unit"],
+                "default_quantity": data["default_quantity"],
+                "product_class": data["product_class"],
+                "unknown": data["unknown"],
+                "display": data["display"],
+                "notes": data["notes"],
+                "history": history}
+
+    with open(path + filename, 'w', encoding=encoding) as out_file:
+        json.dump(out_dict, out_file, indent=2)
+
+
+def use_history_log():
+    """
+    Checks the config file to see if purchases are appended to the history log
+    instead of rewriting the product json file. Only used with json storage,
+    the database adds single history rows anyway
+
+    Returns:
+        (bool): True if the history log is used
+    """
+    return not use_database() and \
+        CONFIG["DEFAULT"].getboolean("use history log", fallback=False)
+
+
+def read_history_log():
+    """
+    Reads the history log file into HISTORY_LOG. An incomplete last line, e.g.
+    after a crash while writing, is skipped
+    """
+    HISTORY_LOG.clear()
+    log_path = CONFIG["FILES"]["history log"]
+    if not os.path.isfile(log_path):
+        return
+    with open(log_path, 'r', encoding=CONFIG["DEFAULT"]["encoding"]) as in_file:
+        for line in in_file:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            HISTORY_LOG.setdefault(record["identifier"], []).append(
+                record["entry"])
+    print("history log entries: ", sum(len(field) for field in
+                                       HISTORY_LOG.values()))
+
+
+def append_history_log(identifier, entries):
+    """
+    Appends purchases of one product to the history log file, one json line per
+    purchase. Nothing is written if the product has no json file, same as
+    update_product_history
 
-    date_range = bill_dates[0] + "_to_" + bill_dates[-1]
+    Parameters:
+        identifier (int): Identifier of the purchased product
+        entries (list of dicts): The new history entries
+    """
+    filename = "product_" + f"{identifier:05}" + ".json"
+    if not os.path.isfile(CONFIG["FOLDERS"]["product folder"] + filename):
+        return
+
+    log_path = CONFIG["FILES"]["history log"]
+    with open(log_path, 'a', encoding=CONFIG["DEFAULT"]["encoding"]) as \
+            out_file:
+        for entry in entries:
+            out_file.write(json.dumps({"identifier": identifier,
+                                       "entry": entry}) + "\n")
+    HISTORY_LOG.setdefault(identifier, []).extend(entries)
+
+
+def merge_history_log(identifier, history):
+    """
+    Returns the history of a product json file together with the purchases of
+    the product in the history log which are not part of it yet
+
+    Parameters:
+        identifier (int): Identifier of the product
+        history (list of dicts): History read from the product json file
+
+    Returns:
+        history (list of dicts): The complete history
+    """
+    pending = HISTORY_LOG.get(identifier)
+    if not pending:
+        return history
+    return merge_histories(history, pending)
+
+
+def compact_history_log():
+    """
+    Moves all purchases of the history log into the product json files and
+    empties the log. If the program stops during compaction, the log is kept
+    and the already moved purchases are skipped as duplicates the next time
 
-    file_name = date_range + "_" + str(bill_count) + "bills"
-    out_path += file_name
+    Returns:
+        entry_count (int): Number of moved purchases
+    """
+    path = CONFIG["FOLDERS"]["product folder"]
+    encoding = CONFIG["DEFAULT"]["encoding"]
+    entry_count = 0
+    for identifier, entries in HISTORY_LOG.items():
+        filename = "product_" + f"{identifier:05}" + ".json"
+        if not os.path.isfile(path + filename):
+            continue
+        with open(path + filename, 'r', encoding=encoding) as in_file:
+            data = json.load(in_file)
+        data["history"] = merge_history_log(identifier, data["history"])
+        with open(path + filename, 'w', encoding=encoding) as out_file:
+            json.dump(data, out_file, indent=2)
+        entry_count += len(entries)
 
-    out_path = create_unique_filename(out_path)
+    # Empty the log only after all product files are written
+    with open(CONFIG["FILES"]["history log"], 'w', encoding=encoding):
+        pass
+    HISTORY_LOG.clear()
+    print("compacted history log entries: ", entry_count)
+    return entry_count
 
-    out_path += ".csv"
 
-    first_line = [line_count, "Zeit", "Händler", "Bezeichnung",
-                  "Preis", "Menge", "RK", "WK", "", "Preis", "Rabatt",
-                  "Mengenrab", "Aktion", "Preis"]
+def compact_history_log_if_large():
+    """
+    Runs compact_history_log() if the history log holds more purchases than the
+    "history log compact size" config value
+    """
+    entry_count = sum(len(field) for field in HISTORY_LOG.values())
+    if entry_count > CONFIG["DEFAULT"].getint("history log compact size",
+                                              fallback=1000):
+        compact_history_log()
+
+
+def use_bill_journal():
+    """
+    Checks the config file to see if saved bills are appended to the bill
+    journal and applied to the other files in batches
+
+    Returns:
+        (bool): True if the bill journal is used
+    """
+    return CONFIG["DEFAULT"].getboolean("use bill journal", fallback=False)
 
-    with open(out_path, 'w', newline='', encoding=encoding) as out_file:
-        file_writer = csv.writer(out_file,
-                                 delimiter=CONFIG["DEFAULT"]["delimiter"],
-                                 quotechar='|', quoting=csv.QUOTE_MINIMAL)
-        file_writer.writerow(first_line)
 
-        for bill in BILLS:
-            header_line, lines = format_bill(bill)
-            file_writer.writerow(header_line)
-            for line in lines:
-                file_writer.writerow(line)
+def get_journal():
+    """
+    Returns the bill journal, opens it on first use
 
-            file_writer.writerow('')
+    Returns:
+        JOURNAL (journal.BillJournal): The bill journal
+    """
+    global JOURNAL
+    if JOURNAL is None:
+        JOURNAL = journal.BillJournal(CONFIG["FILES"]["bill journal"],
+                                      CONFIG["DEFAULT"]["encoding"])
+    return JOURNAL
 
 
-def update_product_json(product):
+def journal_bill(bill, purchases, new_store, new_payment):
     """
-    Reads the purchase history from the json file, adds the current purchase and
-    overwrites the json with this updated information
+    Appends a saved bill to the bill journal. This single synced write replaces
+    the writes of the product files, registries and backup csv, which are done
+    by apply_journal() once "journal batch size" bills are in the journal
 
     Parameters:
-        product (Product): Object holding the data to be saved as a json
+        bill (Bill): The saved bill
+        purchases (list of lists): [product identifier, history entry] of every
+                                   purchase added to a product history
+        new_store (str): Store which was added by this bill, '' if none
+        new_payment (str): Payment method which was added by this bill, '' if
+                           none
     """
-    name = product.name
-    default_price_per_unit = product.price_single
-    default_quantity = product.quantity
-    product_class = product.product_class
-    unknown = product.unknown
-    display = product.display
-    notes = product.notes
-    filename = "product_" + f"{product.identifier:05}" + ".json"
-    path = CONFIG["FOLDERS"]["product folder"]
-    encoding = CONFIG["DEFAULT"]["encoding"]
+    if bill.products:
+        bill_data = dict(vars(bill))
+        bill_data["products"] = [{field: getattr(product, field)
+                                  for field in JOURNAL_PRODUCT_FIELDS}
+                                 for product in bill.products]
+    else:
+        bill_data = None
+    get_journal().append({"bill": bill_data, "purchases": purchases,
+                          "store": new_store, "payment": new_payment})
 
-    if os.path.isfile(path + filename):
-        with open(path + filename, 'r', encoding=encoding) as in_file:
-            data = json.load(in_file)
+    if len(JOURNAL) >= CONFIG["DEFAULT"].getint("journal batch size",
+                                                fallback=20):
+        submit_apply_journal()
 
-        history = []
-        for item in data["history"]:
-            if item not in history:
-                history.append(item)
-        for item in product.history:
-            if item not in history:
-                history.append(item)
-    else:
-        history = []
-        for item in product.history:
-            if item not in history:
-                history.append(item)
 
-    print("saving ", name, " as ", filename)
+def apply_journal(replay=False):
+    """
+    Writes the file updates of all pending bill journal records: product
+    histories, stores and payments json and backup csv files. The purchases of
+    all records are grouped, so every product file is written once per batch.
+    The records are removed from the journal afterwards. Applying a record
+    twice, e.g. after a crash during this function, does not duplicate data
 
-    out_dict = {"name": name,
-                "default_price_per_unit": default_price_per_unit,
-                "default_quantity": default_quantity,
-                "product_class": product_class,
-                "unknown": unknown,
-                "display": display,
-                "notes": notes,
-                "history": history}
+    Parameters:
+        replay (bool): True if the records are from an earlier run of the
+                       program, backups which exist already are not written
+                       again
+    """
+    records = get_journal().pending()
+    if not records:
+        return
 
-    with open(path + filename, 'w', encoding=encoding) as out_file:
-        json.dump(out_dict, out_file, indent=2)
+    purchases = dict()
+    for record in records:
+        for identifier, entry in record["purchases"]:
+            purchases.setdefault(identifier, []).append(entry)
+        if record["store"]:
+            REGISTRIES.mark("stores")
+        if record["payment"]:
+            REGISTRIES.mark("payments")
+
+    for identifier, entries in purchases.items():
+        if use_history_log():
+            append_history_log(identifier, entries)
+        else:
+            add_product_history(identifier, entries)
 
-    # Update PRODUCT_KEYS dict
-    PRODUCT_KEYS.update({name: "product_" + f"{product.identifier:05}"})
-    update_product_keys()
+    for record in records:
+        if record["bill"] is not None:
+            bill_data = dict(record["bill"])
+            bill_data["products"] = [Product(**fields) for fields
+                                     in bill_data["products"]]
+            backup_bill(Bill(**bill_data), skip_existing=replay)
 
+    REGISTRIES.flush()
+    JOURNAL.discard(len(records))
+    print("bill journal records applied: ", len(records))
 
-def update_product_history(product):
-    """
-    Read data from product json file. Replace history with the current history.
-    Write back into product json file
 
-    Parameters:
-        product (Product): The product in question
+def replay_journal():
     """
-    filename = "product_" + f"{product.identifier:05}" + ".json"
-    path = CONFIG["FOLDERS"]["product folder"]
-    encoding = CONFIG["DEFAULT"]["encoding"]
-
-    if not os.path.isfile(path + filename):
+    Applies the bill journal records which were saved but not applied before
+    the program stopped. Their stores, payments and purchases are also added to
+    the data which was read from the files
+    """
+    if not use_bill_journal():
+        return
+    records = get_journal().pending()
+    if not records:
         return
 
-    with open(path + filename, 'r', encoding=encoding) as in_file:
-        data = json.load(in_file)
+    global PAYMENTS
+    for record in records:
+        if record["store"] and record["store"] not in STORES:
+            STORES.update({record["store"]: {"default_payment": '',
+                                             "default_discount_class": ''}})
+        if record["payment"] and record["payment"] not in PAYMENTS:
+            PAYMENTS.append(record["payment"])
+        for identifier, entry in record["purchases"]:
+            product = TEMPLATES.get(IDENTIFIERS.names.get(identifier))
+            if product is None:
+                continue
+            # A lazy history is read from the files after they are updated
+            history = product.loaded_history()
+            if history is not None:
+                history[:] = merge_histories(history, [entry])
 
-    history = []
-    for item in data["history"]:
-        if item not in history:
-            history.append(item)
-    # history = data["history"]
-    for item in product.history:
-        if item not in history:
-            history.append(item)
-    # history.append(product.history)
+    print("replaying bill journal records: ", len(records))
+    apply_journal(replay=True)
 
-    out_dict = {"name": data["name"],
-                "default_price_per_unit": data["default_price_per_unit"],
-                "default_quantity": data["default_quantity"],
-                "product_class": data["product_class"],
-                "unknown": data["unknown"],
-                "display": data["display"],
-                "notes": data["notes"],
-                "history": history}
 
-    with open(path + filename, 'w', encoding=encoding) as out_file:
-        json.dump(out_dict, out_file, indent=2)
+def merge_journal(identifier, history):
+    """
+    Returns the history of a product together with its purchases in bill
+    journal records which are not applied yet
+
+    Parameters:
+        identifier (int): Identifier of the product
+        history (list of dicts): History read from the product json file or
+                                 database
+
+    Returns:
+        history (list of dicts): The complete history
+    """
+    if JOURNAL is None or not len(JOURNAL):
+        return history
+    pending = [entry for record in JOURNAL.pending()
+               for record_id, entry in record["purchases"]
+               if record_id == identifier]
+    if not pending:
+        return history
+    return merge_histories(history, pending)
 
 
 def update_stores():
@@ -552,6 +2103,10 @@ def update_product_keys():
     """
     Writes PRODUCT_KEYS dict into json file
     """
+    if use_database():
+        database.write_product_keys(get_database(), PRODUCT_KEYS)
+        return
+
     key_json = CONFIG["FILES"]["product keys json"]
     encoding = CONFIG["DEFAULT"]["encoding"]
     out_dict = OrderedDict(sorted(PRODUCT_KEYS.items()))
@@ -560,41 +2115,230 @@ def update_product_keys():
         json.dump(out_dict, out_file, indent=2)
 
 
+def read_product_history(identifier):
+    """
+    Reads the purchase history of one product from its json file or from the
+    database
+
+    Parameters:
+        identifier (int): Identifier of the product
+
+    Returns:
+        history (list of dicts): All saved purchases of the product
+    """
+    # The file may still be written by the background writer
+    wait_for_product_writes(identifier)
+
+    if use_database():
+        return merge_journal(identifier,
+                             database.read_history(get_database(),
+                                                   identifier))
+
+    filename = "product_" + f"{identifier:05}" + ".json"
+    path = CONFIG["FOLDERS"]["product folder"]
+    if not os.path.isfile(path + filename):
+        return []
+    with open(path + filename, 'r',
+              encoding=CONFIG["DEFAULT"]["encoding"]) as in_file:
+        history = json.load(in_file)["history"]
+    return merge_journal(identifier, merge_history_log(identifier, history))
+
+
+def lazy_history():
+    """
+    Checks the config file to see if the product history should be read on
+    first access instead of at program start
+
+    Returns:
+        (bool): True if the history is loaded lazily
+    """
+    return CONFIG["DEFAULT"].getboolean("lazy history", fallback=False)
+
+
+def read_product_files(paths, encoding, lazy):
+    """
+    Parses a list of product json files. Used by read_products, either directly
+    or once per chunk in a thread or process pool
+
+    Parameters:
+        paths (list of str): Paths to the product json files
+        encoding (str): Encoding of the json files
+        lazy (bool): If true, the history is dropped and set to None
+
+    Returns:
+        records (list of tuples): (identifier, data) for every file, data is the
+                                  content of the json file
+    """
+    records = []
+    for path in paths:
+        with open(path, 'r', encoding=encoding) as in_file:
+            data = json.load(in_file)
+        identifier = os.path.basename(path).replace("product_", '')
+        identifier = identifier.replace(".json", '')
+        identifier = int(identifier)
+        if lazy:
+            data["history"] = None
+        records.append((identifier, data))
+    return records
+
+
+def list_product_files():
+    """
+    Lists all files in the "products" folder
+
+    Returns:
+        paths (list of str): Paths of the product json files in the order
+                             os.walk() returns them
+    """
+    paths = []
+    for root, _, files in os.walk(CONFIG["FOLDERS"]["product folder"]):
+        for file in files:
+            paths.append(os.path.join(root, file))
+    return paths
+
+
+def parse_product_files(paths):
+    """
+    Parses the given product json files, in a thread or process pool if the
+    "loader workers" config value is larger than 1
+
+    Parameters:
+        paths (list of str): Paths to the product json files
+
+    Returns:
+        records (list of tuples): (identifier, data) for every file, in the
+                                  order of paths
+    """
+    encoding = CONFIG["DEFAULT"]["encoding"]
+    lazy = lazy_history()
+    workers = CONFIG["DEFAULT"].getint("loader workers", fallback=1)
+    pool = CONFIG["DEFAULT"].get("loader pool", "thread")
+
+    if workers <= 1 or len(paths) <= 1:
+        return read_product_files(paths, encoding, lazy)
+
+    # Split the file list into one chunk per worker. The chunks are merged
+    # in order, so TEMPLATES ends up the same as with a single worker
+    chunk_size = -(-len(paths) // workers)
+    chunks = [paths[index:index + chunk_size]
+              for index in range(0, len(paths), chunk_size)]
+    if pool == "process":
+        executor = concurrent.futures.ProcessPoolExecutor(workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(workers)
+    with executor:
+        results = executor.map(read_product_files, chunks,
+                               [encoding] * len(chunks),
+                               [lazy] * len(chunks))
+        return [record for chunk in results for record in chunk]
+
+
+def add_product_records(records):
+    """
+    Creates a Product for every parsed product json file and stores it in
+    TEMPLATES and PRODUCT_KEYS
+
+    Parameters:
+        records (list of tuples): (identifier, data) as returned by
+                                  read_product_files
+    """
+    lazy = lazy_history()
+    for index, (identifier, data) in enumerate(records):
+        str_id = "product_" + f"{identifier:05}"
+        history = data["history"]
+        if history is not None:
+            history = merge_history_log(identifier, history)
+        temp = Product(name=data["name"],
+                       price_single=data["default_price_per_unit"],
+                       quantity=data["default_quantity"],
+                       product_class=data["product_class"],
+                       unknown=data["unknown"],
+                       history=history,
+                       display=data["display"],
+                       notes=data["notes"],
+                       identifier=identifier,
+                       lazy_history=lazy)
+        TEMPLATES.update({data["name"]: temp})
+        SEARCH_INDEX.add(data["name"])
+        IDENTIFIERS.add(identifier, data["name"])
+        remember_template_defaults(identifier, data)
+
+        PRODUCT_KEYS.update({data["name"]: str_id})
+
+        # Print status message every 500 files to show user that program is
+        # still running
+        if index % 500 == 0:
+            print("Reading file: ", str_id)
+
+    # PRODUCT_KEYS is rebuilt from the product files. Only if a product is
+    # missing from the product keys json, or has another key there, the json
+    # is written with the first save
+    if records:
+        saved_keys = read_saved_product_keys()
+        REGISTRIES.mark("product keys",
+                        any(saved_keys.get(name) != product_key
+                            for name, product_key in PRODUCT_KEYS.items()))
+
+
+def read_saved_product_keys():
+    """
+    Reads the product keys json as written by update_product_keys
+
+    Returns:
+        product_keys (dict): key: product name, field: e.g. "product_00001".
+                             Empty if the file does not exist or is broken
+    """
+    key_json = CONFIG["FILES"]["product keys json"]
+    if not os.path.isfile(key_json):
+        return dict()
+    try:
+        with open(key_json, 'r',
+                  encoding=CONFIG["DEFAULT"]["encoding"]) as in_file:
+            return json.load(in_file)
+    except ValueError:
+        return dict()
+
+
+def reset_history_cache():
+    """
+    Creates an empty HISTORY_CACHE with the size given in the config file
+    """
+    global HISTORY_CACHE
+    HISTORY_CACHE = HistoryCache(
+        CONFIG["DEFAULT"].getint("history cache size", fallback=500))
+
+
 def read_products():
     """
     Crawls through every file in the "products" folder, reads its contents and
-    saves it as a new product template in TEMPLATES
+    saves it as a new product template in TEMPLATES. With the "lazy history"
+    config value, the purchase history is not kept but read on first access
     """
-    product_folder = CONFIG["FOLDERS"]["product folder"]
-    encoding = CONFIG["DEFAULT"]["encoding"]
-    for root, _, files in os.walk(product_folder):
-        for index, file in enumerate(files):
-            input_json = os.path.join(root, file)
-            with open(input_json, 'r', encoding=encoding) as in_file:
-                data = json.load(in_file)
-                identifier = file.replace("product_", '')
-                identifier = identifier.replace(".json", '')
-                identifier = int(identifier)
-                str_id = "product_" + f"{identifier:05}"
-                # print(str_id, ", data: ", data)
-                # print(str_id)
-                temp = Product(name=data["name"],
-                               price_single=data["default_price_per_unit"],
-                               quantity=data["default_quantity"],
-                               product_class=data["product_class"],
-                               unknown=data["unknown"],
-                               history=data["history"],
-                               display=data["display"],
-                               notes=data["notes"],
-                               identifier=identifier)
-                TEMPLATES.update({data["name"]: temp})
-
-                PRODUCT_KEYS.update({data["name"]: str_id})
-
-            # Print status message every 500 files to show user that program is
-            # still running
-            if index % 500 == 0:
-                print("Reading file: ", str_id)
+    reset_history_cache()
+
+    if use_database():
+        read_products_database()
+        return
+
+    if use_history_log():
+        read_history_log()
+
+    start = time.perf_counter()
+    paths = list_product_files()
+    listed = time.perf_counter()
+    records = parse_product_files(paths)
+    parsed = time.perf_counter()
+    add_product_records(records)
+    merged = time.perf_counter()
+
+    workers = CONFIG["DEFAULT"].getint("loader workers", fallback=1)
+    pool = CONFIG["DEFAULT"].get("loader pool", "thread")
+    print(f"read_products: {len(records)} files, {workers} {pool} workers, "
+          f"list {listed - start:.3f}s, parse {parsed - listed:.3f}s, "
+          f"merge {merged - parsed:.3f}s, total {merged - start:.3f}s")
+
+    if use_history_log():
+        compact_history_log_if_large()
 
     print("TEMPLATES.keys(): ", TEMPLATES.keys())
     print("first TEMPLATES entry: ")
@@ -602,6 +2346,65 @@ def read_products():
         print(x, TEMPLATES[x])
 
 
+def read_products_database():
+    """
+    Reads all products and their history from the SQLite database and saves
+    them as product templates in TEMPLATES
+    """
+    connection = get_database()
+    lazy = lazy_history()
+    if lazy:
+        histories = dict()
+    else:
+        histories = database.read_all_histories(connection)
+    for (identifier, name, price_single, quantity, product_class, unknown,
+         display, notes) in database.read_product_rows(connection):
+        if lazy:
+            history = None
+        else:
+            history = histories.get(identifier, [])
+        temp = Product(name=name,
+                       price_single=price_single,
+                       quantity=quantity,
+                       product_class=product_class,
+                       unknown=unknown,
+                       history=history,
+                       display=bool(display),
+                       notes=notes,
+                       identifier=identifier,
+                       lazy_history=lazy)
+        TEMPLATES.update({name: temp})
+        SEARCH_INDEX.add(name)
+        IDENTIFIERS.add(identifier, name)
+        remember_template_defaults(identifier,
+                                   {"default_price_per_unit": price_single,
+                                    "default_quantity": quantity,
+                                    "product_class": product_class,
+                                    "unknown": unknown})
+        PRODUCT_KEYS.update({name: "product_" + f"{identifier:05}"})
+
+    # Keys which were stored without a product row, e.g. by the migration
+    for name, product_key in database.read_product_keys(connection).items():
+        if name not in PRODUCT_KEYS:
+            PRODUCT_KEYS.update({name: product_key})
+
+    print("TEMPLATES read from database: ", len(TEMPLATES))
+
+
+def migrate_products_to_database():
+    """
+    Imports all product json files and the product keys json into the SQLite
+    database. The json files are not changed
+
+    Returns:
+        product_count (int): Number of imported product files
+    """
+    return database.import_json_tree(get_database(),
+                                     CONFIG["FOLDERS"]["product folder"],
+                                     CONFIG["FILES"]["product keys json"],
+                                     CONFIG["DEFAULT"]["encoding"])
+
+
 def read_stores():
     """
     Reads the store information stored in the json and stores them in the STORES
@@ -644,39 +2447,271 @@ def read_payments():
     print("PAYMENTS: ", PAYMENTS)
 
 
-def regex_search(input_str):
+def file_signature(path):
+    """
+    Returns the modification time and size of a file, used to check if a file
+    changed since the startup snapshot was written
+
+    Parameters:
+        path (str): Path to the file
+
+    Returns:
+        (tuple): (modification time in ns, size in bytes)
+    """
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def snapshot_settings():
+    """
+    Config values the content of the startup snapshot depends on. If one of
+    them changed, the snapshot is not used
+
+    Returns:
+        (tuple): Version, storage, product folder, encoding and lazy history
+    """
+    return (SNAPSHOT_VERSION, use_database(),
+            CONFIG["FOLDERS"]["product folder"], CONFIG["DEFAULT"]["encoding"],
+            lazy_history())
+
+
+def read_snapshot(snapshot_path):
+    """
+    Reads the startup snapshot written by write_snapshot
+
+    Parameters:
+        snapshot_path (str): Path to the snapshot file
+
+    Returns:
+        snapshot (dict): Content of the snapshot, empty if there is no usable
+                         snapshot
+    """
+    try:
+        with open(snapshot_path, 'rb') as in_file:
+            snapshot = pickle.load(in_file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        return dict()
+
+    if snapshot.get("settings") != snapshot_settings():
+        return dict()
+    return snapshot
+
+
+def write_snapshot(snapshot_path, snapshot):
+    """
+    Writes the startup snapshot. The file is first written under a temporary
+    name and then renamed, so an interrupted write does not leave a broken
+    snapshot
+
+    Parameters:
+        snapshot_path (str): Path to the snapshot file
+        snapshot (dict): Content of the snapshot
+    """
+    folder = os.path.dirname(snapshot_path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    snapshot["settings"] = snapshot_settings()
+    with open(snapshot_path + ".tmp", 'wb') as out_file:
+        pickle.dump(snapshot, out_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(snapshot_path + ".tmp", snapshot_path)
+
+
+def read_data():
+    """
+    Reads products, stores, payments and discount classes. If the "startup
+    snapshot" config value is set, the content of the json files is taken from
+    the snapshot file in the cache folder and only files whose modification time
+    or size changed since the snapshot was written are parsed again. The
+    snapshot is then updated. Bill journal records which were not applied
+    before the program stopped are applied afterwards
+    """
+    if not CONFIG["DEFAULT"].getboolean("startup snapshot", fallback=False):
+        read_products()
+        read_stores()
+        read_payments()
+        read_discount_classes()
+        replay_journal()
+        return
+
+    global PAYMENTS
+    start = time.perf_counter()
+    snapshot_path = CONFIG["FOLDERS"]["cache"] + "startup_snapshot.pickle"
+    snapshot = read_snapshot(snapshot_path)
+    changed = not snapshot
+
+    # Products: reuse the parsed content of all unchanged product files
+    reset_history_cache()
+    cached_products = snapshot.get("products", dict())
+    products = dict()
+    if use_database():
+        read_products_database()
+    else:
+        if use_history_log():
+            read_history_log()
+        paths = list_product_files()
+        signatures = {path: file_signature(path) for path in paths}
+        stale = [path for path in paths
+                 if path not in cached_products or
+                 cached_products[path][0] != signatures[path]]
+        parsed = dict(zip(stale, parse_product_files(stale)))
+        records = []
+        for path in paths:
+            if path in parsed:
+                record = parsed[path]
+            else:
+                record = cached_products[path][1]
+            records.append(record)
+            products.update({path: (signatures[path], record)})
+        add_product_records(records)
+        print("startup snapshot: ", len(paths) - len(stale), " cached, ",
+              len(stale), " parsed product files")
+        if stale or len(paths) != len(cached_products):
+            changed = True
+
+    # Stores, payments and discount classes are reused the same way
+    registries = dict()
+    for config_key, read_function in (("stores json", read_stores),
+                                      ("payments json", read_payments),
+                                      ("discount classes json",
+                                       read_discount_classes)):
+        path = CONFIG["FILES"][config_key]
+        signature = file_signature(path)
+        cached = snapshot.get("registries", dict()).get(config_key)
+        if cached is not None and cached[0] == signature:
+            content = cached[1]
+            if config_key == "stores json":
+                STORES.update(content)
+            elif config_key == "payments json":
+                PAYMENTS = list(content)
+            else:
+                DISCOUNT_CLASSES.update(content)
+        else:
+            read_function()
+            if config_key == "stores json":
+                content = dict(STORES)
+            elif config_key == "payments json":
+                content = list(PAYMENTS)
+            else:
+                content = dict(DISCOUNT_CLASSES)
+            changed = True
+        registries.update({config_key: (signature, content)})
+
+    if changed:
+        write_snapshot(snapshot_path, {"products": products,
+                                       "registries": registries})
+    if use_history_log():
+        compact_history_log_if_large()
+    replay_journal()
+    print(f"read_data: {time.perf_counter() - start:.3f}s")
+
+
+def regex_search(input_str, session=None):
     """
     Treat the user template input as a regex pattern and match it with every
-    product name.
+    product name. '*' matches any text, the input can match anywhere in the
+    name. The SEARCH_INDEX is used to only check names which can match
 
     Parameters:
         input_str (str): The user input
+        session (search.SearchSession): If given, the search narrows the
+                                        previous result of this session
     Returns:
         out_dict (dict): Dict holding all matching products.
                          Key = TEMPLATES.key, Field = TEMPLATES.field
     """
+    if session is None:
+        names = SEARCH_INDEX.wildcard(input_str)
+    else:
+        names = session.search(input_str, "wildcard")
+    if names is None:
+        return None
+
+    return {name: TEMPLATES[name] for name in names}
+
+
+def substring_search(input_str, session=None):
+    """
+    Find all product names which contain the user template input, ignoring
+    case
 
+    Parameters:
+        input_str (str): The user input
+        session (search.SearchSession): If given, the search narrows the
+                                        previous result of this session
+    Returns:
+        out_dict (dict): Dict holding all matching products.
+                         Key = TEMPLATES.key, Field = TEMPLATES.field
     """
-    regex: match all alphanumeric and whitespace characters
-    .: Any character except newline
-    *: Zero or more of
+    if session is None:
+        names = SEARCH_INDEX.substring(input_str)
+    else:
+        names = session.search(input_str, "substring")
+    return {name: TEMPLATES[name] for name in names}
+
+
+def purchase_bonus(name, recent):
     """
-    input_str = input_str.replace('*', ".*")
-    # Add ".*" in front so the user input can match strings anywhere without
-    # typing '*' in front
-    input_str = ".*" + input_str
-    try:
-        pattern = re.compile(input_str)
-    except re.error:
-        return None
-    out_dict = dict()
+    Score bonus for the fuzzy search: products which were bought often or
+    recently are ranked higher. Histories which are not loaded are not read,
+    these products get no bonus
+
+    Parameters:
+        name (str): Product name
+        recent (str): Purchases from this date on are recent, e.g.
+                      "2021-01-12". Computed once per search
+
+    Returns:
+        bonus (float): Between 0 and 0.3
+    """
+    stats = PURCHASE_STATS.get(name)
+    if stats is None:
+        product = TEMPLATES.get(name)
+        if product is None:
+            return 0.0
+        history = product.loaded_history()
+        if history is None:
+            return 0.0
+        last_purchase = max((str(item.get("date_time", ''))
+                             for item in history), default='')
+        stats = (len(history), last_purchase)
+        PURCHASE_STATS.update({name: stats})
+
+    count, last_purchase = stats
+    bonus = 0.2 * min(count, 20) / 20
+    if last_purchase >= recent:
+        bonus += 0.1
+    return bonus
+
+
+def fuzzy_search(input_str):
+    """
+    Find the product names most similar to the user template input, also with
+    typos. Only the best matches are returned, their number is given by the
+    "search results" config value. Products which are not displayed are left
+    out
+
+    Parameters:
+        input_str (str): The user input
+    Returns:
+        out_dict (dict): Dict holding the best matching products, best match
+                         first. Key = TEMPLATES.key, Field = TEMPLATES.field
+    """
+    top_k = CONFIG["DEFAULT"].getint("search results", fallback=30)
+    recent = (datetime.date.today() - datetime.timedelta(days=90)).isoformat()
+    names = SEARCH_INDEX.fuzzy(input_str, top_k,
+                               lambda name: purchase_bonus(name, recent),
+                               lambda name: TEMPLATES[name].display)
+    return {name: TEMPLATES[name] for name in names}
 
-    for key, field in TEMPLATES.items():
-        match = pattern.match(key.lower())
-        if match:
-            out_dict.update({key: field})
 
-    return out_dict
+def create_search_session():
+    """
+    Create a SearchSession on SEARCH_INDEX for one template Combobox
+
+    Returns:
+        (search.SearchSession): Session without a previous query
+    """
+    return search.SearchSession(SEARCH_INDEX)
 
 
 def create_template(product: Product):
@@ -710,9 +2745,21 @@ def create_template(product: Product):
 
     # Add new template to dictionary
     TEMPLATES.update({product.name: product})
-
-    # Update the product json file or create a new one
-    update_product_json(product)
+    SEARCH_INDEX.add(product.name)
+    IDENTIFIERS.add(product.identifier, product.name)
+
+    # Update the product json file or create a new one. The saved values are
+    # remembered right away, the GUI compares lines with them before the
+    # background writer is done
+    remember_template_defaults(product.identifier,
+                               {"default_price_per_unit":
+                                    product.price_single,
+                                "default_quantity": product.quantity,
+                                "product_class": product.product_class,
+                                "unknown": product.unknown})
+    submit_write("save " + product.name, update_product_json, product,
+                 keys=[product.identifier])
+    flush_registries()
 
 
 def create_product(user_input: dict, new_product: bool):
@@ -728,8 +2775,6 @@ def create_product(user_input: dict, new_product: bool):
         product (Product): The created Product object
     """
 
-    identifier = -1
-
     # Get history from backend.TEMPLATES
     if new_product:
         history = []
@@ -755,24 +2800,10 @@ def create_product(user_input: dict, new_product: bool):
     # Search backend.TEMPLATES for this product and give it the correct
     # identifier. If it is a new product, give it an identifier that has not
     # yet been used
-    new_product = True
-    for key, field in TEMPLATES.items():
-        if user_input["name"] == key:
-            identifier = field.identifier
-            new_product = False
-            break
-    if new_product:
-        # Get all used identifier numbers, sort them, create a new one that
-        # is one higher
-        used_identifiers = [field.identifier
-                            for _, field in TEMPLATES.items()]
-        used_identifiers = sorted(used_identifiers)
-        new_identifier = used_identifiers[-1] + 1
-        # To be safe, check if the new identifier hasn't been used so far
-        for _, field in TEMPLATES.items():
-            if new_identifier == field.identifier:
-                raise SystemError
-        identifier = new_identifier
+    if user_input["name"] in TEMPLATES:
+        identifier = TEMPLATES[user_input["name"]].identifier
+    else:
+        identifier = IDENTIFIERS.next_identifier()
 
     product = Product(name=user_input["name"],
                       price_single=user_input["price_single"],
@@ -801,15 +2832,19 @@ def create_bill(user_input: dict):
         user_input (dict): Dictionary holding all user input
     """
     # If store is new, store it and update the stores json
+    new_store = ''
     if user_input["store"] not in STORES and user_input["store"] != '':
         STORES.update({user_input["store"]: {"default_payment": '',
                                              "default_discount_class": ''}})
-        update_stores()
+        REGISTRIES.mark("stores")
+        new_store = user_input["store"]
 
     # If payment method is new, store it and update the payments json
+    new_payment = ''
     if user_input["payment"] not in PAYMENTS and user_input["payment"] != '':
         PAYMENTS.append(user_input["payment"])
-        update_payments()
+        REGISTRIES.mark("payments")
+        new_payment = user_input["payment"]
 
     # Time is written with '-' as a separator because it's easier to type in
     # on the numpad
@@ -826,6 +2861,8 @@ def create_bill(user_input: dict):
         time = "00:00"
 
     price_quantity_sum = 0.0
+    # [identifier, history entry] of the purchases for the bill journal
+    purchases = []
 
     # Date user input is dd-mm
     # Transform it into yyyy-mm-dd
@@ -870,7 +2907,7 @@ def create_bill(user_input: dict):
                 price_per_unit = product.price_final / product.quantity
             price_per_unit = round(price_per_unit, 2)
             # product.history.append([date_time, store, price_per_unit])
-            product.history.append({
+            purchase = {
                 "date_time": date_time,
                 "store": user_input["store"],
                 "payment": user_input["payment"],
@@ -883,11 +2920,39 @@ def create_bill(user_input: dict):
                 "discount": product.discount,
                 "price_final": product.price_final,
                 "price_final_per_unit": price_per_unit
-            })
-
+            }
+            product.history.append(purchase)
+        else:
+            purchase = None
+
+        history = product.history
+        if lazy_history():
+            # The template stays lazy, so the history is only kept in the
+            # size-bounded HISTORY_CACHE
+            HISTORY_CACHE.put(product.identifier, history)
+            product.history = None
         TEMPLATES.update({product.name: product})
-
-        update_product_history(product)
+        SEARCH_INDEX.add(product.name)
+        IDENTIFIERS.add(product.identifier, product.name)
+        PURCHASE_STATS.pop(product.name, None)
+
+        if use_bill_journal():
+            # Written by apply_journal() together with the other bills
+            if purchase is not None:
+                purchases.append([product.identifier, purchase])
+        elif use_history_log():
+            # Only the new purchase is written, the product json file is
+            # updated by compact_history_log()
+            if purchase is not None:
+                submit_write("history " + product.name, append_history_log,
+                             product.identifier, [purchase],
+                             keys=[product.identifier])
+        else:
+            # A copy, the cached list may get purchases of later bills while
+            # the write is queued
+            submit_write("history " + product.name, add_product_history,
+                         product.identifier, list(history),
+                         keys=[product.identifier])
 
     price_quantity_sum = round(price_quantity_sum, 2)
 
@@ -903,4 +2968,12 @@ def create_bill(user_input: dict):
     # Don't save an empty bill
     if bill.products:
         BILLS.append(bill)
-        backup_bill(bill)
+
+    if use_bill_journal():
+        journal_bill(bill, purchases, new_store, new_payment)
+        return
+
+    if bill.products:
+        submit_write("backup " + date + ' ' + time, backup_bill, bill)
+
+    flush_registries()
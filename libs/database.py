@@ -0,0 +1,293 @@
+"""
+Functions to store the product catalog in a single SQLite database file. The
+database holds the same information as the product json files and the product
+keys json: one table for the product templates, one for the purchase history
+and one for the product name -> identifier keys.
+"""
+import json  # To store history entries and to read the json product files
+import os  # To walk through product json files
+import sqlite3  # To read from and write to the database file
+
+# Columns holding numbers are declared without a type so SQLite keeps the
+# values exactly as they were written (e.g. 1 stays int, 1.0 stays float)
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    identifier INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    default_price_per_unit,
+    default_quantity,
+    product_class TEXT NOT NULL DEFAULT '',
+    unknown TEXT NOT NULL DEFAULT '',
+    display INTEGER NOT NULL DEFAULT 1,
+    notes TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS products_name ON products (name);
+
+CREATE TABLE IF NOT EXISTS history (
+    row_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    identifier INTEGER NOT NULL,
+    date_time TEXT NOT NULL DEFAULT '',
+    entry TEXT NOT NULL,
+    entry_key TEXT NOT NULL,
+    UNIQUE (identifier, entry_key)
+);
+CREATE INDEX IF NOT EXISTS history_identifier ON history (identifier);
+CREATE INDEX IF NOT EXISTS history_date_time ON history (date_time);
+
+CREATE TABLE IF NOT EXISTS product_keys (
+    name TEXT PRIMARY KEY,
+    product_key TEXT NOT NULL
+);
+"""
+
+
+def open_database(database_path):
+    """
+    Opens the database file and creates the tables if they do not exist yet
+
+    Parameters:
+        database_path (str): Path to the SQLite database file
+
+    Returns:
+        connection (sqlite3.Connection): Open connection to the database
+    """
+    folder = os.path.dirname(database_path)
+    if folder and not os.path.isdir(folder):
+        os.makedirs(folder)
+    # The connection is also used by the background writer thread, the writes
+    # are never run in parallel with other queries of the program
+    connection = sqlite3.connect(database_path, check_same_thread=False)
+    connection.executescript(SCHEMA)
+    connection.commit()
+    return connection
+
+
+def _encode_entry(entry):
+    """
+    Turns a history entry into the text stored in the database
+
+    Parameters:
+        entry (dict): One purchase of the product history
+
+    Returns:
+        (str): json representation of the entry
+    """
+    return json.dumps(entry)
+
+
+def _entry_key(entry):
+    """
+    Turns a history entry into the text of the UNIQUE constraint of the history
+    table. The keys are sorted and whole floats are written as int, so entries
+    which are equal dicts, e.g. with 1 and 1.0, have the same key like in
+    backend.history_key()
+
+    Parameters:
+        entry (dict): One purchase of the product history
+
+    Returns:
+        (str): Normalised json representation of the entry
+    """
+    normalised = {key: int(value) if isinstance(value, float) and
+                  value.is_integer() else value
+                  for key, value in entry.items()}
+    return json.dumps(normalised, sort_keys=True)
+
+
+def read_product_rows(connection):
+    """
+    Reads the template information of all products, without their history
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+
+    Returns:
+        rows (list of tuples): (identifier, name, default_price_per_unit,
+                               default_quantity, product_class, unknown,
+                               display, notes) for every product
+    """
+    cursor = connection.execute(
+        "SELECT identifier, name, default_price_per_unit, default_quantity, "
+        "product_class, unknown, display, notes FROM products "
+        "ORDER BY identifier")
+    return cursor.fetchall()
+
+
+def read_all_histories(connection):
+    """
+    Reads the purchase history of every product in one query
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+
+    Returns:
+        histories (dict): key: product identifier, field: list of history
+                          entries in the order they were saved
+    """
+    histories = dict()
+    cursor = connection.execute(
+        "SELECT identifier, entry FROM history ORDER BY identifier, row_id")
+    for identifier, entry in cursor:
+        histories.setdefault(identifier, []).append(json.loads(entry))
+    return histories
+
+
+def read_history(connection, identifier):
+    """
+    Reads the purchase history of one product
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+        identifier (int): Identifier of the product
+
+    Returns:
+        history (list of dicts): All saved purchases of the product
+    """
+    cursor = connection.execute(
+        "SELECT entry FROM history WHERE identifier = ? ORDER BY row_id",
+        (identifier,))
+    return [json.loads(entry) for entry, in cursor]
+
+
+def product_exists(connection, identifier):
+    """
+    Checks if a product with this identifier is stored in the database
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+        identifier (int): Identifier of the product
+
+    Returns:
+        (bool): True if the product is stored
+    """
+    cursor = connection.execute(
+        "SELECT 1 FROM products WHERE identifier = ?", (identifier,))
+    return cursor.fetchone() is not None
+
+
+def read_product_keys(connection):
+    """
+    Reads the product name -> product key table
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+
+    Returns:
+        product_keys (dict): key: product name, field: e.g. "product_00001"
+    """
+    cursor = connection.execute("SELECT name, product_key FROM product_keys")
+    return dict(cursor.fetchall())
+
+
+def write_product(connection, identifier, data):
+    """
+    Inserts or replaces the template information of one product and adds its
+    history entries which are not yet stored
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+        identifier (int): Identifier of the product
+        data (dict): Same layout as the content of a product json file
+    """
+    with connection:
+        _insert_product(connection, identifier, data, "REPLACE")
+        connection.execute(
+            "INSERT OR REPLACE INTO product_keys (name, product_key) "
+            "VALUES (?, ?)", (data["name"], "product_" + f"{identifier:05}"))
+
+
+def add_history(connection, identifier, history):
+    """
+    Adds the history entries of one product which are not yet stored
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+        identifier (int): Identifier of the product
+        history (list of dicts): Purchases of the product
+    """
+    with connection:
+        _insert_history(connection, identifier, history)
+
+
+def _insert_product(connection, identifier, data, conflict):
+    """
+    Inserts the template information of one product and inserts its history.
+    conflict is "REPLACE" to overwrite a stored product or "IGNORE" to keep it.
+    Has to be called inside a transaction
+    """
+    connection.execute(
+        f"INSERT OR {conflict} INTO products (identifier, name, "
+        "default_price_per_unit, default_quantity, product_class, unknown, "
+        "display, notes) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (identifier, data["name"], data["default_price_per_unit"],
+         data["default_quantity"], data["product_class"], data["unknown"],
+         int(data["display"]), data["notes"]))
+    _insert_history(connection, identifier, data["history"])
+
+
+def _insert_history(connection, identifier, history):
+    """
+    Inserts history entries, duplicates are skipped by the UNIQUE constraint.
+    Has to be called inside a transaction
+    """
+    connection.executemany(
+        "INSERT OR IGNORE INTO history (identifier, date_time, entry, "
+        "entry_key) VALUES (?, ?, ?, ?)",
+        [(identifier, item.get("date_time", ''), _encode_entry(item),
+          _entry_key(item)) for item in history])
+
+
+def write_product_keys(connection, product_keys):
+    """
+    Stores all entries of the product name -> product key dict
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+        product_keys (dict): key: product name, field: e.g. "product_00001"
+    """
+    with connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO product_keys (name, product_key) "
+            "VALUES (?, ?)", product_keys.items())
+
+
+def import_json_tree(connection, product_folder, key_json, encoding):
+    """
+    Migration from the json storage: reads every product json file and the
+    product keys json and stores their content in the database. Can be run
+    multiple times: products and product keys which are already stored are
+    kept, as they may have been changed in the database since the last import.
+    Only new products, keys and history entries are added
+
+    Parameters:
+        connection (sqlite3.Connection): Open connection to the database
+        product_folder (str): Folder holding the product json files
+        key_json (str): Path to the product keys json
+        encoding (str): Encoding of the json files
+
+    Returns:
+        product_count (int): Number of read product files
+    """
+    product_count = 0
+    with connection:
+        for root, _, files in os.walk(product_folder):
+            for file in files:
+                if not (file.startswith("product_") and
+                        file.endswith(".json")):
+                    continue
+                identifier = int(file.replace("product_", '').
+                                 replace(".json", ''))
+                with open(os.path.join(root, file), 'r',
+                          encoding=encoding) as in_file:
+                    data = json.load(in_file)
+                _insert_product(connection, identifier, data, "IGNORE")
+                product_count += 1
+
+        if os.path.isfile(key_json):
+            with open(key_json, 'r', encoding=encoding) as in_file:
+                product_keys = json.load(in_file)
+            connection.executemany(
+                "INSERT OR IGNORE INTO product_keys (name, product_key) "
+                "VALUES (?, ?)", product_keys.items())
+
+    return product_count
@@ -1,8 +1,6 @@
 ﻿"""
 Classes to create and run the GUI
 """
-import json
-import os  # To check if product json files exist
 import sys  # For exit()
 import tkinter as tk
 from tkinter import ttk  # For style and Combobox
@@ -10,6 +8,11 @@ from tkinter import ttk  # For style and Combobox
 import libs.backend as backend
 import libs.tkinter_objects as tko
 
+# Keys which act on the current input, they run the debounced callbacks first.
+# The keysym of a typed capital letter F is "F" as well, so the function keys
+# are listed one by one
+FLUSH_KEYS = ("Return", "KP_Enter", "F1", "F2", "F3", "F4", "F5", "F6")
+
 
 class Line:
     """
@@ -34,19 +37,36 @@ class Line:
         Object that created the window
     labels: dict
         All tkinter LabelContainer objects of this line
+    parked: bool
+        True while the containers of this line hold StoredWidgets instead of
+        tkinter objects, see park()
     row: int
         In which row of the scroll region this line is placed
+    search_session: backend.search.SearchSession
+        Previous query and matches of the template Combobox, so typing one more
+        character only filters the previous matches
     values: dict
         Dictionary holding user input in this Line
 
     Methods
     -------
+    bind(self, widgets=None):
+        Show the state of a parked line in detached tkinter objects
     delete(self):
         Destroy all tkinter objects of this line
+    hide(self):
+        Remove all tkinter objects of this line from the grid
+    park(self):
+        Detach the tkinter objects and keep the user input in the containers
+    reset(self):
+        Clear all user input of this line
+    show(self):
+        Put the hidden tkinter objects back into the grid
     """
 
     def __init__(self, interface, frame, row: int, labels: dict, entries: dict,
-                 buttons: dict, combo_boxes: dict, check_buttons: dict):
+                 buttons: dict, combo_boxes: dict, check_buttons: dict,
+                 widgets=None):
         self.interface = interface
         self.frame = frame
         self.row: int = row
@@ -56,6 +76,8 @@ class Line:
         self.combo_boxes: dict = combo_boxes
         self.check_buttons: dict = check_buttons
         self.values = dict()
+        self.search_session = backend.create_search_session()
+        self.parked = False
 
         def labels():
             if self.labels:
@@ -88,6 +110,12 @@ class Line:
             combo_boxes()
             buttons()
             check_buttons()
+        elif self.frame == self.interface.frame_fields and widgets is not None:
+            # Use the objects of a parked line instead of creating new ones
+            labels()
+            for _, field in self._parkable():
+                field.stand_in()
+            self.bind(widgets)
         elif self.frame == self.interface.frame_fields:
             labels()
             combo_boxes()
@@ -118,6 +146,84 @@ class Line:
             for _, field in self.check_buttons.items():
                 field.object.destroy()
 
+    def _containers(self):
+        """
+        Return all container objects of this line
+        """
+        containers = []
+        for objects in (self.labels, self.entries, self.buttons,
+                        self.combo_boxes, self.check_buttons):
+            if objects:
+                containers.extend(objects.values())
+        return containers
+
+    def _parkable(self):
+        """
+        Return (kind, key) and container of all objects which are detached by
+        park(), the labels stay
+        """
+        containers = []
+        for kind, objects in (("entries", self.entries),
+                              ("buttons", self.buttons),
+                              ("combo_boxes", self.combo_boxes),
+                              ("check_buttons", self.check_buttons)):
+            if objects:
+                containers.extend(((kind, key), field)
+                                  for key, field in objects.items())
+        return containers
+
+    def park(self):
+        """
+        Detach the tkinter objects of this line, e.g. when it is scrolled out
+        of view. The containers keep the user input in StoredWidgets, so the
+        line can be read and changed like a shown line
+
+        Returns:
+            widgets (dict): key: (kind, key) of the container, field: the
+                            detached objects, to be passed to bind()
+        """
+        widgets = {name: field.detach() for name, field in self._parkable()}
+        self.parked = True
+        return widgets
+
+    def bind(self, widgets=None):
+        """
+        Show the user input of a parked line in detached tkinter objects of
+        another line and position them in the row of this line
+
+        Parameters:
+            widgets (dict): Returned by park() of any line of the same frame.
+                            Objects which are missing are created
+        """
+        widgets = widgets or dict()
+        for name, field in self._parkable():
+            field.attach(widgets.get(name))
+        self.parked = False
+
+    def hide(self):
+        """
+        Remove all tkinter objects of this line from the grid, they keep their
+        grid position for show()
+        """
+        for field in self._containers():
+            field.object.grid_remove()
+
+    def show(self):
+        """
+        Put the hidden tkinter objects back into the grid
+        """
+        for field in self._containers():
+            field.object.grid()
+
+    def reset(self):
+        """
+        Clear all user input of this line, so it can be used for a new bill
+        """
+        for field in self._containers():
+            field.reset()
+        self.values = dict()
+        self.search_session.reset()
+
     def __repr__(self):
         out_string = (f"Line object:\n"
                       f"\trow: {self.row}\n"
@@ -130,6 +236,163 @@ class Line:
         return out_string
 
 
+class Debouncer:
+    """
+    Collects bursts of callbacks for the same widget and runs only the last one
+    after the user stopped typing for a while. Built on tkinter's after()
+
+    ...
+
+    Attributes
+    ----------
+    _pending: dict
+        key: widget description, e.g. ("template", 3)
+        field: tuple (after id, function, arguments) of the scheduled call
+    _root: tkinter.Tk
+        The main window object
+    delay: int
+        Quiet period in milliseconds. With 0, every call runs immediately
+
+    Methods
+    -------
+    call(self, key, func, *args):
+        Schedule func(*args), replacing a scheduled call with the same key
+    cancel(self, key):
+        Drop the scheduled call with this key
+    flush(self):
+        Run all scheduled calls now
+    """
+
+    def __init__(self, root, delay):
+        self._root = root
+        self._pending = dict()
+        self.delay = delay
+
+    def call(self, key, func, *args):
+        """
+        Schedule func(*args) to run after the quiet period. A call scheduled
+        earlier for the same key is replaced
+
+        Parameters:
+            key: hashable
+                Identifies the widget, calls for other keys are not affected
+            func: function
+                Function to run
+            args:
+                Parameters passed to func
+        """
+        self.cancel(key)
+        if self.delay <= 0:
+            func(*args)
+            return
+        after_id = self._root.after(self.delay, self._run, key)
+        self._pending.update({key: (after_id, func, args)})
+
+    def cancel(self, key):
+        """
+        Drop the scheduled call with this key, if there is one
+
+        Parameters:
+            key: hashable
+                Identifies the widget
+        """
+        if key in self._pending:
+            after_id, _, _ = self._pending.pop(key)
+            self._root.after_cancel(after_id)
+
+    def flush(self):
+        """
+        Run all scheduled calls now, in the order they were scheduled
+        """
+        for key in list(self._pending):
+            if key in self._pending:
+                after_id, _, _ = self._pending[key]
+                self._root.after_cancel(after_id)
+                self._run(key)
+
+    def _run(self, key):
+        """
+        Run the scheduled call with this key
+        """
+        _, func, args = self._pending.pop(key)
+        func(*args)
+
+
+class BillModel:
+    """
+    Calculated values of every Line of the current bill and their sums, kept
+    apart from the tkinter objects. Changing one line updates the sums without
+    reading any other line
+
+    ...
+
+    Attributes
+    ----------
+    lines: dict
+        key: row of the Line, field: dict holding the SUM_KEYS values of the
+        Line
+    sums: dict
+        key: one of SUM_KEYS, field: sum of this value over all lines
+
+    Methods
+    -------
+    set_line(self, row, values):
+        Store the calculated values of a line and update the sums
+    remove_line(self, row):
+        Remove a line and subtract its values from the sums
+    clear(self):
+        Remove all lines
+    """
+
+    SUM_KEYS = ("price_quantity", "discount", "quantity_discount", "sale",
+                "price_final")
+
+    def __init__(self):
+        self.lines = dict()
+        self.sums = dict.fromkeys(self.SUM_KEYS, 0.0)
+
+    def set_line(self, row, values):
+        """
+        Store the calculated values of a line and update the sums
+
+        Parameters:
+            row: int
+                Row of the Line
+            values: dict
+                Line.values, has to hold all SUM_KEYS
+        """
+        self.remove_line(row)
+        line_values = {key: values[key] for key in self.SUM_KEYS}
+        self.lines.update({row: line_values})
+        for key, value in line_values.items():
+            self.sums[key] += value
+
+    def remove_line(self, row):
+        """
+        Remove a line and subtract its values from the sums
+
+        Parameters:
+            row: int
+                Row of the Line, nothing happens if it is not stored
+        """
+        line_values = self.lines.pop(row, None)
+        if line_values is None:
+            return
+        if not self.lines:
+            # Start from exactly 0 again instead of a rounding remainder
+            self.clear()
+            return
+        for key, value in line_values.items():
+            self.sums[key] -= value
+
+    def clear(self):
+        """
+        Remove all lines
+        """
+        self.lines.clear()
+        self.sums = dict.fromkeys(self.SUM_KEYS, 0.0)
+
+
 class Application:
     """
     Creates window using tkinter and handles input/output of the created
@@ -139,6 +402,11 @@ class Application:
 
     Attributes
     ----------
+    _bill: BillModel
+        Calculated values and sums of the lines of the current bill
+    _bound_lines: dict
+        key: row, field: Line object of _lines_by_row which is not parked, so
+        only these lines are checked when the view moves
     _canvas: tkinter.Canvas
         The scrollable region
     _canvas_height: int
@@ -147,10 +415,23 @@ class Application:
         Horizontal resolution of the scrollable region
     _colour_frame: str
         Color of the background
+    _debouncer: Debouncer
+        Delays the trace methods of the Comboboxes until the user stops typing
     _frame_canvas: tkinter.Frame
         Frame to create the scrollable region
-    _line_list: list
-        List of all currently active Line objects in the scrollable region
+    _line_height: int
+        Height of one line in the scrollable region in pixels, None until it
+        was measured. Only used with virtual lines
+    _line_pool: dict
+        key: row, field: hidden Line object which can be shown again when a
+        line is added in this row
+    _lines_by_row: dict
+        key: row, field: currently active Line object in this row of the
+        scrollable region. Rows are only added at the end, so the dict is
+        ordered like the lines on the screen
+    _poll_id: str
+        tkinter after() id of the scheduled _poll_writes call, None if there is
+        none
     _root: tkinter.Tk
         The main window object
     _root_height: int
@@ -164,8 +445,28 @@ class Application:
         decreases, even when a line is deleted
     _scaling: float
         Scaling factor of the tkinter window, for different screen resolutions
+    _scroll_id: str
+        tkinter after_idle() id of the scheduled _update_scroll_region call,
+        None if there is none
+    _scroll_to_end: bool
+        If True, _update_scroll_region scrolls down to the last line
+    _shown_sums: dict
+        key: name of a sum LabelContainer, field: text it currently shows
+    _virtual: bool
+        If True, only the lines in view and _virtual_buffer lines above and
+        below have tkinter objects, the other lines are parked
+    _virtual_buffer: int
+        Number of lines above and below the view which keep their objects
+    _visible_id: str
+        tkinter after_idle() id of the scheduled _update_visible_lines call,
+        None if there is none
     _vsb: tkinter.Scrollbar
         Vertical tkinter Scrollbar for the scrollable region
+    _widget_lines: dict
+        key: tkinter path of an entry or Combobox in the scrollable region,
+        field: tuple (Line object, key of the widget in the Line)
+    _widget_pool: list
+        Objects of parked lines, see Line.park(), to be bound to other lines
     frame_fields: tkinter.Frame
         Frame that holds the lines inside the scrollable region
     frame_main: tkinter.Frame
@@ -184,16 +485,15 @@ class Application:
     _calculate_price_quantity(self, line):
         Calculates "price_quantity" from the "price_single" and "quantity" of
         the given Line in the scrollable region. This value is then displayed
-    _calculate_total(self):
-        Add all "price_final" from all items and display the result in the main
-        frame
     _clear_screen(self):
         All objects in the _root window are deleted and all lines inside the
         scrollable region are deleted
+    _close(self):
+        Finish all background writes, then close the window
     _compare_line_to_file(self, line):
-        Compare fields in line with corresponding values in product json.
+        Compare fields in line with the saved values of its product template.
         If there is a difference, change the colour of the "save" button
-    _create_line(self, frame, row):
+    _create_line(self, frame, row, widgets=None):
         Look through all lists of tkinter objects, if they have the correct
         frame_key, create them and store them in a Line object.
     _float2str(in_float):
@@ -205,6 +505,9 @@ class Application:
     _key_release(self, event):
         Gets called when a keyboard key is released. Based on the key, calls a
         method
+    _poll_writes(self):
+        Show the state of the background writes in the main frame, check again
+        later while writes are pending
     _read_entry(entry, data_type):
         Read user input from the given EntryContainer object
     _read_label(label, data_type):
@@ -212,24 +515,46 @@ class Application:
     _read_line_values(self, line):
         Read price_single, quantity, discount_class, quantity_discount and sale
         and store them in a dict
+    _bind_line(self, line):
+        Give a parked Line tkinter objects again
     _read_product_from_line(self, line, new_product):
         Read all EntryContainer objects of a given line in the scrollable region
         and save their information as a backend.EntryContainer object, then
         return it
+    _last_line(self):
+        Return the Line in the last row of the scrollable region
+    _register_line(self, line):
+        Add a Line to _lines_by_row, _bound_lines and its widgets to
+        _widget_lines
+    _release_line(self, line):
+        Hide a Line and keep it in _line_pool to be used again
+    _park_line(self, line):
+        Detach the tkinter objects of a Line and keep them in _widget_pool
     _reset(self):
-        _row_count is reset to 0 and _line_list is emptied
+        _row_count is reset to 0 and _lines_by_row is emptied
+    _scrolled(self, first, last):
+        Move the scrollbar and schedule _update_visible_lines
     _setup_canvas_window(self):
         Configures the root window, creates all necessary tkinter objects
     _setup_root_window(self):
         Configures the root window, creates all necessary tkinter objects
+    _schedule_scroll_update(self):
+        Run _update_scroll_region once tkinter is idle
+    _show_sums(self):
+        Display the sums of the bill in the main frame, only labels whose text
+        changed are updated
+    _update_scroll_region(self):
+        Set the scrolling region of the canvas to the current lines
+    _update_visible_lines(self):
+        Bind the lines in view and park the others, only with virtual lines
     add_new_row(self):
         Iterate through all lists holding tkinter object information and create
-        a new line in the scrollable region with the necessary objects. Then
-        append this Line object to _line_list
+        a new line in the scrollable region with the necessary objects, or show
+        a Line of an earlier bill again. Then add this Line object to
+        _lines_by_row
     delete_row(self):
-        Search _line_list for a Line object with Line.row = row, call its
-        delete() method and remove it from _line_lists. Then, recalculate the
-        bill's total price
+        Remove the Line object with Line.row = row from _lines_by_row and
+        release it. Then, update the bill's sums
     export_bills(self):
         Save the current bill, then write all bills of this session to the
         output csv and close the program
@@ -244,6 +569,15 @@ class Application:
         line in the scrollable region, create a new product template, add it to
         the dictionary of product templates and update the json holding these
         templates
+    schedule_trace_payment(self):
+        Gets called when the StringVar of the "payment" Combobox changes, runs
+        trace_payment once the user stops typing
+    schedule_trace_store(self):
+        Gets called when the StringVar of the "store" Combobox changes, runs
+        trace_store once the user stops typing
+    schedule_trace_template(self, row):
+        Gets called when the StringVar of a Combobox in the scrollable region
+        changes, runs trace_template once the user stops typing
     trace_payment(self):
         Gets called when the StringVar of the "payment" Combobox changes.
         Searches the payment list for a match
@@ -257,8 +591,8 @@ class Application:
         user input. If a match is found, its contents are displayed in the GUI.
     trace_update_entries(self, curr_line):
         Calls all "calculate" methods for a given Line in the scrollable region.
-        Then calculates the sums that are displayed in the main frame and
-        changes the format of the time input
+        Then updates the sums that are displayed in the main frame and changes
+        the format of the time input
     """
 
     def __init__(self):
@@ -270,9 +604,24 @@ class Application:
         self._canvas_height: float = backend.CONFIG["GRAPHICS"][
             "canvas height"]
         self._colour_frame: str = backend.CONFIG["GRAPHICS"]["colour frame"]
+        self._virtual: bool = backend.CONFIG["GRAPHICS"].getboolean(
+            "virtual lines", fallback=False)
+        self._virtual_buffer: int = backend.CONFIG["GRAPHICS"].getint(
+            "virtual line buffer", fallback=5)
 
         self._row_count: int = 0
-        self._line_list: list = []
+        self._lines_by_row = dict()
+        self._bound_lines = dict()
+        self._widget_lines = dict()
+        self._line_pool = dict()
+        self._poll_id = None
+        self._scroll_id = None
+        self._scroll_to_end = False
+        self._widget_pool = []
+        self._line_height = None
+        self._visible_id = None
+        self._bill = BillModel()
+        self._shown_sums = dict()
 
         # Create root window
         self._root = tk.Tk()
@@ -284,6 +633,13 @@ class Application:
         # Bind all key releases to a callback method
         self._root.bind_all('<KeyRelease>', self._key_release)
 
+        # Queued background writes have to be finished before closing
+        self._root.protocol("WM_DELETE_WINDOW", self._close)
+
+        self._debouncer = Debouncer(
+            self._root,
+            backend.CONFIG["DEFAULT"].getint("trace delay", fallback=0))
+
         # Create the different frames and canvasses
         # All this is done so that _vsb can scroll the _canvas
         self.frame_main = tk.Frame(self._root, bg=self._colour_frame)
@@ -311,6 +667,36 @@ class Application:
         """
         self._root.mainloop()
 
+    def _close(self):
+        """
+        Finish all background writes, then close the window
+        """
+        backend.stop_writer()
+        self._root.destroy()
+
+    def _poll_writes(self):
+        """
+        Show the state of the background writes in the main frame, check again
+        later while writes are pending
+        """
+        self._poll_id = None
+        if backend.WRITER is None:
+            return
+        backend.WRITER.poll()
+
+        status = self._root_objects.labels["write_status"].object
+        if backend.WRITER.failed:
+            status.config(text=f"Fehler beim Speichern: "
+                               f"{len(backend.WRITER.failed)}", fg="red")
+        elif backend.WRITER.pending:
+            status.config(text=f"Speichere ({backend.WRITER.pending})",
+                          fg="black")
+        else:
+            status.config(text='')
+
+        if backend.WRITER.pending:
+            self._poll_id = self._root.after(100, self._poll_writes)
+
     def _setup_root_window(self):
         """
         Configures the root window, creates all necessary tkinter objects
@@ -344,7 +730,7 @@ class Application:
         # Place _vsb inside the grid of _frame_canvas, right of _canvas
         self._vsb.grid(row=0, column=1, sticky="ns")
         # Link _vsb to _canvas scrolling
-        self._canvas.configure(yscrollcommand=self._vsb.set)
+        self._canvas.configure(yscrollcommand=self._scrolled)
 
         # Create the frame_fields (where the rows will be placed) inside
         # _canvas
@@ -363,10 +749,40 @@ class Application:
 
     def _reset(self):
         """
-        _row_count is reset to 0 and _line_list is emptied
+        _row_count is reset to 0 and _lines_by_row is emptied
         """
         self._row_count = 0
-        self._line_list = list()
+        self._lines_by_row.clear()
+        self._bound_lines.clear()
+        self._widget_lines.clear()
+        self._bill.clear()
+
+    def _last_line(self):
+        """
+        Return the Line in the last row of the scrollable region
+
+        Returns:
+            line: Line
+                The Line object which was added last to _lines_by_row
+        """
+        return next(reversed(self._lines_by_row.values()))
+
+    def _register_line(self, line):
+        """
+        Add a Line to _lines_by_row, and a line which is not parked to
+        _bound_lines and its entries and Comboboxes to _widget_lines
+
+        Parameters:
+            line: Line
+                Line object in the scrollable region
+        """
+        self._lines_by_row.update({line.row: line})
+        if line.parked:
+            return
+        self._bound_lines.update({line.row: line})
+        for widgets in (line.entries, line.combo_boxes):
+            for key, field in widgets.items():
+                self._widget_lines.update({str(field.object): (line, key)})
 
     def _clear_screen(self):
         """
@@ -378,6 +794,7 @@ class Application:
         for key, field in self._root_objects.labels.items():
             if key.endswith("_var"):
                 field.object.config(text='')
+        self._shown_sums.clear()
 
         # TODO: do these actually need to be deleted?
         for key, field in self._root_objects.entries.items():
@@ -389,57 +806,203 @@ class Application:
         for _, field in self._root_objects.combo_boxes.items():
             field.object.delete(0, "end")
 
-        for line in self._line_list:
-            line.delete()
+        # The lines are hidden and reused for the next bill instead of being
+        # destroyed and created again
+        for line in self._lines_by_row.values():
+            self._debouncer.cancel(("template", line.row))
+            self._release_line(line)
 
     def add_new_row(self):
         """
         Iterate through all lists holding tkinter object information and create
-        a new line in the scrollable region with the necessary objects. Then
-        append this Line object to _line_list
+        a new line in the scrollable region with the necessary objects, or show
+        a Line of an earlier bill again. Then add this Line object to
+        _lines_by_row
         """
         print("add_new_row")
-        line = self._create_line(self.frame_fields, self._row_count)
-        self._line_list.append(line)
-
-        self._root.update()
-
-        # Set the canvas scrolling region
-        self._canvas.config(scrollregion=self._canvas.bbox("all"))
+        # Lines in the pool were created for the same row, so the callbacks of
+        # their objects already have the right row number
+        line = self._line_pool.pop(self._row_count, None)
+        if line is None:
+            # With virtual lines, objects of parked lines are used before new
+            # ones are created
+            widgets = self._widget_pool.pop() if self._widget_pool else None
+            line = self._create_line(self.frame_fields, self._row_count,
+                                     widgets)
+        else:
+            # Reset now, the template list may have changed since it was hidden
+            line.reset()
+            line.show()
+            self._bind_line(line)
+        self._register_line(line)
+        if self._line_height:
+            # Parked lines keep the height of a line
+            self.frame_fields.rowconfigure(line.row, minsize=self._line_height)
 
         self._row_count += 1
         print("self._row_count = ", self._row_count)
 
         # Scroll down so the new line is visible
-        self._canvas.yview_scroll(2, "units")
+        self._scroll_to_end = True
+        self._schedule_scroll_update()
+
+    def _release_line(self, line):
+        """
+        Hide a Line and keep it in _line_pool to be shown again by add_new_row
+
+        Parameters:
+            line: Line
+                Line object in the scrollable region
+        """
+        line.hide()
+        if self._virtual:
+            # A hidden line does not need its objects
+            self._park_line(line)
+            self.frame_fields.rowconfigure(line.row, minsize=0)
+        self._line_pool.update({line.row: line})
+
+    def _park_line(self, line):
+        """
+        Detach the tkinter objects of a Line and keep them in _widget_pool to
+        be bound to another line
+
+        Parameters:
+            line: Line
+                Line object in the scrollable region
+        """
+        if line.parked:
+            return
+        self._bound_lines.pop(line.row, None)
+        for widgets in (line.entries, line.combo_boxes):
+            for field in widgets.values():
+                self._widget_lines.pop(str(field.object), None)
+        self._widget_pool.append(line.park())
+
+    def _bind_line(self, line):
+        """
+        Give a parked Line tkinter objects again, from _widget_pool if there
+        are any
+
+        Parameters:
+            line: Line
+                Line object in the scrollable region
+        """
+        if not line.parked:
+            return
+        line.bind(self._widget_pool.pop() if self._widget_pool else None)
+        if line.row in self._lines_by_row:
+            self._register_line(line)
+
+    def _schedule_scroll_update(self):
+        """
+        Run _update_scroll_region once tkinter is idle, so adding or deleting
+        many lines at once only updates the scrolling region once
+        """
+        if self._scroll_id is None:
+            self._scroll_id = self._root.after_idle(self._update_scroll_region)
+
+    def _update_scroll_region(self):
+        """
+        Set the scrolling region of the canvas to the current lines and scroll
+        down to the last line if one was added
+        """
+        self._scroll_id = None
+        # Let tkinter calculate the size of the placed lines
+        self.frame_fields.update_idletasks()
+        self._canvas.config(scrollregion=self._canvas.bbox("all"))
+        if self._scroll_to_end:
+            self._scroll_to_end = False
+            self._canvas.yview_moveto(1.0)
+        if self._virtual:
+            self._update_visible_lines()
+
+    def _scrolled(self, first, last):
+        """
+        Called by the canvas when its view changes. Moves the scrollbar and,
+        with virtual lines, schedules _update_visible_lines once tkinter is
+        idle
+
+        Parameters:
+            first: str
+                Top of the view as fraction of the scrolling region
+            last: str
+                Bottom of the view as fraction of the scrolling region
+        """
+        self._vsb.set(first, last)
+        if self._virtual and self._visible_id is None:
+            self._visible_id = self._root.after_idle(
+                self._update_visible_lines)
+
+    def _update_visible_lines(self):
+        """
+        Bind the lines in view and _virtual_buffer rows above and below it,
+        park all other lines. The line with the cursor is never parked. tkinter
+        finds the rows at the top and bottom of the view, rows of deleted lines
+        have no height. Only the rows in view and the bound lines are checked,
+        not every line
+        """
+        self._visible_id = None
+        if self._line_height is None:
+            # Measure a shown line, until then no line is parked
+            for line in self._lines_by_row.values():
+                if not line.parked:
+                    height = self.frame_fields.grid_bbox(0, line.row)[3]
+                    if height > 0:
+                        self._line_height = height
+                    break
+            if self._line_height is None:
+                return
+            for line in self._lines_by_row.values():
+                self.frame_fields.rowconfigure(line.row,
+                                               minsize=self._line_height)
+
+        # The frame with the lines starts at the top of the canvas
+        top = self._canvas.canvasy(0)
+        bottom = self._canvas.canvasy(self._canvas.winfo_height())
+        first = self.frame_fields.grid_location(0, top)[1] - \
+            self._virtual_buffer
+        last = self.frame_fields.grid_location(0, bottom)[1] + \
+            self._virtual_buffer
+        visible = dict()
+        for row in range(max(first, 0), last + 1):
+            line = self._lines_by_row.get(row)
+            if line is not None:
+                visible.update({row: line})
+        focus = self._widget_lines.get(str(self._root.focus_get()))
+
+        # Park first, so the bound lines can use the detached objects
+        for row, line in list(self._bound_lines.items()):
+            if row not in visible and (focus is None or line is not focus[0]):
+                self._park_line(line)
+        for line in visible.values():
+            self._bind_line(line)
 
     def delete_row(self, row):
         """
-        Search _line_list for a Line object with Line.row = row, call its
-        delete() method and remove it from _line_lists. Then, recalculate the
-        bill's total price
+        Remove the Line object with Line.row = row from _lines_by_row and
+        release it. Then, update the bill's sums
 
         Parameters:
             row: int
                 The index of the row that will be deleted
         """
         print("delete_row")
-        for index, line in enumerate(self._line_list):
-            if line.row == row:
-                line.delete()
-                self._line_list.pop(index)
-                break
+        self._debouncer.cancel(("template", row))
+        line = self._lines_by_row.pop(row, None)
+        if line is not None:
+            self._bound_lines.pop(row, None)
+            for widgets in (line.entries, line.combo_boxes):
+                for field in widgets.values():
+                    self._widget_lines.pop(str(field.object), None)
+            self._release_line(line)
         print("self._row_count = ", self._row_count)
 
-        if len(self._line_list) > 0:
-            for line in self._line_list:
-                self.trace_update_entries(line)
-        else:
-            self.trace_update_entries(None)
+        # The other lines did not change, only their sums have to be shown
+        self._bill.remove_line(row)
+        self._show_sums()
 
-        self._root.update()
         # Set the canvas scrolling region again
-        self._canvas.config(scrollregion=self._canvas.bbox("all"))
+        self._schedule_scroll_update()
 
     def save_bill(self):
         """
@@ -447,8 +1010,11 @@ class Application:
         object and save it as a csv file. Afterwards, the screen is reset.
         """
         print("save_bill")
+        # Apply input which is still waiting for the quiet period
+        self._debouncer.flush()
+
         # Update all fields
-        for line in self._line_list:
+        for line in self._lines_by_row.values():
             self.trace_update_entries(line)
 
         store = self._read_entry(self._root_objects.combo_boxes["store"], "str")
@@ -457,17 +1023,14 @@ class Application:
         date: str = self._read_entry(self._root_objects.entries["date"], "str")
 
         time: str = self._read_entry(self._root_objects.entries["time"], "str")
-        discount_sum = self._read_label(self._root_objects.
-                                        labels["discount_sum_var"], "float")
-        quantity_discount_sum = self._read_label(
-            self._root_objects.labels["quantity_discount_sum_var"], "float")
-        sale_sum = self._read_label(self._root_objects.labels["sale_sum_var"],
-                                    "float")
-        total = self._read_label(self._root_objects.labels["total_var"],
-                                 "float")
+        # Same values as displayed in the main frame
+        discount_sum = round(self._bill.sums["discount"], 2)
+        quantity_discount_sum = round(self._bill.sums["quantity_discount"], 2)
+        sale_sum = round(self._bill.sums["sale"], 2)
+        total = round(self._bill.sums["price_final"], 2)
 
         product_list = list()
-        for line in self._line_list:
+        for line in self._lines_by_row.values():
             product = self._read_product_from_line(line, False)
             # Skip empty line
             if product.name == '' and product.price_final == 0:
@@ -486,6 +1049,8 @@ class Application:
                       "product_list": product_list}
 
         backend.create_bill(user_input)
+        if self._poll_id is None:
+            self._poll_writes()
 
         self._clear_screen()
         self._reset()
@@ -503,7 +1068,8 @@ class Application:
         """
         print("export_bills")
         self.save_bill()
-        backend.export_bills()
+        backend.submit_write("export", backend.export_bills)
+        backend.stop_writer()
         sys.exit()
 
     def _read_product_from_line(self, line, new_product):
@@ -566,22 +1132,20 @@ class Application:
 
         print("save_template")
         # Search for the Line object with the correct row number
-        curr_line = None
-        for line in self._line_list:
-            if line.row == row:
-                curr_line = line
-                break
+        curr_line = self._lines_by_row.get(row)
         if not curr_line:
             raise SystemError
 
         product = self._read_product_from_line(curr_line, True)
         backend.create_template(product)
+        if self._poll_id is None:
+            self._poll_writes()
 
         # Alphabetically sort the list that is passed to the Combobox
         name_list = sorted([key for key, _ in backend.TEMPLATES.items()])
 
         # Update all Comboboxes so they show this new template
-        for line in self._line_list:
+        for line in self._lines_by_row.values():
             line.combo_boxes["template"].object["values"] = name_list
 
         # TODO: why is this here?
@@ -592,6 +1156,32 @@ class Application:
         # back to normal
         self._compare_line_to_file(curr_line)
 
+    def schedule_trace_template(self, row):
+        """
+        Gets called when the StringVar of a Combobox in the scrollable region
+        changes. Runs trace_template once the user stops typing, so fast typing
+        only causes one search
+
+        Parameters:
+            row: int
+                Row of the changed Combobox
+        """
+        self._debouncer.call(("template", row), self.trace_template, row)
+
+    def schedule_trace_store(self):
+        """
+        Gets called when the StringVar of the "store" Combobox changes. Runs
+        trace_store once the user stops typing
+        """
+        self._debouncer.call("store", self.trace_store)
+
+    def schedule_trace_payment(self):
+        """
+        Gets called when the StringVar of the "payment" Combobox changes. Runs
+        trace_payment once the user stops typing
+        """
+        self._debouncer.call("payment", self.trace_payment)
+
     def trace_template(self, row):
         """
         Gets called when the StringVar of a Combobox in the scrollable region
@@ -604,11 +1194,7 @@ class Application:
                 the product template dictionary
         """
         # Search for the Line object with the correct row number
-        curr_line = None
-        for index, line in enumerate(self._line_list):
-            if line.row == row:
-                curr_line = self._line_list[index]
-                break
+        curr_line = self._lines_by_row.get(row)
 
         if curr_line is None:
             raise SystemError
@@ -617,25 +1203,31 @@ class Application:
         template_input = self._read_entry(curr_line.combo_boxes["template"],
                                           "str").lower()
 
-        temp_dict = dict()
-        if backend.CONFIG["DEFAULT"]["regex"]:
+        fuzzy = backend.CONFIG["DEFAULT"].getboolean("fuzzy search",
+                                                     fallback=False)
+        if fuzzy:
+            # Rank product names by similarity, this also finds typos
+            temp_dict = backend.fuzzy_search(template_input)
+        elif backend.CONFIG["DEFAULT"]["regex"]:
             # Treat the user input as regex pattern and find matching product
             # names
-            temp_dict = backend.regex_search(template_input)
+            temp_dict = backend.regex_search(template_input,
+                                             curr_line.search_session)
         else:
             # Add all template entries who contain the user input
-            for key, field in backend.TEMPLATES.items():
-                if template_input in key.lower():
-                    temp_dict.update({key: field})
+            temp_dict = backend.substring_search(template_input,
+                                                 curr_line.search_session)
 
         if temp_dict is None:
             return
 
         print("len(temp_dict): ", len(temp_dict))
 
-        # Show the matching entries in the dropdown of the current Combobox
-        name_list = sorted([key for key, field in temp_dict.items()
-                            if field.display])
+        # Show the matching entries in the dropdown of the current Combobox.
+        # Fuzzy matches are already sorted by their rank
+        name_list = [key for key, field in temp_dict.items() if field.display]
+        if not fuzzy:
+            name_list.sort()
         curr_line.combo_boxes["template"].object["values"] = name_list
 
         # If no matches, clear all values in this row
@@ -745,9 +1337,12 @@ class Application:
             self._root_objects.combo_boxes["payment"].object.set('')
         # if store is Billa, Billa Plus or Merkur: change payment to Karte
         if len(store_list) == 1:
-            # Set text in Combobox to matching store
+            # Set text in Combobox to matching store. Only write if it changes,
+            # every write schedules trace_store again
             # self._root_objects.trace_vars["store"].object.set(store_list[0])
-            self._root_objects.combo_boxes["store"].trace_var.set(store_list[0])
+            store_var = self._root_objects.combo_boxes["store"].trace_var
+            if store_var.get() != store_list[0]:
+                store_var.set(store_list[0])
             payment = backend.STORES[store_list[0]]["default_payment"]
             print("payment: ", payment)
             # if store_list[0] in ["Billa", "Billa Plus", "Merkur"]:
@@ -758,7 +1353,10 @@ class Application:
             for key, field in backend.STORES.items():
                 if store_input == key.lower():
                     # Set text in Combobox to matching store
-                    self._root_objects.combo_boxes["store"].trace_var.set(key)
+                    store_var = self._root_objects.combo_boxes["store"].\
+                        trace_var
+                    if store_var.get() != key:
+                        store_var.set(key)
                     payment = field["default_payment"]
                     print("payment: ", payment)
                     self._root_objects.combo_boxes["payment"].object. \
@@ -824,50 +1422,19 @@ class Application:
             self._calculate_discount(curr_line)
             self._calculate_price_final(curr_line)
             self._compare_line_to_file(curr_line)
-        self._calculate_total()
-
-        # Add values of "price_quantity", "discount", "quantity_discount" and
-        # "sale" from all Line objects in the scrollable region
-        discount_sum = 0.0
-        quantity_discount_sum = 0.0
-        sale_sum = 0.0
-
-        for line in self._line_list:
-            discount_sum += self._read_entry(line.entries["discount"], "float")
-            quantity_discount_sum += self._read_entry(line.entries
-                                                      ["quantity_discount"],
-                                                      "float")
-            sale_sum += self._read_entry(line.entries["sale"], "float")
-
-        # Display the calculated values in the root window
-        discount_sum = self._float2str(discount_sum)
-        quantity_discount_sum = self._float2str(quantity_discount_sum)
-        sale_sum = self._float2str(sale_sum)
-
-        self._root_objects.labels["discount_sum_var"].object.\
-            config(text=discount_sum)
-        self._root_objects.labels["quantity_discount_sum_var"].object.\
-            config(text=quantity_discount_sum)
-        self._root_objects.labels["sale_sum_var"].object.config(text=sale_sum)
-
-        # TODO: integrate this into the loop above
-        price_quantity_sum = 0.0
-        for line in self._line_list:
-            price_quantity_sum += self._read_entry(
-                line.entries["price_quantity"], "float")
-        price_quantity_sum = self._float2str(price_quantity_sum)
-        self._root_objects.labels["price_quantity_sum_var"].object.\
-            config(text=price_quantity_sum)
+            self._bill.set_line(curr_line.row, curr_line.values)
+        self._show_sums()
 
         # in "time" label, replace '-' with ':'
         time = self._read_entry(self._root_objects.entries["time"], "str")
-        time = time.replace('-', ':')
-        self._root_objects.entries["time"].object.delete(0, "end")
-        self._root_objects.entries["time"].object.insert(0, time)
+        if '-' in time:
+            time = time.replace('-', ':')
+            self._root_objects.entries["time"].object.delete(0, "end")
+            self._root_objects.entries["time"].object.insert(0, time)
 
     def _compare_line_to_file(self, line):
         """
-        Compare fields in line with corresponding values in product json.
+        Compare fields in line with the saved values of its product template.
         If there is a difference, change the colour of the "save" button
 
         Parameters:
@@ -875,75 +1442,66 @@ class Application:
                 The current Line object holding the values of the current line
         """
         print("_compare_line_to_template")
-        # Get product identifier
         line_name = line.entries["name"].object.get().rstrip()
         if not line_name:
             return
-        if line_name not in backend.PRODUCT_KEYS:
+        # Saved values of the template, kept in memory by the backend
+        data = backend.template_defaults(line_name)
+        if data is None:
             # self._change_button_colour(line.buttons["save_template"], "red")
             line.buttons["save_template"].change_bg("red")
             return
 
-        identifier = backend.PRODUCT_KEYS[line_name]
         print("line_name: ", line_name)
-        filename = identifier + ".json"
-        path = backend.CONFIG["FOLDERS"]["product folder"]
-        encoding = backend.CONFIG["DEFAULT"]["encoding"]
         if line.values == {}:
             return
-        if os.path.isfile(path + filename):
-            with open(path + filename, 'r', encoding=encoding) as in_file:
-                data = json.load(in_file)
-            template_price_single = data["default_price_per_unit"]
-            template_quantity = data["default_quantity"]
-            if template_quantity == 0:
-                template_quantity = 1
-            template_product_class = data["product_class"]
-            template_unknown = data["unknown"]
-
-            line_price_single = line.values["price_single"]
-            line_quantity = line.values["quantity"]
-            line_product_class = self._read_entry(line.entries["product_class"],
-                                                  "str")
-            line_unknown = self._read_entry(line.entries["unknown"], "str")
-
-            eq_ps = not (template_price_single == line_price_single)
-            eq_q = not (template_quantity == line_quantity)
-            eq_pc = not (template_product_class == line_product_class)
-            eq_u = not (template_unknown == line_unknown)
-
-            if eq_ps:
-                line.entries["price_single"].change_bg("gold")
-            else:
-                default_colour = line.entries["price_single"].bg
-                line.entries["price_single"].change_bg(default_colour)
-
-            if eq_q:
-                line.entries["quantity"].change_bg("gold")
-            else:
-                default_colour = line.entries["quantity"].bg
-                line.entries["quantity"].change_bg(default_colour)
-
-            if eq_pc:
-                line.entries["product_class"].change_bg("gold")
-            else:
-                default_colour = line.entries["product_class"].bg
-                line.entries["product_class"].change_bg(default_colour)
-
-            if eq_u:
-                line.entries["unknown"].change_bg("gold")
-            else:
-                default_colour = line.entries["unknown"].bg
-                line.entries["unknown"].change_bg(default_colour)
-
-            if eq_ps or eq_q or eq_pc or eq_u:
-                line.buttons["save_template"].change_bg("gold")
-            else:
-                default_colour = line.buttons["save_template"].bg
-                line.buttons["save_template"].change_bg(default_colour)
+        template_price_single = data["default_price_per_unit"]
+        template_quantity = data["default_quantity"]
+        if template_quantity == 0:
+            template_quantity = 1
+        template_product_class = data["product_class"]
+        template_unknown = data["unknown"]
+
+        line_price_single = line.values["price_single"]
+        line_quantity = line.values["quantity"]
+        line_product_class = self._read_entry(line.entries["product_class"],
+                                              "str")
+        line_unknown = self._read_entry(line.entries["unknown"], "str")
+
+        eq_ps = not (template_price_single == line_price_single)
+        eq_q = not (template_quantity == line_quantity)
+        eq_pc = not (template_product_class == line_product_class)
+        eq_u = not (template_unknown == line_unknown)
+
+        if eq_ps:
+            line.entries["price_single"].change_bg("gold")
+        else:
+            default_colour = line.entries["price_single"].bg
+            line.entries["price_single"].change_bg(default_colour)
 
+        if eq_q:
+            line.entries["quantity"].change_bg("gold")
         else:
-            line.buttons["save_template"].change_bg("red")
+            default_colour = line.entries["quantity"].bg
+            line.entries["quantity"].change_bg(default_colour)
+
+        if eq_pc:
+            line.entries["product_class"].change_bg("gold")
+        else:
+            default_colour = line.entries["product_class"].bg
+            line.entries["product_class"].change_bg(default_colour)
+
+        if eq_u:
+            line.entries["unknown"].change_bg("gold")
+        else:
+            default_colour = line.entries["unknown"].bg
+            line.entries["unknown"].change_bg(default_colour)
+
+        if eq_ps or eq_q or eq_pc or eq_u:
+            line.buttons["save_template"].change_bg("gold")
+        else:
+            default_colour = line.buttons["save_template"].bg
+            line.buttons["save_template"].change_bg(default_colour)
 
     def _read_line_values(self, line):
         """
@@ -1062,24 +1620,20 @@ class Application:
         line.entries["price_final"].object.delete(0, "end")
         line.entries["price_final"].object.insert(0, price_final)
 
-    def _calculate_total(self):
+    def _show_sums(self):
         """
-        Add all "price_final" from all items and display the result in the main
-        frame
+        Display the sums of the bill in the main frame, only labels whose text
+        changed are updated
         """
-        print("_calculate_total")
-        total = 0.0
-        for line in self._line_list:
-            # If there is a row where calculation has not yet happened
-            try:
-                price_final = line.values["price_final"]
-            except KeyError:
-                return
-
-            total += price_final
-
-        total = self._float2str(total)
-        self._root_objects.labels["total_var"].object.config(text=total)
+        for key, label in (("price_quantity", "price_quantity_sum_var"),
+                           ("discount", "discount_sum_var"),
+                           ("quantity_discount", "quantity_discount_sum_var"),
+                           ("sale", "sale_sum_var"),
+                           ("price_final", "total_var")):
+            text = self._float2str(self._bill.sums[key])
+            if self._shown_sums.get(label) != text:
+                self._root_objects.labels[label].object.config(text=text)
+                self._shown_sums.update({label: text})
 
     # TODO: split into 2 methods entry2str and entry2float
     @staticmethod
@@ -1145,28 +1699,36 @@ class Application:
             event: tkinter.Event
                 Event triggered by a key release
         """
+        # Enter and the function keys act on the current input, so searches
+        # waiting for the quiet period are run first
+        if event.keysym in FLUSH_KEYS:
+            self._debouncer.flush()
+
         # F1: Calculate all, create a new Line object in the scrollable region
         #     and move the cursor to its Combobox
         if event.keysym == "F1":
-            for line in self._line_list:
+            for line in self._lines_by_row.values():
                 self.trace_update_entries(line)
             self.add_new_row()
-            self._line_list[-1].combo_boxes["template"].object.focus_set()
+            self._last_line().combo_boxes["template"].object.focus_set()
         # F2: Create a new Line object in the scrollable region and move the
         #     cursor to its Combobox
         elif event.keysym == "F2":
             self.add_new_row()
-            self._line_list[-1].combo_boxes["template"].object.focus_set()
+            self._last_line().combo_boxes["template"].object.focus_set()
         # F3: Move the cursor to the "date" EntryContainer field
         elif event.keysym == "F3":
             self._root_objects.entries["date"].object.focus_set()
         # F4: Move the cursor to the Combobox of the Line at the very bottom of
         #     the scrollable region
         elif event.keysym == "F4":
-            self._line_list[-1].combo_boxes["template"].object.focus_set()
+            self._bind_line(self._last_line())
+            self._scroll_to_end = True
+            self._schedule_scroll_update()
+            self._last_line().combo_boxes["template"].object.focus_set()
         # F5: Calculate all
         elif event.keysym == "F5":
-            for line in self._line_list:
+            for line in self._lines_by_row.values():
                 self.trace_update_entries(line)
         # F6: Insert default discount class into active row
         #     If a discount value is already present, delete it
@@ -1174,28 +1736,28 @@ class Application:
             active_row = self._get_active_row()
             print("active row: ", active_row)
 
-            for line in self._line_list:
-                if line.row == active_row:
-                    # Get current discount class input
-                    curr_discount_class = self._read_entry(
-                        line.entries["discount_class"], "str")
-
-                    if curr_discount_class == "":
-                        store = self._read_entry(
-                            self._root_objects.combo_boxes["store"],
-                            "str")
-                        if store in backend.STORES:
-                            discount_class = backend.STORES[store][
-                                "default_discount_class"]
-                        else:
-                            return
-                        line.entries["discount_class"].object.delete(0, "end")
-                        line.entries["discount_class"].object.\
-                            insert(0, discount_class)
+            line = self._lines_by_row.get(active_row)
+            if line is not None:
+                # Get current discount class input
+                curr_discount_class = self._read_entry(
+                    line.entries["discount_class"], "str")
+
+                if curr_discount_class == "":
+                    store = self._read_entry(
+                        self._root_objects.combo_boxes["store"],
+                        "str")
+                    if store in backend.STORES:
+                        discount_class = backend.STORES[store][
+                            "default_discount_class"]
                     else:
-                        line.entries["discount_class"].object.delete(0, "end")
+                        return
+                    line.entries["discount_class"].object.delete(0, "end")
+                    line.entries["discount_class"].object.\
+                        insert(0, discount_class)
+                else:
+                    line.entries["discount_class"].object.delete(0, "end")
 
-            for line in self._line_list:
+            for line in self._lines_by_row.values():
                 self.trace_update_entries(line)
 
     def _get_active_row(self):
@@ -1208,23 +1770,11 @@ class Application:
                 Row value of the active tkinter widget
         """
         current_focus = str(self._root.focus_get())
-        if "entry" in current_focus:
-            # Iterate through all line objects and compare entry IDs with the
-            # current focus
-            for line in self._line_list:
-                for key, field in line.entries.items():
-                    if str(field.object) == current_focus:
-                        print("active object: ", key, field)
-                        return line.row
-
-        elif "combobox" in current_focus:
-            # Iterate through all line objects and compare combobox IDs with the
-            # current focus
-            for line in self._line_list:
-                for key, field in line.combo_boxes.items():
-                    if str(field.object) == current_focus:
-                        print("active object: ", key, field)
-                        return line.row
+        # Only the entries and Comboboxes of the scrollable region are stored
+        if current_focus in self._widget_lines:
+            line, key = self._widget_lines[current_focus]
+            print("active object: ", key, current_focus)
+            return line.row
 
         return -1
 
@@ -1247,7 +1797,7 @@ class Application:
         out_str = str(in_float)
         return out_str
 
-    def _create_line(self, frame, row):
+    def _create_line(self, frame, row, widgets=None):
         """
         Look through all lists of tkinter objects, if they have the correct
         frame_key, create them and store them in a Line object.
@@ -1257,6 +1807,9 @@ class Application:
                 Frame where the Line will be created
             row: int
                 In which row is the new Line object
+            widgets: dict
+                Objects of a parked line to use instead of creating new ones,
+                see Line.park()
         Returns:
             line:Line
                 The created Line object
@@ -1268,5 +1821,5 @@ class Application:
         check_buttons: dict = tko.create_check_buttons(self, frame, row)
 
         line = Line(self, frame, row, labels, entries, buttons, combo_boxes,
-                    check_buttons)
+                    check_buttons, widgets)
         return line
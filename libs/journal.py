@@ -0,0 +1,114 @@
+"""
+Write-ahead journal for saved bills. Every bill is appended as one json line and
+synced to disk, the product files, registries and backup csv files derived from
+it are written later in batches. Records which were not applied yet, e.g. after
+a crash, are read again when the journal is opened.
+"""
+import json  # To encode the journal records
+import os  # To sync and replace the journal file
+import threading  # To guard the records against the background writer
+
+
+class BillJournal:
+    """
+    Append-only file of bill records which are not yet applied to the other
+    files of the program
+
+    ...
+    Attributes
+    ----------
+    encoding: str
+        Encoding of the journal file
+    path: str
+        Path to the journal file
+    records: list of dicts
+        Records in the journal, oldest first
+
+    Methods
+    -------
+    append(self, record):
+        Append a record and sync it to disk
+    pending(self):
+        Return a copy of the records
+    discard(self, count):
+        Remove the oldest records after they were applied
+    """
+
+    def __init__(self, path, encoding):
+        self.path = path
+        self.encoding = encoding
+        self.records = []
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        if os.path.isfile(path):
+            incomplete = False
+            with open(path, 'r', encoding=encoding) as in_file:
+                for line in in_file:
+                    try:
+                        self.records.append(json.loads(line))
+                    except ValueError:
+                        # Incomplete last line of a crash while appending,
+                        # the bill was never reported as saved
+                        incomplete = True
+                        break
+            # Remove the incomplete line so the next record starts on a new
+            # line
+            if incomplete:
+                self._rewrite()
+
+    def __len__(self):
+        return len(self.records)
+
+    def append(self, record):
+        """
+        Append a record to the journal file and sync it to disk. The record is
+        safe once this returns
+
+        Parameters:
+            record (dict): json serializable record of one bill
+        """
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            with open(self.path, 'a', encoding=self.encoding) as out_file:
+                out_file.write(line)
+                out_file.flush()
+                os.fsync(out_file.fileno())
+            self.records.append(record)
+
+    def pending(self):
+        """
+        Return a copy of the records, oldest first
+
+        Returns:
+            records (list of dicts): Records which are not applied yet
+        """
+        with self._lock:
+            return list(self.records)
+
+    def discard(self, count):
+        """
+        Remove the oldest records after they were applied. The remaining
+        records are written to a new file which replaces the journal, so a
+        crash leaves either the old or the new journal
+
+        Parameters:
+            count (int): Number of applied records
+        """
+        with self._lock:
+            del self.records[:count]
+            self._rewrite()
+
+    def _rewrite(self):
+        """
+        Replace the journal file with the current records
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding=self.encoding) as out_file:
+            for record in self.records:
+                out_file.write(json.dumps(record) + "\n")
+            out_file.flush()
+            os.fsync(out_file.fileno())
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,407 @@
+"""
+Search index for the product template names. Lowercase names are computed once
+and every name is indexed by its trigrams (all substrings of 3 characters), so
+a search only has to look at names which contain all trigrams of the user input.
+"""
+import heapq  # To keep only the best fuzzy matches
+import re  # To match user input with product templates
+
+# Characters with a special meaning in a regex pattern, except '*'
+REGEX_SPECIAL = set(".^$+?{}[]\\|()")
+
+
+def trigrams(text):
+    """
+    Returns all substrings of length 3 of the given text
+
+    Parameters:
+        text (str): Lowercase text
+
+    Returns:
+        (set of str): The trigrams of the text, empty if text is shorter than 3
+    """
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def prefix_distance(query, word):
+    """
+    Levenshtein distance between query and the closest prefix of word, so a
+    partly typed word is not punished for its missing end
+
+    Parameters:
+        query (str): Lowercase word typed by the user
+        word (str): Lowercase word of a product name
+
+    Returns:
+        (int): Smallest number of insertions, deletions and substitutions to
+               turn query into a prefix of word
+    """
+    # previous[j]: distance between the processed part of query and word[:j]
+    previous = list(range(len(word) + 1))
+    for index, query_char in enumerate(query, 1):
+        current = [index]
+        for word_index, word_char in enumerate(word, 1):
+            current.append(min(previous[word_index] + 1,
+                               current[word_index - 1] + 1,
+                               previous[word_index - 1] +
+                               (query_char != word_char)))
+        previous = current
+    return min(previous)
+
+
+def fuzzy_score(query_words, lower_name, distances):
+    """
+    Similarity between the words of the user input and a product name. Every
+    query word is compared to the best matching word of the name, a word may
+    contain a typo for every 3 characters
+
+    Parameters:
+        query_words (list of str): Lowercase words typed by the user
+        lower_name (str): Lowercase product name
+        distances (dict): Cache of prefix_distance results, key: (query word,
+                          name word). Product names share most of their words,
+                          so most distances are only calculated once
+
+    Returns:
+        (float): 0 if a query word matches no word of the name, otherwise the
+                 average word similarity between 0 and 1. Words found as a
+                 substring of the name score 1
+    """
+    name_words = lower_name.split()
+    total = 0.0
+    for query_word in query_words:
+        if query_word in lower_name:
+            total += 1.0
+            continue
+        allowed = len(query_word) // 3
+        if not allowed:
+            return 0.0
+        best = allowed + 1
+        for word in name_words:
+            distance = distances.get((query_word, word))
+            if distance is None:
+                distance = prefix_distance(query_word, word)
+                distances[(query_word, word)] = distance
+            best = min(best, distance)
+        if best > allowed:
+            return 0.0
+        total += 1.0 - best / len(query_word)
+    return total / len(query_words)
+
+
+class SearchIndex:
+    """
+    Trigram index over product names
+
+    ...
+    Attributes
+    ----------
+    lower_names: dict
+        key: product name, field: lowercase product name
+    trigram_names: dict
+        key: trigram, field: set of product names whose lowercase name contains
+        the trigram
+    version: int
+        Increased whenever a name is added or removed, so SearchSession objects
+        know when their stored results are outdated
+
+    Methods
+    -------
+    add(self, name):
+        Add a product name to the index
+    remove(self, name):
+        Remove a product name from the index
+    clear(self):
+        Remove all product names
+    candidates(self, fragments):
+        Return all names which could contain all given fragments
+    substring(self, query):
+        Return all names which contain the query
+    wildcard(self, query):
+        Return all names matching the query, '*' matches any text
+    fuzzy(self, query, top_k, bonus, keep):
+        Return the top_k names most similar to the query
+    """
+
+    def __init__(self):
+        self.lower_names = dict()
+        self.trigram_names = dict()
+        self.version = 0
+
+    def __len__(self):
+        return len(self.lower_names)
+
+    def add(self, name):
+        """
+        Add a product name to the index. Adding a name twice has no effect
+
+        Parameters:
+            name (str): Product name
+        """
+        if name in self.lower_names:
+            return
+        lower_name = name.lower()
+        self.lower_names[name] = lower_name
+        self.version += 1
+        for trigram in trigrams(lower_name):
+            self.trigram_names.setdefault(trigram, set()).add(name)
+
+    def remove(self, name):
+        """
+        Remove a product name from the index
+
+        Parameters:
+            name (str): Product name
+        """
+        lower_name = self.lower_names.pop(name, None)
+        if lower_name is None:
+            return
+        self.version += 1
+        for trigram in trigrams(lower_name):
+            names = self.trigram_names[trigram]
+            names.discard(name)
+            if not names:
+                del self.trigram_names[trigram]
+
+    def clear(self):
+        """
+        Remove all product names
+        """
+        self.lower_names.clear()
+        self.trigram_names.clear()
+        self.version += 1
+
+    def candidates(self, fragments):
+        """
+        Return all names which contain every trigram of the given fragments.
+        The result still has to be checked, the trigrams of a fragment can be
+        spread over a name
+
+        Parameters:
+            fragments (list of str): Lowercase texts which have to be in the
+                                     name
+
+        Returns:
+            (iterable of str): Product names, all names if no fragment is at
+                               least 3 characters long
+        """
+        name_sets = []
+        for fragment in fragments:
+            for trigram in trigrams(fragment):
+                names = self.trigram_names.get(trigram)
+                if not names:
+                    return set()
+                name_sets.append(names)
+
+        if not name_sets:
+            return self.lower_names.keys()
+
+        # Start with the smallest set to keep the intersections small
+        name_sets.sort(key=len)
+        result = set(name_sets[0])
+        for names in name_sets[1:]:
+            result &= names
+            if not result:
+                break
+        return result
+
+    def substring(self, query, within=None):
+        """
+        Return all names which contain the query, ignoring case
+
+        Parameters:
+            query (str): User input
+            within (list of str): If given, only these names are checked
+                                  instead of the trigram candidates
+
+        Returns:
+            (list of str): Matching product names
+        """
+        query = query.lower()
+        if within is None:
+            within = self.candidates([query])
+        return [name for name in within
+                if query in self.lower_names[name]]
+
+    def wildcard(self, query, within=None):
+        """
+        Return all names whose lowercase version matches the query. The query
+        is used as a regex pattern where '*' matches any text and which can
+        match anywhere in the name, same as backend.regex_search always did
+
+        Parameters:
+            query (str): Lowercase user input
+            within (list of str): If given, only these names are checked
+                                  instead of the trigram candidates
+
+        Returns:
+            (list of str): Matching product names. None if the query is not a
+                           valid regex pattern
+        """
+        try:
+            pattern = re.compile(".*" + query.replace('*', ".*"))
+        except re.error:
+            return None
+
+        if within is None:
+            # The trigram filter only works if the parts between the '*' are
+            # plain text, for other regex patterns every name is checked
+            if REGEX_SPECIAL.isdisjoint(query):
+                within = self.candidates(query.split('*'))
+            else:
+                within = self.lower_names.keys()
+
+        return [name for name in within
+                if pattern.match(self.lower_names[name])]
+
+    def fuzzy(self, query, top_k, bonus=None, keep=None):
+        """
+        Return the names most similar to the query, also finding names with
+        typos. Only names sharing at least one trigram with the query are
+        scored and only the best top_k are kept in a heap, so the result and
+        the work to sort it stay small. Queries shorter than a trigram can not
+        be fuzzy matched, for them the names containing the query are ranked
+
+        Parameters:
+            query (str): User input
+            top_k (int): Maximum number of returned names
+            bonus (function): Called with a name, returns a number added to its
+                              score, e.g. for products which are bought often
+            keep (function): Called with a name, returns False if the name is
+                             not shown, e.g. for hidden products. Such names do
+                             not take one of the top_k places
+
+        Returns:
+            (list of str): Matching product names, best match first
+        """
+        # '*' has no meaning here, it is treated like a space
+        query = query.lower().replace('*', ' ')
+        query_words = query.split()
+        if not query_words or top_k <= 0:
+            return []
+
+        if len(query.replace(' ', '')) < 3:
+            # Too short for trigrams, scoring every name for every typed
+            # character would be a full scan
+            query = query.strip()
+            candidates = self.substring(query)
+            # Names with a word starting with the query come first
+            scores = {name: 1.0 if (' ' + self.lower_names[name]).find(
+                ' ' + query) >= 0 else 0.5 for name in candidates}
+        else:
+            candidates = set()
+            for trigram in trigrams(query):
+                candidates.update(self.trigram_names.get(trigram, ()))
+            # Without a shared trigram no name is similar enough
+            scores = None
+
+        distances = dict()
+
+        def scored_names():
+            for name in candidates:
+                if scores is None:
+                    score = fuzzy_score(query_words, self.lower_names[name],
+                                        distances)
+                else:
+                    score = scores[name]
+                if not score or keep is not None and not keep(name):
+                    continue
+                if bonus is not None:
+                    score += bonus(name)
+                # Negated, the best match is the smallest item
+                yield -score, name
+
+        # nsmallest keeps a heap of top_k items. Names with the same score are
+        # ordered by name, also when deciding which of them are kept
+        return [name for _, name in heapq.nsmallest(top_k, scored_names())]
+
+
+class SearchSession:
+    """
+    Search state of one Combobox. When the user types one more character, the
+    matches of the new input are a subset of the previous matches, so only the
+    previous matches are checked instead of the whole index. After a deletion or
+    an edit in the middle of the input, the whole index is searched again
+
+    ...
+    Attributes
+    ----------
+    index: SearchIndex
+        The index to search in
+    mode: str
+        "substring" or "wildcard", the search method of the previous query
+    names: list of str
+        Matches of the previous query, None if there is none
+    query: str
+        The previous query
+    version: int
+        SearchIndex.version when the previous query was searched
+
+    Methods
+    -------
+    search(self, query, mode):
+        Return all names matching the query
+    reset(self):
+        Forget the previous query
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.mode = None
+        self.names = None
+        self.query = None
+        self.version = None
+
+    def search(self, query, mode):
+        """
+        Return all names matching the query, narrowing the previous matches if
+        the query extends the previous one
+
+        Parameters:
+            query (str): User input
+            mode (str): "substring" to use SearchIndex.substring, "wildcard"
+                        to use SearchIndex.wildcard
+
+        Returns:
+            (list of str): Matching product names. None if the query is not a
+                           valid regex pattern in "wildcard" mode
+        """
+        if mode == "substring":
+            search = self.index.substring
+        else:
+            search = self.index.wildcard
+
+        if self._can_narrow(query, mode):
+            names = search(query, self.names)
+        else:
+            names = search(query)
+
+        self.mode = mode
+        self.names = names
+        self.query = query
+        self.version = self.index.version
+        return names
+
+    def reset(self):
+        """
+        Forget the previous query, the next search checks the whole index
+        """
+        self.mode = None
+        self.names = None
+        self.query = None
+        self.version = None
+
+    def _can_narrow(self, query, mode):
+        """
+        Check if the matches of query are a subset of the previous matches
+        """
+        if self.names is None or mode != self.mode or \
+                self.version != self.index.version:
+            return False
+        if not query.startswith(self.query):
+            return False
+        # Appending to a regex pattern can make it match more names, e.g. '?'
+        # makes the previous character optional
+        if mode == "wildcard" and not REGEX_SPECIAL.isdisjoint(query):
+            return False
+        return True
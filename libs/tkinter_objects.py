@@ -11,6 +11,138 @@ import libs.backend as backend
 # TODO: create parent gui object class?
 
 
+class StoredVariable:
+    """
+    Stand-in for a tkinter variable while its object is detached, see
+    StoredWidget
+
+    ...
+
+    Attributes
+    ----------
+    value: str or int
+        The stored value
+
+    Methods
+    -------
+    get(self):
+        Return the value
+    set(self, value):
+        Change the value
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        """
+        Return the value
+        """
+        return self.value
+
+    def set(self, value):
+        """
+        Change the value
+        """
+        self.value = value
+
+
+class StoredWidget:
+    """
+    Stand-in for the tkinter object of a container whose line is scrolled out
+    of view in the virtual line region. It keeps the text and options of the
+    detached object and offers the part of the tkinter API the program uses
+    on the objects of a line, so the containers can be read and changed the
+    same way while they have no real object
+
+    ...
+
+    Attributes
+    ----------
+    options: dict
+        key: tkinter option, e.g. "bg" or "values", field: its value
+    variable: StoredVariable
+        Text of an entry or ComboBox, None for the other objects
+
+    Methods
+    -------
+    get(self):
+        Return the text
+    delete(self, first, last=None):
+        Remove the characters from first to last
+    insert(self, index, text):
+        Insert text at the index
+    configure(self, **options):
+        Change options, e.g. the background colour
+    cget(self, key):
+        Return the value of an option
+    """
+    def __init__(self, variable=None, options=None):
+        self.variable = variable
+        self.options = dict() if options is None else options
+
+    def __getitem__(self, key):
+        return self.options[key]
+
+    def __setitem__(self, key, value):
+        self.options[key] = value
+
+    def get(self):
+        """
+        Return the text
+        """
+        return self.variable.get()
+
+    def delete(self, first, last=None):
+        """
+        Remove the characters from first to last, like tkinter.Entry.delete
+        """
+        text = self.variable.get()
+        first = self._index(first, text)
+        last = first + 1 if last is None else self._index(last, text)
+        self.variable.set(text[:first] + text[last:])
+
+    def insert(self, index, text):
+        """
+        Insert text at the index, like tkinter.Entry.insert
+        """
+        old_text = self.variable.get()
+        index = self._index(index, old_text)
+        self.variable.set(old_text[:index] + str(text) + old_text[index:])
+
+    def configure(self, **options):
+        """
+        Change options, e.g. the background colour
+        """
+        self.options.update(options)
+
+    config = configure
+
+    def cget(self, key):
+        """
+        Return the value of an option
+        """
+        return self.options.get(key)
+
+    # Positioning, focus and destruction only concern real objects
+    def grid(self, **_):
+        pass
+
+    def grid_remove(self):
+        pass
+
+    def focus_set(self):
+        pass
+
+    def destroy(self):
+        pass
+
+    @staticmethod
+    def _index(index, text):
+        if index == "end":
+            return len(text)
+        return min(int(index), len(text))
+
+
 class LabelContainer:
     """
     All information to create a tkinter.Label object as well as the created
@@ -43,6 +175,8 @@ class LabelContainer:
     -------
     create(self):
         Create the tkinter object and position it using grid()
+    reset(self):
+        Restore the text
     """
     def __init__(self, frame, text, column, row, sticky, font):
         self.frame = frame
@@ -63,6 +197,12 @@ class LabelContainer:
                                fg=self.fg, font=self.font)
         self.object.grid(row=self.row, column=self.column, sticky=self.sticky)
 
+    def reset(self):
+        """
+        Restore the text
+        """
+        self.object.configure(text=self.text)
+
 
 class EntryContainer:
     """
@@ -96,6 +236,14 @@ class EntryContainer:
         Change the background colour of the field
     create(self):
         Create the tkinter object and position it using grid()
+    reset(self):
+        Clear the text and restore the background colour
+    stand_in(self):
+        Use a StoredWidget in the state of a created object
+    detach(self):
+        Replace the tkinter object by a StoredWidget with its state
+    attach(self, widget):
+        Show the stored state in a detached tkinter object
     """
 
     def __init__(self, frame, column, row, width, bg, fg):
@@ -116,6 +264,55 @@ class EntryContainer:
                                fg=self.fg)
         self.object.grid(row=self.row, column=self.column, sticky=self.sticky)
 
+    def reset(self):
+        """
+        Clear the text and restore the background colour, so the object looks
+        like it was just created
+        """
+        self.object.delete(0, "end")
+        self.object.configure(bg=self.bg)
+
+    def stand_in(self):
+        """
+        Use a StoredWidget in the state of a just created object instead of
+        creating the tkinter object
+        """
+        self.object = StoredWidget(StoredVariable(''), {"bg": self.bg})
+
+    def detach(self):
+        """
+        Replace the tkinter object by a StoredWidget holding its text and
+        background colour and remove it from the grid
+
+        Returns:
+            widget (tkinter.Entry): The detached object
+        """
+        widget = self.object
+        self.object = StoredWidget(StoredVariable(widget.get()),
+                                   {"bg": widget.cget("bg")})
+        widget.grid_remove()
+        return widget
+
+    def attach(self, widget):
+        """
+        Show the stored text and background colour in a detached tkinter
+        object, position it in the row of this container and use it as object.
+        Creates a new object if widget is None
+
+        Parameters:
+            widget (tkinter.Entry): Object returned by detach() of any
+                                    container created with the same key
+        """
+        stored = self.object
+        if widget is None:
+            self.create()
+        else:
+            self.object = widget
+            widget.grid(row=self.row, column=self.column, sticky=self.sticky)
+        self.object.delete(0, "end")
+        self.object.insert(0, stored.get())
+        self.object.configure(bg=stored.cget("bg"))
+
     def change_bg(self, new_colour):
         """
         Change the background colour of the field
@@ -140,6 +337,8 @@ class ButtonContainer:
         Background colour
     column: str
         Horizontal grid value
+    default_bg: str
+        Background colour of the created object, before change_bg was called
     font: str
         Text font
     frame: tkinter.Frame
@@ -163,6 +362,14 @@ class ButtonContainer:
         Change the background colour of the field
     create(self):
         Create the tkinter object and position it using grid()
+    reset(self):
+        Restore the background colour of the created object
+    stand_in(self):
+        Use a StoredWidget in the state of a created object
+    detach(self):
+        Replace the tkinter object by a StoredWidget with its state
+    attach(self, widget):
+        Show the stored state in a detached tkinter object
     """
     def __init__(self, frame, text, func, param, column, row, font):
         self.frame = frame
@@ -173,6 +380,7 @@ class ButtonContainer:
         self.row = row
         self.font = font
         self.bg = "white"
+        self.default_bg = None
         self.sticky = "news"
         self.object = None
 
@@ -180,16 +388,65 @@ class ButtonContainer:
         """
         Create the tkinter object and position it using grid()
         """
-        def command():
-            if self.param is not None:
-                self.func(self.param)
-            else:
-                self.func()
-
         self.object = tk.Button(self.frame, text=self.text,
-                                width=len(self.text), command=command,
+                                width=len(self.text), command=self._command,
                                 font=self.font)
         self.object.grid(row=self.row, column=self.column, sticky=self.sticky)
+        self.default_bg = self.object.cget("bg")
+
+    def reset(self):
+        """
+        Restore the background colour of the created object
+        """
+        self.object.configure(bg=self.default_bg)
+
+    def stand_in(self):
+        """
+        Use a StoredWidget in the state of a just created object instead of
+        creating the tkinter object. The default colour is taken from the
+        object attached later
+        """
+        self.object = StoredWidget(options={"bg": None})
+
+    def detach(self):
+        """
+        Replace the tkinter object by a StoredWidget holding its background
+        colour and remove it from the grid
+
+        Returns:
+            widget (tuple): The detached tkinter.Button and its default
+                            background colour
+        """
+        widget = self.object
+        self.object = StoredWidget(options={"bg": widget.cget("bg")})
+        widget.grid_remove()
+        return widget, self.default_bg
+
+    def attach(self, widget):
+        """
+        Show the stored background colour in a detached tkinter object, let it
+        call func of this container, position it in the row of this container
+        and use it as object. Creates a new object if widget is None
+
+        Parameters:
+            widget (tuple): Returned by detach() of any container created with
+                            the same key
+        """
+        stored = self.object
+        if widget is None:
+            self.create()
+        else:
+            self.object, self.default_bg = widget
+            self.object.configure(command=self._command)
+            self.object.grid(row=self.row, column=self.column,
+                             sticky=self.sticky)
+        self.object.configure(bg=stored.cget("bg") or self.default_bg)
+
+    def _command(self):
+        if self.param is not None:
+            self.func(self.param)
+        else:
+            self.func()
 
     def change_bg(self, new_colour):
         """
@@ -217,6 +474,8 @@ class ComboBoxContainer:
         Where this object will be displayed
     func: function
         Function to execute when button is pressed
+    muted: bool
+        If True, changes of trace_var do not call func
     object: tkinter.Label
         The actual tkinter object
     param: ?
@@ -238,6 +497,14 @@ class ComboBoxContainer:
     -------
     create(self):
         Create the tkinter object and position it using grid()
+    reset(self):
+        Clear the input without calling func and show all values again
+    stand_in(self):
+        Use a StoredWidget in the state of a created object
+    detach(self):
+        Replace the tkinter object by a StoredWidget with its state
+    attach(self, widget):
+        Show the stored state in a detached tkinter object
     """
     def __init__(self, frame, func, param, values, state, column, row,
                  width, sticky):
@@ -252,26 +519,98 @@ class ComboBoxContainer:
         self.sticky = sticky
         self.object = None
         self.trace_var = None
+        self.muted = False
+        self._trace_name = None
 
     def create(self):
         """
         Create the tkinter object and position it using grid()
         """
-        def command(*_):
-            if not self.func:
-                return
-            if self.param is not None:
-                self.func(self.param)
-            else:
-                self.func()
-
         self.trace_var = tk.StringVar()
         self.trace_var.set('')
-        self.trace_var.trace('w', command)
+        self._trace_name = self.trace_var.trace_add("write", self._command)
 
         self.object = ttk.Combobox(self.frame, width=self.width,
                                    textvariable=self.trace_var)
 
+        self.object["values"] = self._box_list()
+        self.object["state"] = self.state
+        self.object.grid(row=self.row, column=self.column, sticky=self.sticky)
+
+    def reset(self):
+        """
+        Clear the input without calling func and show all values in the
+        drop-down again, so the object looks like it was just created
+        """
+        self.muted = True
+        self.trace_var.set('')
+        self.muted = False
+        self.object["values"] = self._box_list()
+
+    def stand_in(self):
+        """
+        Use a StoredWidget in the state of a just created object instead of
+        creating the tkinter object
+        """
+        self.trace_var = StoredVariable('')
+        self.object = StoredWidget(self.trace_var,
+                                   {"values": self._box_list()})
+
+    def detach(self):
+        """
+        Replace the tkinter object by a StoredWidget holding its input and
+        drop-down values and remove it from the grid. The variable of the
+        object stops calling func of this container
+
+        Returns:
+            widget (tuple): The detached ttk.Combobox and its variable
+        """
+        widget, variable = self.object, self.trace_var
+        variable.trace_remove("write", self._trace_name)
+        self.trace_var = StoredVariable(variable.get())
+        self.object = StoredWidget(self.trace_var,
+                                   {"values": widget["values"]})
+        widget.grid_remove()
+        return widget, variable
+
+    def attach(self, widget):
+        """
+        Show the stored input and drop-down values in a detached tkinter
+        object without calling func, position it in the row of this container
+        and use it as object. Creates a new object if widget is None
+
+        Parameters:
+            widget (tuple): Returned by detach() of any container created with
+                            the same key
+        """
+        stored = self.object
+        if widget is None:
+            self.create()
+            self.muted = True
+            self.trace_var.set(stored.get())
+            self.muted = False
+        else:
+            self.object, self.trace_var = widget
+            # Set before the trace is added, so func is not called
+            self.trace_var.set(stored.get())
+            self._trace_name = self.trace_var.trace_add("write",
+                                                        self._command)
+            self.object.grid(row=self.row, column=self.column,
+                             sticky=self.sticky)
+        self.object["values"] = stored["values"]
+
+    def _command(self, *_):
+        if not self.func or self.muted:
+            return
+        if self.param is not None:
+            self.func(self.param)
+        else:
+            self.func()
+
+    def _box_list(self):
+        """
+        Returns the values to be displayed in the drop-down
+        """
         box_list = list()
         if self.values == "templates":
             box_list = sorted([key for key, field in backend.TEMPLATES.items()
@@ -280,9 +619,7 @@ class ComboBoxContainer:
             box_list = sorted(backend.STORES)
         elif self.values == "payments":
             box_list = sorted(backend.PAYMENTS)
-        self.object["values"] = box_list
-        self.object["state"] = self.state
-        self.object.grid(row=self.row, column=self.column, sticky=self.sticky)
+        return box_list
 
 
 class CheckButtonContainer:
@@ -313,6 +650,14 @@ class CheckButtonContainer:
     -------
     create(self):
         Create the tkinter object and position it using grid()
+    reset(self):
+        Restore the default value
+    stand_in(self):
+        Use a StoredWidget in the state of a created object
+    detach(self):
+        Replace the tkinter object by a StoredWidget with its state
+    attach(self, widget):
+        Show the stored state in a detached tkinter object
     """
     def __init__(self, frame, text, column, row, sticky):
         self.frame = frame
@@ -339,6 +684,53 @@ class CheckButtonContainer:
                                      offvalue=0, command=command)
         self.object.grid(row=self.row, column=self.column, sticky=self.sticky)
 
+    def reset(self):
+        """
+        Restore the default value
+        """
+        self.trace_var.set(1)
+
+    def stand_in(self):
+        """
+        Use a StoredWidget in the state of a just created object instead of
+        creating the tkinter object
+        """
+        self.trace_var = StoredVariable(1)
+        self.object = StoredWidget()
+
+    def detach(self):
+        """
+        Replace the tkinter object by a StoredWidget, keep its value and
+        remove it from the grid
+
+        Returns:
+            widget (tuple): The detached tkinter.Checkbutton and its variable
+        """
+        widget, variable = self.object, self.trace_var
+        self.trace_var = StoredVariable(variable.get())
+        self.object = StoredWidget()
+        widget.grid_remove()
+        return widget, variable
+
+    def attach(self, widget):
+        """
+        Show the stored value in a detached tkinter object, position it in the
+        row of this container and use it as object. Creates a new object if
+        widget is None
+
+        Parameters:
+            widget (tuple): Returned by detach() of any container created with
+                            the same key
+        """
+        value = self.trace_var.get()
+        if widget is None:
+            self.create()
+        else:
+            self.object, self.trace_var = widget
+            self.object.grid(row=self.row, column=self.column,
+                             sticky=self.sticky)
+        self.trace_var.set(value)
+
 
 def create_labels(interface, frame):
     """
@@ -406,6 +798,8 @@ def create_labels(interface, frame):
                                     "none 14 bold"),
             "total_var": LabelContainer(interface.frame_main, "", 2, 8, "w",
                                         "none 14 bold"),
+            "write_status": LabelContainer(interface.frame_main, "", 3, 3, "w",
+                                           "none 10 bold"),
             "description": LabelContainer(interface.frame_main,
                                           "Vorlage                            "
                                           "            Produkt                "
@@ -539,18 +933,18 @@ def create_combo_boxes(interface, frame, row):
     if frame == interface.frame_main:
         return {
             "store": ComboBoxContainer(interface.frame_main,
-                                       interface.trace_store, None, "stores",
-                                       "normal", 2, 2, 20, "news"),
+                                       interface.schedule_trace_store, None,
+                                       "stores", "normal", 2, 2, 20, "news"),
             "payment": ComboBoxContainer(interface.frame_main,
-                                         interface.trace_payment, None,
+                                         interface.schedule_trace_payment, None,
                                          "payments", "normal", 2, 3, 20, "news")
         }
     elif frame == interface.frame_fields:
         return {
             "template": ComboBoxContainer(interface.frame_fields,
-                                          interface.trace_template, row,
-                                          "templates", "normal", 0, row, 35,
-                                          "news")
+                                          interface.schedule_trace_template,
+                                          row, "templates", "normal", 0, row,
+                                          35, "news")
         }
     else:
         raise SystemError
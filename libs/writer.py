@@ -0,0 +1,182 @@
+"""
+Background thread which does the disk writes of the program, so saving a bill
+does not block the GUI. Writes run one after another in the order they were
+submitted, so every file is written in the same order as without the thread.
+A reader waits only for the writes of the file it reads, see wait_for().
+"""
+import queue  # To pass the writes to the thread
+import threading  # To run the writes in the background
+import traceback  # To print errors of failed writes
+
+
+class BackgroundWriter:
+    """
+    Runs submitted write functions in a single background thread
+
+    ...
+    Attributes
+    ----------
+    _jobs: queue.Queue
+        Bounded queue of (job id, description, function, arguments, keys).
+        Submitting blocks while the queue is full
+    _next_id: int
+        Id of the next submitted job
+    _open_keys: dict
+        key: key of a submitted job, field: number of jobs with this key which
+        are not done yet
+    _open_keys_changed: threading.Condition
+        Guards _open_keys, notified when a job with keys is done
+    _results: queue.Queue
+        (job id, description, error) of finished jobs, error is None if the
+        write succeeded
+    _thread: threading.Thread
+        The thread running the writes
+    failed: list
+        (description, error) of all failed writes which were polled
+    pending: int
+        Number of submitted writes whose result was not polled yet
+
+    Methods
+    -------
+    submit(self, description, func, *args, keys=()):
+        Queue func(*args) to run in the background thread
+    poll(self):
+        Collect the results of finished writes
+    flush(self):
+        Wait until all submitted writes are done
+    in_writer_thread(self):
+        Check if the caller runs in the background thread
+    wait_for(self, key):
+        Wait until the submitted writes with the given key are done
+    stop(self):
+        Finish all submitted writes and end the thread
+    """
+
+    def __init__(self, max_size):
+        self._jobs = queue.Queue(max_size)
+        self._results = queue.Queue()
+        self._next_id = 0
+        self._open_keys = dict()
+        self._open_keys_changed = threading.Condition()
+        self.pending = 0
+        self.failed = []
+        self._thread = threading.Thread(target=self._run, name="writer",
+                                        daemon=True)
+        self._thread.start()
+
+    def submit(self, description, func, *args, keys=()):
+        """
+        Queue func(*args) to run in the background thread. Blocks while the
+        queue is full
+
+        Parameters:
+            description (str): Shown when the write fails
+            func (function): The write function
+            args: Parameters passed to func
+            keys (iterable): Keys of the data written by func, e.g. product
+                             identifiers, see wait_for()
+
+        Returns:
+            job_id (int): Id of the queued write
+        """
+        job_id = self._next_id
+        self._next_id += 1
+        self.pending += 1
+        keys = tuple(set(keys))
+        if keys:
+            with self._open_keys_changed:
+                for key in keys:
+                    self._open_keys[key] = self._open_keys.get(key, 0) + 1
+        self._jobs.put((job_id, description, func, args, keys))
+        return job_id
+
+    def poll(self):
+        """
+        Collect the results of finished writes without waiting. Errors are
+        added to failed
+
+        Returns:
+            results (list of tuples): (job id, description, error) of the
+                                      writes finished since the last poll
+        """
+        results = []
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if result[2] is not None:
+                self.failed.append((result[1], result[2]))
+            results.append(result)
+        return results
+
+    def flush(self):
+        """
+        Wait until all submitted writes are done, then collect their results.
+        Returns right away in the background thread, a write waiting for the
+        queue it runs from would never finish
+        """
+        if self.in_writer_thread():
+            return
+        self._jobs.join()
+        self.poll()
+
+    def in_writer_thread(self):
+        """
+        Check if the caller runs in the background thread
+
+        Returns:
+            (bool): True if called by a submitted write
+        """
+        return threading.current_thread() is self._thread
+
+    def wait_for(self, key):
+        """
+        Wait until the submitted writes with the given key are done. Writes
+        submitted later or without this key may still be queued. Returns right
+        away in the background thread, the writes submitted before the running
+        one are done already
+
+        Parameters:
+            key: Key passed to submit(), e.g. a product identifier
+        """
+        if self.in_writer_thread():
+            return
+        with self._open_keys_changed:
+            self._open_keys_changed.wait_for(
+                lambda: key not in self._open_keys)
+
+    def stop(self):
+        """
+        Finish all submitted writes and end the thread
+        """
+        self._jobs.put(None)
+        self._thread.join()
+        self.poll()
+
+    def _run(self):
+        """
+        Thread loop: run the queued writes until stop() queues None
+        """
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            job_id, description, func, args, keys = job
+            error = None
+            try:
+                func(*args)
+            except Exception as exception:  # Reported to the GUI by poll()
+                traceback.print_exc()
+                error = exception
+            if keys:
+                with self._open_keys_changed:
+                    for key in keys:
+                        self._open_keys[key] -= 1
+                        if not self._open_keys[key]:
+                            del self._open_keys[key]
+                    self._open_keys_changed.notify_all()
+            self._results.put((job_id, description, error))
+            self._jobs.task_done()
@@ -5,9 +5,8 @@ from libs.gui import Application
 
 if __name__ == '__main__':
     backend.CONFIG = backend.read_config("config.txt")
-    backend.read_products()
-    backend.read_stores()
-    backend.read_payments()
-    backend.read_discount_classes()
+    backend.read_data()
+    backend.start_writer()
     interface = Application()
     interface.loop()
+    backend.stop_writer()
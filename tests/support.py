@@ -0,0 +1,100 @@
+"""
+Setup shared by the tests of libs.backend: a config whose folders and files
+are in a temporary folder, and empty backend data for every test
+"""
+import configparser
+import json
+import os
+import tempfile
+import unittest
+
+import libs.backend as backend
+
+
+def clear_backend():
+    """
+    Empties the data which backend keeps between calls
+    """
+    backend.TEMPLATES.clear()
+    backend.STORES.clear()
+    backend.BILLS.clear()
+    backend.PAYMENTS.clear()
+    backend.PRODUCT_KEYS.clear()
+    backend.TEMPLATE_DEFAULTS.clear()
+    backend.HISTORY_LOG.clear()
+    backend.PURCHASE_STATS.clear()
+    backend.FILENAME_COUNTERS.clear()
+    backend.SEARCH_INDEX.clear()
+    backend.IDENTIFIERS.clear()
+    backend.REGISTRIES.dirty.clear()
+    backend.JOURNAL = None
+
+
+class BackendTestCase(unittest.TestCase):
+    """
+    Runs every test with a new backend.CONFIG. Test cases add or change config
+    values with the config attribute, e.g. {"DEFAULT": {"lazy history": "True"}}
+
+    ...
+    Attributes
+    ----------
+    config: dict
+        key: config section, field: dict of config values of the test case
+    folder: str
+        Temporary folder holding all files of a test
+    product_folder: str
+        Folder of the product json files, ends with the path separator
+    """
+    config = {}
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.folder = self._folder.name
+        self.product_folder = os.path.join(self.folder, "products") + os.sep
+        os.makedirs(self.product_folder)
+
+        values = {
+            "DEFAULT": {"encoding": "utf-8", "delimiter": ';',
+                        "year": "2021", "save history": "True"},
+            "FOLDERS": {"output": self.folder,
+                        "product folder": self.product_folder},
+            "FILES": {name: os.path.join(self.folder, file_name)
+                      for name, file_name in (
+                          ("product keys json", "product_keys.json"),
+                          ("stores json", "stores.json"),
+                          ("payments json", "payments.json"),
+                          ("product database", "products.sqlite3"),
+                          ("history log", "history_log.jsonl"),
+                          ("bill journal", "bill_journal.jsonl"),
+                          ("export watermark", "export_watermark.json"))}}
+        for section, options in self.config.items():
+            values.setdefault(section, {}).update(options)
+        backend.CONFIG = configparser.ConfigParser()
+        backend.CONFIG.read_dict(values)
+
+        clear_backend()
+        backend.reset_history_cache()
+
+    def tearDown(self):
+        clear_backend()
+        self._folder.cleanup()
+
+    def write_product(self, identifier, name, history=()):
+        """
+        Writes a product json file into the product folder
+
+        Parameters:
+            identifier (int): Identifier of the product
+            name (str): Name of the product
+            history (list of dicts): Purchases of the product
+
+        Returns:
+            path (str): Path of the product json file
+        """
+        data = {"name": name, "default_price_per_unit": 1.0,
+                "default_quantity": 1, "product_class": '', "unknown": '',
+                "display": True, "notes": '', "history": list(history)}
+        path = self.product_folder + f"product_{identifier:05}.json"
+        with open(path, 'w', encoding="utf-8") as out_file:
+            json.dump(data, out_file)
+        return path
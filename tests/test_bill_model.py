@@ -0,0 +1,80 @@
+"""
+Tests of the sums of the current bill, kept apart from the tkinter objects
+
+Run from the repository root: python -m unittest
+"""
+import random
+import unittest
+
+from libs.gui import BillModel
+
+
+def line_values(price_final, discount=0.0):
+    values = dict.fromkeys(BillModel.SUM_KEYS, 0.0)
+    values.update({"price_quantity": price_final - discount,
+                   "discount": discount, "price_final": price_final,
+                   "name": "ignored"})
+    return values
+
+
+class BillModelTest(unittest.TestCase):
+
+    def setUp(self):
+        self.model = BillModel()
+
+    def test_lines_are_summed(self):
+        self.model.set_line(0, line_values(2.5, 0.5))
+        self.model.set_line(3, line_values(1.0))
+
+        self.assertEqual(self.model.sums["price_final"], 3.5)
+        self.assertEqual(self.model.sums["discount"], 0.5)
+        self.assertEqual(self.model.sums["price_quantity"], 3.0)
+        self.assertNotIn("name", self.model.lines[0])
+
+    def test_changed_line_replaces_its_values(self):
+        self.model.set_line(0, line_values(2.5))
+        self.model.set_line(1, line_values(1.0))
+
+        self.model.set_line(0, line_values(4.0))
+
+        self.assertEqual(self.model.sums["price_final"], 5.0)
+
+    def test_removed_line_is_subtracted(self):
+        self.model.set_line(0, line_values(2.5))
+        self.model.set_line(1, line_values(1.0))
+
+        self.model.remove_line(0)
+        self.model.remove_line(7)
+
+        self.assertEqual(self.model.sums["price_final"], 1.0)
+        self.assertEqual(list(self.model.lines), [1])
+
+    def test_sums_are_exactly_zero_without_lines(self):
+        self.model.set_line(0, line_values(0.1))
+        self.model.set_line(1, line_values(0.2))
+
+        self.model.remove_line(1)
+        self.model.remove_line(0)
+
+        self.assertEqual(self.model.sums, dict.fromkeys(BillModel.SUM_KEYS,
+                                                        0.0))
+
+    def test_sums_match_a_full_recalculation(self):
+        generator = random.Random(1)
+        for _ in range(500):
+            row = generator.randrange(20)
+            if generator.random() < 0.3:
+                self.model.remove_line(row)
+            else:
+                self.model.set_line(row, line_values(
+                    round(generator.uniform(0, 20), 2),
+                    round(generator.uniform(0, 2), 2)))
+
+        for key in BillModel.SUM_KEYS:
+            self.assertAlmostEqual(
+                self.model.sums[key],
+                sum(values[key] for values in self.model.lines.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""
+Tests of the SQLite product storage
+
+Run from the repository root: python -m unittest
+"""
+import json
+import os
+import tempfile
+import unittest
+
+import libs.database as database
+
+PRODUCT = {"name": "Milch 1l", "default_price_per_unit": 1.04,
+           "default_quantity": 1, "product_class": "Lebensmittel",
+           "unknown": '', "display": True, "notes": '',
+           "history": [{"date_time": "2021-04-03T12:34", "price_single": 1.04,
+                        "quantity": 1.0, "price_final": 1.04},
+                       {"date_time": "2021-04-10T09:00", "price_single": 1.1,
+                        "quantity": 2, "price_final": 2.2}]}
+
+
+class DatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.connection = database.open_database(
+            os.path.join(self._folder.name, "products.sqlite"))
+
+    def tearDown(self):
+        self.connection.close()
+        self._folder.cleanup()
+
+    def _write_json_tree(self, data):
+        product_folder = os.path.join(self._folder.name, "products")
+        os.makedirs(product_folder, exist_ok=True)
+        with open(os.path.join(product_folder, "product_00001.json"), 'w',
+                  encoding="utf-8") as out_file:
+            json.dump(data, out_file)
+        key_json = os.path.join(self._folder.name, "product_keys.json")
+        with open(key_json, 'w', encoding="utf-8") as out_file:
+            json.dump({data["name"]: "product_00001"}, out_file)
+        return product_folder, key_json
+
+    def test_product_round_trip(self):
+        database.write_product(self.connection, 1, PRODUCT)
+
+        rows = database.read_product_rows(self.connection)
+        self.assertEqual(rows, [(1, "Milch 1l", 1.04, 1, "Lebensmittel", '',
+                                 1, '')])
+        history = database.read_history(self.connection, 1)
+        self.assertEqual(history, PRODUCT["history"])
+        # Numbers keep their type
+        self.assertIsInstance(history[0]["quantity"], float)
+        self.assertIsInstance(history[1]["quantity"], int)
+        self.assertEqual(database.read_all_histories(self.connection),
+                         {1: PRODUCT["history"]})
+        self.assertEqual(database.read_product_keys(self.connection),
+                         {"Milch 1l": "product_00001"})
+
+    def test_equal_entries_are_stored_once(self):
+        database.write_product(self.connection, 1, PRODUCT)
+        entry = dict(PRODUCT["history"][0], quantity=1)
+
+        database.add_history(self.connection, 1, [entry])
+
+        self.assertEqual(len(database.read_history(self.connection, 1)), 2)
+
+    def test_import_keeps_changed_products(self):
+        product_folder, key_json = self._write_json_tree(PRODUCT)
+        database.import_json_tree(self.connection, product_folder, key_json,
+                                  "utf-8")
+        changed = dict(PRODUCT, default_price_per_unit=1.2, history=[])
+        database.write_product(self.connection, 1, changed)
+
+        count = database.import_json_tree(self.connection, product_folder,
+                                          key_json, "utf-8")
+
+        self.assertEqual(count, 1)
+        rows = database.read_product_rows(self.connection)
+        self.assertEqual(rows[0][2], 1.2)
+        self.assertEqual(len(database.read_history(self.connection, 1)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
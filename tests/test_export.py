@@ -0,0 +1,162 @@
+"""
+Tests of the exports from the bill backup folder
+
+Run from the repository root: python -m unittest
+"""
+import csv
+import os
+import time
+import unittest
+from unittest import mock
+
+import libs.backend as backend
+from tests.support import BackendTestCase
+
+BACKUP_ROWS = ("{date};{time};Billa;Bar;1;;;;;1,04;;;;1,04\r\n"
+               ";;;Milch 1l;1,04;;;;;1,04;;;;1,04\r\n"
+               "\r\n")
+
+
+class ExportNewBackupsTest(BackendTestCase):
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs(os.path.join(self.folder, "bill_backups"))
+
+    def _write_backup(self, name, written_before=True):
+        path = os.path.join(self.folder, "bill_backups", name)
+        date, _, clock = name.partition('_')[0].partition('T')
+        with open(path, 'w', newline='', encoding="utf-8") as out_file:
+            out_file.write(BACKUP_ROWS.format(date=date,
+                                              time=clock.replace('-', ':')))
+        if written_before:
+            # Not written while the export runs
+            written = time.time() - 60
+            os.utime(path, (written, written))
+            os.utime(os.path.dirname(path), (written, written))
+        return path
+
+    def test_backups_with_same_rows_are_all_exported(self):
+        self._write_backup("2021-04-03T12-34_Billa.csv")
+        self._write_backup("2021-04-03T12-34_Billa_00.csv")
+
+        out_path = backend.export_new_backups()
+
+        self.assertIsNotNone(out_path)
+        self.assertTrue(out_path.endswith("_2bills.csv"))
+        self.assertIsNone(backend.export_new_backups())
+
+    def test_added_backup_is_exported_once(self):
+        self._write_backup("2021-04-03T12-34_Billa.csv")
+        backend.export_new_backups()
+        self._write_backup("2021-04-03T12-34_Billa_00.csv")
+
+        out_path = backend.export_new_backups()
+
+        self.assertIn("_1bills", os.path.basename(out_path))
+        self.assertIsNone(backend.export_new_backups())
+
+    def test_hashes_of_older_bills_are_dropped(self):
+        self._write_backup("2021-04-03T12-34_Billa.csv")
+        self._write_backup("2021-04-10T09-00_Billa.csv")
+
+        backend.export_new_backups()
+
+        watermark = backend.read_export_watermark()
+        self.assertEqual(watermark["date_time"], "2021-04-10T09-00")
+        self.assertEqual(list(watermark["hashes"].values()),
+                         ["2021-04-10T09-00"])
+
+    def test_older_backups_are_not_checked_without_new_files(self):
+        old_path = self._write_backup("2021-04-03T12-34_Billa.csv")
+        self._write_backup("2021-04-10T09-00_Billa.csv")
+        backend.export_new_backups()
+
+        with mock.patch("os.path.getmtime",
+                        wraps=os.path.getmtime) as getmtime:
+            self.assertIsNone(backend.export_new_backups())
+
+        checked = [call.args[0] for call in getmtime.call_args_list]
+        self.assertNotIn(old_path, checked)
+
+    def test_older_backup_added_later_is_exported(self):
+        self._write_backup("2021-04-03T12-34_Billa.csv")
+        self._write_backup("2021-04-10T09-00_Billa.csv")
+        backend.export_new_backups()
+        self._write_backup("2021-04-05T10-00_Billa.csv",
+                           written_before=False)
+
+        out_path = backend.export_new_backups()
+
+        self.assertIn("_1bills", os.path.basename(out_path))
+        self.assertIsNone(backend.export_new_backups())
+
+
+class ExportPartitionsTest(BackendTestCase):
+
+    # date, store, payment, total of the bills
+    BILLS = [("2021-03-30", "Billa", "Bar", "2,5"),
+             ("2021-04-01", "Spar", "Karte", "10,04"),
+             ("2021-04-03", "Billa", "Karte", "1,3"),
+             ("2021-04-03", "Billa", "Bar", "0,7"),
+             ("2021-05-12", "Hofer", "Bar", "7")]
+
+    def setUp(self):
+        super().setUp()
+        folder = os.path.join(self.folder, "bill_backups")
+        os.makedirs(folder)
+        for index, (date, store, payment, total) in enumerate(self.BILLS):
+            path = os.path.join(folder, f"{date}T12-{index:02}_{store}.csv")
+            with open(path, 'w', newline='', encoding="utf-8") as out_file:
+                out_file.write(f"{date};12:{index:02};{store};{payment};1;;;;;"
+                               f"{total};;;;{total}\r\n"
+                               f";;;Milch 1l;{total};;;;;{total};;;;{total}"
+                               "\r\n"
+                               "\r\n")
+
+    def _read_manifest(self, manifest_path):
+        with open(manifest_path, 'r', newline='',
+                  encoding="utf-8") as in_file:
+            rows = list(csv.reader(in_file, delimiter=';', quotechar='|'))
+        folder = os.path.dirname(manifest_path)
+        return rows[0], [(value, os.path.join(folder, name), int(bills),
+                          int(lines), total)
+                         for value, name, bills, lines, total in rows[1:]]
+
+    def _check_partitions(self, key, expected_values, workers):
+        single = list(backend.iter_bill_rows(backend.export_backups()))
+
+        header, partitions = self._read_manifest(
+            backend.export_partitions(key, workers=workers))
+
+        self.assertEqual(header[0], key)
+        self.assertEqual([partition[0] for partition in partitions],
+                         expected_values)
+        exported = []
+        for value, path, bills, lines, total in partitions:
+            rows = list(backend.iter_bill_rows(path))
+            self.assertEqual(bills, len(rows))
+            self.assertEqual(lines, sum(len(products) + 2
+                                        for _, products in rows))
+            rows_total = sum(backend.parse_float(header_line[13])
+                             for header_line, _ in rows)
+            self.assertEqual(total, f"{rows_total:.2f}".replace('.', ','))
+            for header_line, _ in rows:
+                self.assertEqual(backend.partition_value(header_line, key),
+                                 value)
+            exported += rows
+        self.assertEqual(sorted(exported), sorted(single))
+
+    def test_month_partitions_hold_all_bills(self):
+        self._check_partitions("month", ["2021-03", "2021-04", "2021-05"], 1)
+
+    def test_store_partitions_in_process_pool(self):
+        self._check_partitions("store", ["Billa", "Hofer", "Spar"], 2)
+
+    def test_unknown_key(self):
+        with self.assertRaises(ValueError):
+            backend.export_partitions("product")
+
+
+if __name__ == '__main__':
+    unittest.main()
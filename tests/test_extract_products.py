@@ -0,0 +1,61 @@
+"""
+Tests of reading the bills of tools/extract_products_from_csv.py
+
+Run from the repository root: python -m unittest
+"""
+import os
+import unittest
+
+from tests.support import BackendTestCase
+from tools.extract_products_from_csv import read_csv_bills
+
+# Two description rows, then two bills. The last one is not followed by an
+# empty line
+SAMPLE_ROWS = (";;;;;;;;;;;;;;;\r\n"
+               "Datum;Zeit;Geschäft;Bezahlung;;;;;;;;;;;;Anzeigen\r\n"
+               "03.04.2021;12:34;Billa;Bar;;;;;;3,12;0,31;;;2,81;;\r\n"
+               ";;;Milch 1l;1,04;3;0,1;Lebensmittel;;3,12;0,31;;;2,81;;1\r\n"
+               ";;;;;;;;;;;;;;;\r\n"
+               "10.04.2021;09:00;Spar;Karte;;;;;;1,5;;;;1,5;;\r\n"
+               ";;;Semmel;0,5;0;A;;;1,5;;;;1,5;;0\r\n"
+               ";;;Butter;1;;;;;1;;;;1;;\r\n")
+
+
+class ReadCsvBillsTest(BackendTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.folder, "sample.csv")
+        with open(self.path, 'w', newline='', encoding="utf-8") as out_file:
+            out_file.write(SAMPLE_ROWS)
+
+    def test_all_bills_are_read(self):
+        bills = read_csv_bills(self.path)
+
+        self.assertEqual([(bill.date, bill.store) for bill in bills],
+                         [("03.04.2021", "Billa"), ("10.04.2021", "Spar")])
+        self.assertEqual([[product.name for product in bill.products]
+                          for bill in bills],
+                         [["Milch 1l"], ["Semmel", "Butter"]])
+
+    def test_product_lines(self):
+        milk, bread, butter = [product for bill in read_csv_bills(self.path)
+                               for product in bill.products]
+
+        self.assertEqual(milk.price_single, 1.04)
+        self.assertEqual(milk.quantity, 3)
+        self.assertEqual(milk.discount_class, "10")
+        self.assertEqual(milk.product_class, "Lebensmittel")
+        self.assertEqual(milk.price_final, 2.81)
+        self.assertTrue(milk.display)
+        # A quantity of 0 is one item, letters are kept as discount class
+        self.assertEqual(bread.quantity, 1)
+        self.assertEqual(bread.discount_class, "A")
+        self.assertFalse(bread.display)
+        # Empty cells
+        self.assertEqual(butter.quantity, 1)
+        self.assertEqual(butter.discount_class, '')
+
+
+if __name__ == '__main__':
+    unittest.main()
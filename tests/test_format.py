@@ -0,0 +1,86 @@
+"""
+Tests of the formatting of bills for the output csv files
+
+Run from the repository root: python -m unittest
+"""
+import random
+import unittest
+
+import libs.backend as backend
+
+
+def random_number(generator):
+    return generator.choice([0, 0.0, -0.0, 1, 3.0, 12.5, "1.5",
+                             round(generator.uniform(-50, 50), 2),
+                             generator.uniform(0, 10)])
+
+
+def random_bill(generator):
+    products = [backend.Product(
+        name=f"Produkt {index}.1", price_single=random_number(generator),
+        quantity=generator.choice([0, 1, 1.5, 2.0]),
+        discount_class=generator.choice(['', "20", "12.5", "A", "unknown"]),
+        product_class="Lebensmittel", unknown='',
+        price_quantity=random_number(generator),
+        discount=random_number(generator),
+        quantity_discount=random_number(generator),
+        sale=random_number(generator), price_final=random_number(generator))
+        for index in range(generator.randint(0, 5))]
+    return backend.Bill(products=products, date="2021-04-03", time="12:34",
+                        store="Billa", payment="Bar",
+                        total=random_number(generator),
+                        discount_sum=random_number(generator),
+                        quantity_discount_sum=random_number(generator),
+                        sale_sum=random_number(generator),
+                        price_quantity_sum=random_number(generator))
+
+
+class FormatBillsTest(unittest.TestCase):
+
+    def setUp(self):
+        backend.DISCOUNT_CLASSES.clear()
+        backend.DISCOUNT_CLASSES.update({"A": 0.2})
+
+    def tearDown(self):
+        backend.DISCOUNT_CLASSES.clear()
+
+    def test_number_column_matches_format_number(self):
+        values = [0, 0.0, -0.0, 1, 2.5, 1.005, -3.456, "1.5", 12]
+
+        self.assertEqual(backend.format_number_column(values),
+                         [backend.format_number(item) for item in values])
+        self.assertEqual(backend.format_number_column([]), [])
+
+    def test_bill_line(self):
+        product = backend.Product(name="Milch 1.5l", price_single=1.04,
+                                  quantity=1.5, discount_class="20",
+                                  product_class="Lebensmittel", unknown='',
+                                  price_quantity=1.56, discount=-0.31,
+                                  quantity_discount=0.0, sale=0.0,
+                                  price_final=1.25)
+        bill = backend.Bill(products=[product], date="2021-04-03",
+                            time="12:34", store="Billa", payment="Bar",
+                            total=1.25, discount_sum=-0.31,
+                            quantity_discount_sum=0.0, sale_sum=0.0,
+                            price_quantity_sum=1.56)
+
+        header_line, lines = backend.format_bill(bill)
+
+        self.assertEqual(header_line, ["2021-04-03", "12:34", "Billa", "Bar",
+                                       "1", '', '', '', '', "1,56", "0,31",
+                                       '', '', "1,25"])
+        self.assertEqual(lines, [['', '', '', "Milch 1.5l", "1,04", "1,5",
+                                  "0,20", "Lebensmittel", '', "1,56",
+                                  "-0,31", '', '', "1,25"]])
+
+    def test_batch_matches_single_bills(self):
+        generator = random.Random(1)
+        bills = [random_bill(generator) for _ in range(200)]
+
+        self.assertEqual(backend.format_bills(bills),
+                         [backend.format_bill(bill) for bill in bills])
+        self.assertEqual(backend.format_bills([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+Tests of the lazily loaded product history
+
+Run from the repository root: python -m unittest
+"""
+import unittest
+
+import libs.backend as backend
+from tests.support import BackendTestCase
+
+PRODUCT_COUNT = 6
+CACHE_SIZE = 2
+
+
+class LazyHistoryTest(BackendTestCase):
+    config = {"DEFAULT": {"lazy history": "True",
+                          "history cache size": str(CACHE_SIZE)}}
+
+    def setUp(self):
+        super().setUp()
+        for identifier in range(PRODUCT_COUNT):
+            name = f"product {identifier}"
+            self.write_product(identifier, name,
+                               [{"date_time": "2021-01-01T00:00"}])
+            backend.TEMPLATES.update({name: backend.Product(
+                name=name, identifier=identifier, lazy_history=True)})
+            backend.IDENTIFIERS.add(identifier, name)
+
+    def _save_bill(self, name):
+        line = {"name": name, "price_single": 1.0, "quantity": 1.0,
+                "discount_class": '', "product_class": '', "unknown": '',
+                "price_quantity": 1.0, "discount": 0.0,
+                "quantity_discount": 0.0, "sale": 0.0, "price_final": 1.0}
+        product = backend.create_product(line, False)
+        backend.create_bill({"store": '', "payment": '', "time": "12:00",
+                             "date": "03-04", "product_list": [product],
+                             "total": 1.0, "discount_sum": 0.0,
+                             "quantity_discount_sum": 0.0, "sale_sum": 0.0})
+
+    def test_cache_stays_bounded_after_saving_bills(self):
+        for identifier in range(PRODUCT_COUNT):
+            self._save_bill(f"product {identifier}")
+
+        self.assertLessEqual(len(backend.HISTORY_CACHE.histories), CACHE_SIZE)
+        for template in backend.TEMPLATES.values():
+            self.assertIsNone(template._history)
+
+    def test_saved_purchase_is_in_history(self):
+        for identifier in range(PRODUCT_COUNT):
+            self._save_bill(f"product {identifier}")
+
+        # Evicted from the cache, read again from the product json file
+        history = backend.TEMPLATES["product 0"].history
+        self.assertEqual(len(history), 2)
+        self.assertEqual(history[-1]["date_time"], "2021-04-03T12:00")
+
+    def test_evicted_history_waits_for_background_write(self):
+        backend.CONFIG["DEFAULT"]["background writes"] = "True"
+        backend.start_writer()
+        try:
+            for identifier in range(PRODUCT_COUNT):
+                self._save_bill(f"product {identifier}")
+
+            history = backend.TEMPLATES["product 0"].history
+        finally:
+            backend.stop_writer()
+        self.assertEqual(len(history), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
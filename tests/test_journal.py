@@ -0,0 +1,141 @@
+"""
+Tests of the bill journal and of applying it again after a crash
+
+Run from the repository root: python -m unittest
+"""
+import json
+import os
+import tempfile
+import unittest
+
+import libs.backend as backend
+from libs.journal import BillJournal
+from tests.support import BackendTestCase, clear_backend
+
+
+class BillJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self._folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._folder.name, "bill_journal.jsonl")
+
+    def tearDown(self):
+        self._folder.cleanup()
+
+    def test_records_are_read_again(self):
+        journal = BillJournal(self.path, "utf-8")
+        journal.append({"bill": 1})
+        journal.append({"bill": 2})
+
+        self.assertEqual(BillJournal(self.path, "utf-8").pending(),
+                         [{"bill": 1}, {"bill": 2}])
+
+    def test_incomplete_last_line_is_dropped(self):
+        with open(self.path, 'w', encoding="utf-8") as out_file:
+            out_file.write('{"bill": 1}\n{"bill": 2}\n{"bill"')
+
+        journal = BillJournal(self.path, "utf-8")
+        journal.append({"bill": 3})
+
+        self.assertEqual(journal.pending(), [{"bill": 1}, {"bill": 2},
+                                             {"bill": 3}])
+        self.assertEqual(BillJournal(self.path, "utf-8").pending(),
+                         journal.pending())
+
+    def test_discard_removes_the_oldest_records(self):
+        journal = BillJournal(self.path, "utf-8")
+        for number in range(3):
+            journal.append({"bill": number})
+
+        journal.discard(2)
+
+        self.assertEqual(len(journal), 1)
+        self.assertEqual(BillJournal(self.path, "utf-8").pending(),
+                         [{"bill": 2}])
+
+
+class ReplayJournalTest(BackendTestCase):
+    config = {"DEFAULT": {"use bill journal": "True",
+                          "journal batch size": "10"}}
+
+    def setUp(self):
+        super().setUp()
+        self.product_path = self.write_product(
+            1, "Milch 1l", [{"date_time": "2021-01-01T00:00"}])
+        backend.read_products()
+
+    def _save_bill(self, store, day):
+        line = {"name": "Milch 1l", "price_single": 1.0, "quantity": 1.0,
+                "discount_class": '', "product_class": '', "unknown": '',
+                "price_quantity": 1.0, "discount": 0.0,
+                "quantity_discount": 0.0, "sale": 0.0, "price_final": 1.0}
+        product = backend.create_product(line, False)
+        backend.create_bill({"store": store, "payment": "Bar",
+                             "time": "12:00", "date": f"{day}-04",
+                             "product_list": [product], "total": 1.0,
+                             "discount_sum": 0.0,
+                             "quantity_discount_sum": 0.0, "sale_sum": 0.0})
+
+    def _restart(self):
+        """
+        Drops all data in memory like a crash and reads the files again
+        """
+        clear_backend()
+        backend.reset_history_cache()
+        backend.read_products()
+        backend.replay_journal()
+
+    def _saved_history(self):
+        with open(self.product_path, 'r', encoding="utf-8") as in_file:
+            return [entry["date_time"] for entry in json.load(in_file)
+                    ["history"]]
+
+    def _backups(self):
+        return sorted(os.listdir(backend.output_folder("bill_backups")))
+
+    def test_saved_bills_are_only_in_the_journal(self):
+        self._save_bill("Billa", "03")
+
+        self.assertEqual(len(backend.JOURNAL), 1)
+        self.assertEqual(self._saved_history(), ["2021-01-01T00:00"])
+        self.assertFalse(os.path.isdir(backend.output_folder("bill_backups")))
+        # Read with the purchase which is only in the journal
+        self.assertEqual(len(backend.read_product_history(1)), 2)
+
+    def test_replay_after_crash_writes_the_bills_once(self):
+        self._save_bill("Billa", "03")
+        self._save_bill("Spar", "04")
+
+        self._restart()
+
+        self.assertEqual(len(backend.JOURNAL), 0)
+        self.assertEqual(self._saved_history(), ["2021-01-01T00:00",
+                                                 "2021-04-03T12:00",
+                                                 "2021-04-04T12:00"])
+        self.assertEqual(self._backups(), ["2021-04-03T12-00_Billa.csv",
+                                           "2021-04-04T12-00_Spar.csv"])
+        self.assertEqual(sorted(backend.STORES), ["Billa", "Spar"])
+        self.assertEqual(len(backend.TEMPLATES["Milch 1l"].history), 3)
+
+    def test_replay_after_crash_while_applying_does_not_duplicate(self):
+        self._save_bill("Billa", "03")
+        with open(backend.CONFIG["FILES"]["bill journal"], 'r',
+                  encoding="utf-8") as in_file:
+            journal_lines = in_file.read()
+        self._restart()
+        # Crash after the files were written but before the journal was
+        # emptied: the same records are applied again
+        with open(backend.CONFIG["FILES"]["bill journal"], 'w',
+                  encoding="utf-8") as out_file:
+            out_file.write(journal_lines)
+
+        self._restart()
+
+        self.assertEqual(len(backend.JOURNAL), 0)
+        self.assertEqual(self._saved_history(), ["2021-01-01T00:00",
+                                                 "2021-04-03T12:00"])
+        self.assertEqual(self._backups(), ["2021-04-03T12-00_Billa.csv"])
+
+
+if __name__ == '__main__':
+    unittest.main()
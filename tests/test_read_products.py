@@ -0,0 +1,57 @@
+"""
+Tests of reading the product json files at startup
+
+Run from the repository root: python -m unittest
+"""
+import unittest
+
+import libs.backend as backend
+from tests.support import BackendTestCase
+
+PRODUCT_COUNT = 10
+
+
+class ReadProductsTest(BackendTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for identifier in range(PRODUCT_COUNT):
+            self.write_product(identifier, f"product {identifier}",
+                               [{"date_time": f"2021-01-{identifier + 1:02}"
+                                              "T00:00"}])
+
+    def _read_products(self, workers, pool):
+        backend.CONFIG["DEFAULT"]["loader workers"] = str(workers)
+        backend.CONFIG["DEFAULT"]["loader pool"] = pool
+        backend.TEMPLATES.clear()
+        backend.PRODUCT_KEYS.clear()
+        backend.read_products()
+        return ([(name, product.identifier, product.history)
+                 for name, product in backend.TEMPLATES.items()],
+                dict(backend.PRODUCT_KEYS))
+
+    def test_thread_pool_reads_the_same_products(self):
+        templates, product_keys = self._read_products(1, "thread")
+
+        self.assertEqual(len(templates), PRODUCT_COUNT)
+        self.assertEqual(product_keys["product 3"], "product_00003")
+        self.assertEqual(self._read_products(3, "thread"),
+                         (templates, product_keys))
+
+    def test_process_pool_reads_the_same_products(self):
+        expected = self._read_products(1, "thread")
+
+        self.assertEqual(self._read_products(4, "process"), expected)
+
+    def test_lazy_history_is_read_on_access(self):
+        backend.CONFIG["DEFAULT"]["lazy history"] = "True"
+        backend.CONFIG["DEFAULT"]["loader workers"] = "2"
+        backend.read_products()
+
+        product = backend.TEMPLATES["product 4"]
+        self.assertIsNone(product.loaded_history())
+        self.assertEqual(product.history, [{"date_time": "2021-01-05T00:00"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
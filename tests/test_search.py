@@ -0,0 +1,170 @@
+"""
+Tests of the search index for the product template names
+
+Run from the repository root: python -m unittest
+"""
+import unittest
+
+import libs.search as search
+
+NAMES = ["Milch 1l", "Milchschokolade", "Vollmilch 3,5%", "Semmel",
+         "Mehl glatt", "Butter", "Buttermilch", "Kaffee"]
+
+
+class SearchIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = search.SearchIndex()
+        for name in NAMES:
+            self.index.add(name)
+
+    def test_trigrams(self):
+        self.assertEqual(search.trigrams("milch"), {"mil", "ilc", "lch"})
+        self.assertEqual(search.trigrams("mi"), set())
+
+    def test_candidates_contain_all_trigrams(self):
+        self.assertEqual(self.index.candidates(["milch"]),
+                         {"Milch 1l", "Milchschokolade", "Vollmilch 3,5%",
+                          "Buttermilch"})
+        self.assertEqual(self.index.candidates(["milch", "butt"]),
+                         {"Buttermilch"})
+        self.assertEqual(self.index.candidates(["xyz"]), set())
+
+    def test_short_fragments_do_not_filter(self):
+        self.assertEqual(set(self.index.candidates(["mi"])), set(NAMES))
+
+    def test_substring_ignores_case(self):
+        self.assertEqual(sorted(self.index.substring("MILCH 1")),
+                         ["Milch 1l"])
+        self.assertEqual(sorted(self.index.substring("e")),
+                         ["Butter", "Buttermilch", "Kaffee", "Mehl glatt",
+                          "Milchschokolade", "Semmel"])
+
+    def test_wildcard(self):
+        self.assertEqual(sorted(self.index.wildcard("milch*l")),
+                         ["Milch 1l", "Milchschokolade"])
+        self.assertEqual(sorted(self.index.wildcard("m*l$")),
+                         ["Milch 1l", "Semmel"])
+        self.assertIsNone(self.index.wildcard("milch("))
+
+    def test_removed_name_is_not_found(self):
+        self.index.remove("Buttermilch")
+
+        self.assertEqual(sorted(self.index.substring("butter")), ["Butter"])
+        self.assertNotIn("Buttermilch", self.index.candidates(["milch"]))
+        self.assertEqual(len(self.index), len(NAMES) - 1)
+
+
+class SearchSessionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = search.SearchIndex()
+        for name in NAMES:
+            self.index.add(name)
+        self.session = search.SearchSession(self.index)
+        # Counts the searches of the whole index
+        self.full_searches = 0
+        candidates = self.index.candidates
+
+        def counted_candidates(fragments):
+            self.full_searches += 1
+            return candidates(fragments)
+
+        self.index.candidates = counted_candidates
+
+    def test_typing_narrows_the_previous_matches(self):
+        results = [sorted(self.session.search(query, "substring"))
+                   for query in ("m", "mi", "mil", "milch", "milchs")]
+
+        self.assertEqual(self.full_searches, 1)
+        self.assertEqual(results[-2], ["Buttermilch", "Milch 1l",
+                                       "Milchschokolade", "Vollmilch 3,5%"])
+        self.assertEqual(results[-1], ["Milchschokolade"])
+
+    def test_deleting_searches_the_index_again(self):
+        self.session.search("milchs", "substring")
+
+        names = self.session.search("milch", "substring")
+
+        self.assertEqual(self.full_searches, 2)
+        self.assertEqual(len(names), 4)
+
+    def test_added_name_searches_the_index_again(self):
+        self.session.search("mil", "substring")
+        self.index.add("Milchreis")
+
+        names = self.session.search("milc", "substring")
+
+        self.assertEqual(self.full_searches, 2)
+        self.assertIn("Milchreis", names)
+
+    def test_wildcard_narrows_only_plain_text(self):
+        self.session.search("mil", "wildcard")
+        self.assertEqual(sorted(self.session.search("mil*l", "wildcard")),
+                         ["Milch 1l", "Milchschokolade"])
+        self.assertEqual(self.full_searches, 1)
+
+        # '?' makes the previous character optional, so more names can match
+        names = self.session.search("mil*l?", "wildcard")
+
+        self.assertEqual(len(names), 4)
+
+    def test_changed_mode_searches_the_index_again(self):
+        self.session.search("mil", "substring")
+
+        self.session.search("milc", "wildcard")
+
+        self.assertEqual(self.full_searches, 2)
+
+
+class FuzzySearchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.index = search.SearchIndex()
+        for name in NAMES:
+            self.index.add(name)
+
+    def test_exact_words_rank_first(self):
+        names = self.index.fuzzy("milch", 10)
+
+        self.assertEqual(set(names), {"Milch 1l", "Milchschokolade",
+                                      "Vollmilch 3,5%", "Buttermilch"})
+        # Same score, sorted by name
+        self.assertEqual(names[0], "Buttermilch")
+
+    def test_typo_is_found(self):
+        self.assertEqual(self.index.fuzzy("kafee", 10), ["Kaffee"])
+        self.assertEqual(self.index.fuzzy("butetr", 10),
+                         ["Butter", "Buttermilch"])
+
+    def test_only_top_k_are_returned(self):
+        names = self.index.fuzzy("milch", 2)
+
+        self.assertEqual(names, ["Buttermilch", "Milch 1l"])
+
+    def test_bonus_changes_the_order(self):
+        names = self.index.fuzzy(
+            "milch", 2, bonus=lambda name: name == "Vollmilch 3,5%")
+
+        self.assertEqual(names[0], "Vollmilch 3,5%")
+
+    def test_hidden_names_do_not_take_places(self):
+        names = self.index.fuzzy(
+            "milch", 2, keep=lambda name: name != "Buttermilch")
+
+        self.assertEqual(names, ["Milch 1l", "Milchschokolade"])
+
+    def test_short_query_ranks_word_starts_first(self):
+        names = self.index.fuzzy("mi", 10)
+
+        self.assertEqual(names[:2], ["Milch 1l", "Milchschokolade"])
+        self.assertEqual(set(names[2:]), {"Buttermilch", "Vollmilch 3,5%"})
+
+    def test_no_match(self):
+        self.assertEqual(self.index.fuzzy("xyz", 10), [])
+        self.assertEqual(self.index.fuzzy('', 10), [])
+        self.assertEqual(self.index.fuzzy("milch", 0), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""
+Tests of the background writer thread
+
+Run from the repository root: python -m unittest
+"""
+import threading
+import unittest
+
+import libs.writer as writer
+
+TIMEOUT = 5
+
+
+class BackgroundWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = writer.BackgroundWriter(10)
+
+    def tearDown(self):
+        self.writer.stop()
+
+    def test_writes_run_in_submitted_order(self):
+        written = []
+        for number in range(20):
+            self.writer.submit(str(number), written.append, number)
+
+        self.writer.flush()
+
+        self.assertEqual(written, list(range(20)))
+        self.assertEqual(self.writer.pending, 0)
+
+    def test_failed_write_is_reported(self):
+        self.writer.submit("fails", int, "x")
+        self.writer.submit("works", int, "1")
+
+        self.writer.flush()
+
+        self.assertEqual(len(self.writer.failed), 1)
+        self.assertEqual(self.writer.failed[0][0], "fails")
+
+    def test_wait_for_key_does_not_wait_for_later_writes(self):
+        written = []
+        release = threading.Event()
+        self.writer.submit("product 1", written.append, 1, keys=[1])
+        self.writer.submit("product 2", release.wait, TIMEOUT, keys=[2])
+
+        self.writer.wait_for(1)
+
+        self.assertEqual(written, [1])
+        self.assertFalse(release.is_set())
+        release.set()
+
+    def test_waiting_in_writer_thread_returns(self):
+        done = threading.Event()
+
+        def wait_in_job():
+            self.writer.flush()
+            self.writer.wait_for(1)
+            done.set()
+
+        self.writer.submit("waits", wait_in_job, keys=[1])
+
+        self.assertTrue(done.wait(TIMEOUT))
+
+
+if __name__ == '__main__':
+    unittest.main()
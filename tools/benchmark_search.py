@@ -0,0 +1,85 @@
+"""
+Compares the template search methods on a generated product catalog: the full
+regex scan regex_search used before the search index, the indexed
+regex_search and the ranked fuzzy_search.
+
+Run from the repository root: python -m tools.benchmark_search [product count]
+"""
+import random
+import re
+import sys
+import timeit
+
+import libs.backend as backend
+
+WORDS = ["Milch", "Brot", "Semmel", "Joghurt", "Käse", "Salami", "Saft",
+         "Orange", "Apfel", "Schokolade", "Fisch", "Rindfleisch", "Wasser",
+         "Bier", "Wein", "Butter", "Nudeln", "Reis", "Tomaten", "Gurke",
+         "Bio", "Vollkorn", "Natur", "Light", "Extra", "Classic"]
+SIZES = ["100g", "150g", "250g", "500g", "1kg", "0,5l", "1l", "1,5l", "x6"]
+QUERIES = ["m", "mil", "milch", "milch*1l", "schoko", "bio*brot", "xyz",
+           "milhc", "schokolad 100g"]
+
+
+def full_scan_search(input_str):
+    """
+    regex_search as it was before the search index: compile the pattern and
+    match it with every lowercased product name
+    """
+    input_str = ".*" + input_str.replace('*', ".*")
+    try:
+        pattern = re.compile(input_str)
+    except re.error:
+        return None
+    out_dict = dict()
+    for key, field in backend.TEMPLATES.items():
+        if pattern.match(key.lower()):
+            out_dict.update({key: field})
+    return out_dict
+
+
+def create_catalog(product_count):
+    """
+    Fill TEMPLATES and SEARCH_INDEX with generated products
+    """
+    random.seed(0)
+    backend.reset_history_cache()
+    identifier = 0
+    while len(backend.TEMPLATES) < product_count:
+        name = " ".join(random.sample(WORDS, random.randint(1, 3)) +
+                        [random.choice(SIZES)])
+        if name in backend.TEMPLATES:
+            continue
+        history = [{"date_time": "2021-04-12T10:00"}] * random.randint(0, 5)
+        backend.TEMPLATES.update({name: backend.Product(
+            name=name, identifier=identifier, history=history)})
+        backend.SEARCH_INDEX.add(name)
+        identifier += 1
+
+
+def main():
+    product_count = 20000
+    if len(sys.argv) > 1:
+        product_count = int(sys.argv[1])
+
+    backend.CONFIG = backend.read_config("config.txt")
+    create_catalog(product_count)
+    top_k = backend.CONFIG["DEFAULT"].getint("search results", fallback=30)
+    print(f"{product_count} products, fuzzy top {top_k}")
+    print(f"{'query':>16} {'full scan':>18} {'indexed':>18} {'fuzzy':>18}")
+
+    for query in QUERIES:
+        results = []
+        for function in (full_scan_search, backend.regex_search,
+                         backend.fuzzy_search):
+            repeats = 5
+            seconds = timeit.timeit(lambda: function(query), number=repeats)
+            matches = function(query)
+            match_count = 0 if matches is None else len(matches)
+            results.append(f"{seconds / repeats * 1000:8.2f}ms "
+                           f"{match_count:6}")
+        print(f"{query:>16} " + " ".join(f"{item:>18}" for item in results))
+
+
+if __name__ == '__main__':
+    main()
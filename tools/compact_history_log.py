@@ -0,0 +1,19 @@
+"""
+Moves all purchases of the history log into the product json files and
+empties the log. Only needed with "use history log = True" in the config file,
+the program also compacts the log at startup once it holds more purchases than
+"history log compact size".
+
+Run from the repository root: python -m tools.compact_history_log
+"""
+import sys
+
+import libs.backend as backend
+
+config_path = "config.txt"
+if len(sys.argv) > 1:
+    config_path = sys.argv[1]
+
+backend.CONFIG = backend.read_config(config_path)
+backend.read_history_log()
+backend.compact_history_log()
@@ -0,0 +1,64 @@
+"""
+Exports the bills of the bill backup folder into one csv file of the export
+folder, like the 'export' button does for the bills of one session. The bills
+can be limited to a date range and to some stores. With --new, only the bills
+added since the last --new export are written, e.g. for a daily export. With
+--partition, one file per month, store or payment is written together with a
+manifest, using "export workers" processes.
+
+Run from the repository root, e.g.:
+python -m tools.export_backups --from 2021-04-01 --to 2021-04-30 --store Billa
+python -m tools.export_backups --partition month --workers 4
+"""
+import argparse
+
+import libs.backend as backend
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the bills of the bill backup folder")
+    parser.add_argument("--config", default="config.txt",
+                        help="path to the config file")
+    parser.add_argument("--from", dest="start_date",
+                        help="first exported date, e.g. 2021-04-01")
+    parser.add_argument("--to", dest="end_date",
+                        help="last exported date, e.g. 2021-04-30")
+    parser.add_argument("--store", dest="stores", action="append",
+                        help="only export bills of this store, can be "
+                             "repeated")
+    parser.add_argument("--new", action="store_true",
+                        help="only export bills added since the last --new "
+                             "export")
+    parser.add_argument("--partition", choices=sorted(backend.PARTITION_KEYS),
+                        help="write one file per month, store or payment")
+    parser.add_argument("--workers", type=int,
+                        help="processes for --partition, default is the "
+                             "\"export workers\" config value")
+    args = parser.parse_args()
+    if args.new and (args.start_date or args.end_date or args.stores or
+                     args.partition):
+        parser.error("--new can not be combined with --from, --to, --store "
+                     "or --partition")
+    if args.partition and args.stores:
+        parser.error("--partition can not be combined with --store")
+
+    backend.CONFIG = backend.read_config(args.config)
+
+    if args.new:
+        out_path = backend.export_new_backups()
+    elif args.partition:
+        out_path = backend.export_partitions(args.partition, args.start_date,
+                                             args.end_date, args.workers)
+    else:
+        out_path = backend.export_backups(args.start_date, args.end_date,
+                                          args.stores)
+    if out_path is None:
+        print("no bills found")
+    else:
+        print("exported to: ", out_path)
+
+
+# The guard keeps processes of the export pool from running the export again
+if __name__ == '__main__':
+    main()
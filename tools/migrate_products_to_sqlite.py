@@ -0,0 +1,20 @@
+"""
+Imports the product json files and the product keys json into the SQLite
+database given by "product database" in the config file. Afterwards set
+"storage = sqlite" in the config file to use the database.
+
+Run from the repository root: python -m tools.migrate_products_to_sqlite
+"""
+import sys
+
+import libs.backend as backend
+
+config_path = "config.txt"
+if len(sys.argv) > 1:
+    config_path = sys.argv[1]
+
+backend.CONFIG = backend.read_config(config_path)
+
+product_count = backend.migrate_products_to_database()
+print("imported products: ", product_count)
+print("database: ", backend.CONFIG["FILES"]["product database"])